@@ -0,0 +1,170 @@
+"""
+Benchmark: every protocol under protocols/ in headless simulation
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Simulate each protocol at representative col_num values (protocols without col_num run once)
+and record commands, tips, estimated robot time (otkit.estimate), simulation wall time and
+peak memory. Results go to benchmarks/results.json and are compared with the stored baseline;
+the exit status is 1 when something regressed. Run from the repo root:
+
+    python benchmarks/bench_protocols.py
+    python benchmarks/bench_protocols.py --only CHARM --columns 12
+    python benchmarks/bench_protocols.py --save-baseline      # after an intended change
+
+Robot time, tips and commands are deterministic and flagged on any increase past the
+tolerance; wall time and memory depend on the machine and get a wide tolerance.
+A protocol that simulated in the baseline and fails now is a regression too.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.getcwd())
+
+from otkit.estimate import estimate, format_seconds
+from otkit.trace import simulate_protocol
+
+BASELINE = 'benchmarks/baseline.json'
+RESULTS = 'benchmarks/results.json'
+COLUMNS = [1, 6, 12]
+# metric: allowed relative increase over the baseline
+TOLERANCE = {
+    'robot_seconds': 0.01,
+    'tips': 0.0,
+    'commands': 0.02,
+    'wall_seconds': 0.5,
+    'peak_mb': 0.5,
+}
+
+
+def protocols(only=None):
+    paths = sorted(glob.glob('protocols/**/*.py', recursive=True))
+    return [path for path in paths if only is None or only.lower() in path.lower()]
+
+
+def cases(paths, columns):
+    """
+    (path, col_num or None) for every run
+    """
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            source = f.read()
+        if re.search(r'^\s*col_num\s*=', source, re.MULTILINE):
+            runs.extend((path, n) for n in columns)
+        else:
+            runs.append((path, None))
+    return runs
+
+
+def run_case(case):
+    """
+    simulate one case in a fresh worker process, so peak memory is its own
+    """
+    from opentrons import simulate  # noqa: F401, imported before the clock starts
+
+    path, col_num = case
+    result = {'protocol': path, 'col_num': col_num}
+    start = time.perf_counter()
+    try:
+        trace = simulate_protocol(path, {'col_num': col_num} if col_num is not None else None)
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, str(error).splitlines()[0] if str(error) else '')
+        return result
+    total = estimate(trace)['total']
+    result.update(
+        commands=total['commands'],
+        tips=total['tips'],
+        robot_seconds=round(total['seconds'], 1),
+        wall_seconds=round(time.perf_counter() - start, 3),
+        peak_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+    return result
+
+
+def key(result):
+    return '{}@{}'.format(result['protocol'], result['col_num'])
+
+
+def compare(results, baseline):
+    """
+    regression messages against the baseline results
+    """
+    base = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = base.get(key(result))
+        if old is None:
+            continue
+        if 'error' in result:
+            if 'error' not in old:
+                regressions.append('{}: fails now ({})'.format(key(result), result['error']))
+            continue
+        if 'error' in old:
+            continue
+        for metric, tolerance in TOLERANCE.items():
+            if result[metric] > old[metric] * (1 + tolerance) + 1e-9:
+                regressions.append('{}: {} {} -> {} (+{:.1%})'.format(
+                    key(result), metric, old[metric], result[metric], result[metric] / old[metric] - 1 if old[metric] else 1))
+    return regressions
+
+
+def report(results):
+    lines = ['{:<48} {:>4} {:>8} {:>5} {:>9} {:>7} {:>7}'.format(
+        'protocol', 'cols', 'commands', 'tips', 'robot', 'wall', 'MB')]
+    for r in results:
+        if 'error' in r:
+            lines.append('{:<48} {:>4}  {}'.format(r['protocol'][:48], r['col_num'] or '-', r['error'][:70]))
+            continue
+        lines.append('{:<48} {:>4} {:>8} {:>5} {:>9} {:>6.2f}s {:>7.1f}'.format(
+            r['protocol'][:48], r['col_num'] or '-', r['commands'], r['tips'],
+            format_seconds(r['robot_seconds']), r['wall_seconds'], r['peak_mb']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='protocols whose path contains this text')
+    parser.add_argument('--columns', default=','.join(map(str, COLUMNS)), help='col_num values to run')
+    parser.add_argument('--jobs', type=int, default=1, help='parallel simulations; more skews wall time')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    args = parser.parse_args()
+
+    runs = cases(protocols(args.only), [int(n) for n in args.columns.split(',')])
+    with ProcessPoolExecutor(max_workers=args.jobs, max_tasks_per_child=1) as pool:
+        results = list(pool.map(run_case, runs))
+    print(report(results))
+    with open(RESULTS, 'w') as f:
+        json.dump(results, f, indent=1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print('\nbaseline saved to {}'.format(args.baseline))
+        return
+    if not os.path.exists(args.baseline):
+        print('\nno baseline at {}; run with --save-baseline'.format(args.baseline))
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f))
+    print('')
+    if regressions:
+        print('regressions:')
+        for message in regressions:
+            print('  ' + message)
+        sys.exit(1)
+    print('no regressions against {}'.format(args.baseline))
+
+
+if __name__ == '__main__':
+    main()
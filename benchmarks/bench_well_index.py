@@ -0,0 +1,107 @@
+"""
+Microbenchmark: WellIndex vs columns_by_name() lookups
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Run from the repo root (needs the opentrons package):
+
+    python benchmarks/bench_well_index.py
+
+The baseline is columns_by_name_loop() below, the loop body the protocols used before WellIndex.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from opentrons import simulate
+from otkit.wells import WellIndex
+
+LABWARE_DIR = '3Dprinting'
+PROTOCOL = 'protocols/CHARM_libprep/libprep.charm.py'
+
+
+def load_extra_labware():
+    extra_labware = {}
+    for path in glob.glob(os.path.join(LABWARE_DIR, '*.json')):
+        with open(path) as f:
+            labware_def = json.load(f)
+        extra_labware[labware_def['parameters']['loadName']] = labware_def
+    return extra_labware
+
+
+def columns_by_name_loop(plate, repeat, bottom_offset):
+    """
+    reference: the lookups of one 12-column loop body (aspirate, dispense, mix) as the
+    protocols wrote them before WellIndex
+    """
+    for _ in range(repeat):
+        for i in range(12):
+            plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset)
+            plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset)
+            plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1)
+
+
+def well_index_loop(plate, repeat, bottom_offset):
+    plate_cols = WellIndex(plate, bottom_offset)
+    for _ in range(repeat):
+        for i in range(12):
+            plate_cols.bottom(i)
+            plate_cols.bottom(i)
+            plate_cols.mix(i)
+
+
+def bench_lookups(repeat, bottom_offset=0.3):
+    """
+    time the location lookups of the loop body both ways
+    """
+    protocol = simulate.get_protocol_api('2.13', extra_labware=load_extra_labware())
+    plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul', location='2')
+    times = []
+    for loop in (columns_by_name_loop, well_index_loop):
+        start = time.perf_counter()
+        loop(plate, repeat, bottom_offset)
+        times.append(time.perf_counter() - start)
+    return tuple(times)
+
+
+def bench_simulate(path, repeat):
+    """
+    best-of-repeat wall time of a full opentrons simulation of the protocol
+    """
+    best = None
+    commands = 0
+    for _ in range(repeat):
+        with open(path) as protocol_file:
+            start = time.perf_counter()
+            runlog, _bundle = simulate.simulate(protocol_file, file_name=os.path.basename(path),
+                                                custom_labware_paths=[LABWARE_DIR])
+            elapsed = time.perf_counter() - start
+        commands = len(runlog)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--protocol', default=PROTOCOL)
+    parser.add_argument('--lookups', type=int, default=200, help='repeats of the 12-column lookup loop')
+    parser.add_argument('--runs', type=int, default=3, help='repeats of each full simulation')
+    args = parser.parse_args()
+
+    by_name, indexed = bench_lookups(args.lookups)
+    print('lookups x{}: columns_by_name {:.3f} s, WellIndex {:.3f} s ({:.1f}x)'.format(
+        args.lookups * 36, by_name, indexed, by_name / indexed))
+
+    elapsed, commands = bench_simulate(args.protocol, args.runs)
+    print('{}: {:.2f} s, {} commands'.format(args.protocol, elapsed, commands))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+"""
+otkit: shared helpers for the OT-2 protocols in protocols/
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+On the robot, copy the otkit/ folder next to reminder_tone.mp3
+(/var/lib/jupyter/notebooks) so the protocols can import it.
+"""
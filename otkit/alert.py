@@ -0,0 +1,148 @@
+"""
+Non-blocking operator alerts
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+"""
+
+import shutil
+import subprocess
+import threading
+import time
+
+AUDIO_FILE_PATH = '/var/lib/jupyter/notebooks/reminder_tone.mp3'
+
+# decoded tones, shared by every Alert in the process
+_TONES = {}
+
+
+def load_tone(path=AUDIO_FILE_PATH):
+    """
+    decode the mp3 to wav once and keep it in memory, None if it cannot be decoded
+    """
+    if path not in _TONES:
+        try:
+            _TONES[path] = subprocess.run(['mpg123', '-q', '-w', '-', path],
+                                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            _TONES[path] = None
+    return _TONES[path]
+
+
+def wait_for_resume(protocol):
+    """
+    block until the operator resumes. Up to apiLevel 2.13 protocol.pause() only flags the
+    pause and returns at once; the hardware holds it at the next motion or delay. A zero
+    delay waits without moving; a simulated pause does not hold, so nothing is added there
+    """
+    if not protocol.is_simulating():
+        protocol.delay(seconds=0)
+
+
+class Alert:
+    """
+    blink the rail lights and play the reminder tone in a background thread,
+    so the robot never waits on the speaker.
+
+        alert = Alert(protocol)
+        with alert:
+            protocol.pause('...')   # alert runs until the operator resumes, see wait_for_resume
+        alert.ring()                # short alert, returns immediately
+        alert.ring(block=True)      # at the end of run(), so no alert thread outlives the run
+    """
+
+    def __init__(self, protocol, audio_path=AUDIO_FILE_PATH, blink_interval=0.5, tone_interval=10):
+        self.protocol = protocol
+        self.audio_path = audio_path
+        self.blink_interval = blink_interval
+        self.tone_interval = tone_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._player = None
+        if not protocol.is_simulating():
+            load_tone(audio_path)
+
+    def _play(self):
+        tone = _TONES.get(self.audio_path)
+        try:
+            if tone and shutil.which('aplay'):
+                self._player = subprocess.Popen(['aplay', '-q', '-'], stdin=subprocess.PIPE,
+                                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                threading.Thread(target=self._feed, args=(self._player, tone), daemon=True).start()
+            else:
+                self._player = subprocess.Popen(['mpg123', '-q', self.audio_path],
+                                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            self._player = None
+
+    @staticmethod
+    def _feed(player, tone):
+        try:
+            player.stdin.write(tone)
+            player.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def _silence(self):
+        if self._player is not None and self._player.poll() is None:
+            self._player.terminate()
+        self._player = None
+
+    def _run(self, cycles):
+        last_tone = None
+        n = 0
+        while not self._stop.is_set() and (cycles is None or n < cycles):
+            now = time.monotonic()
+            if last_tone is None or (now - last_tone >= self.tone_interval
+                                     and (self._player is None or self._player.poll() is not None)):
+                self._play()
+                last_tone = now
+            self.protocol.set_rail_lights(not self.protocol.rail_lights_on)
+            n += 1
+            self._stop.wait(self.blink_interval)
+        self.protocol.set_rail_lights(True)
+
+    def start(self, cycles=None):
+        """
+        start alerting in the background; cycles=None runs until stop()
+        """
+        if self.protocol.is_simulating():
+            return
+        self.stop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(cycles,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        stop blinking, silence the tone and leave the rail lights on
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._silence()
+
+    def ring(self, cycles=8, block=False):
+        """
+        short alert that does not wait for the operator; block waits for its cycles to finish
+        """
+        self.start(cycles)
+        if block and self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait_for_resume(self):
+        wait_for_resume(self.protocol)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            if exc_type is None:
+                self.wait_for_resume()
+        finally:
+            self.stop()
+        return False
@@ -0,0 +1,536 @@
+"""
+Assay specs and the engine that runs them
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+An assay spec (YAML or JSON, see assays/) names the labware, reagent wells, settings and an
+ordered list of steps; run_assay() turns it into robot commands with the otkit helpers, so
+multi-dispense, volume tracking and tip refills apply to every assay. Compile a spec into
+a protocol file for the robot:
+
+    python -m otkit.assay assays/charm.yaml -o protocols/CHARM_libprep/charm.assay.py
+    python -m otkit.assay assays/charm.yaml --stages "index,PCR mix" -o /tmp/charm.pcr.py
+
+Steps:
+    {stage: NAME}                  starts a stage (a 'Stage: NAME' comment); steps without
+                                   a stage continue the current one
+    distribute: {reagent, dest, volume, contact}
+                                   reagent into every column of dest, one tip when the
+                                   destination is empty (contact: false)
+    columns: [{source, dest, volume, mix}, ...]
+                                   one tip per column for the listed moves; source is a
+                                   reagent or a plate, mix is the mix volume in dest
+                                   (the mix_volume setting lowers it)
+    pause: MESSAGE                 operator pause with alert and tip rack refill
+    incubate: {name, minutes}      start a timed incubation; steps with `after: NAME` wait
+                                   for it, the others run meanwhile (otkit.schedule)
+    load: {ALIAS: {load_name, slot}}
+                                   load labware, replacing what sits in the slot
+volume is a number, a list per column, or {dilute_to, sample_volume, concentrations}
+for the water that brings each column to dilute_to.
+
+Reagents and moves name a liquid class (otkit.liquids) with `liquid:`; a move from a
+reagent uses the reagent's class, and `liquid_classes:` in the spec adds or overrides classes.
+
+col_num above 12 runs a batch of plate sets, 12 columns each: every set runs the steps on a
+fresh deck of the spec's labware, and the last pause of a set asks the operator to load the
+next one, so the swap happens while the previous set is in the thermocycler. The pauses of
+a batch name the plate set and its i5/i7 index plate pair, counted from the index_pair setting. Volume and
+concentration lists cover the whole batch and are sliced per set; with the setting
+same_volumes_every_set, a list holds one plate's 12 columns and every set repeats it. Any
+other length is an error before the run starts.
+
+With the journal setting, finished columns and steps are journaled (otkit.checkpoint);
+setting resume as well continues an interrupted run where the journal stops. The profile
+setting times every pipette and protocol call of a robot run (otkit.profiler), and
+command_log streams every command to a JSONL log for replay (otkit.runlog).
+"""
+
+import argparse
+import json
+import os
+import pprint
+
+from otkit.alert import Alert
+from otkit.calibration import corrections, load_curves
+from otkit.checkpoint import Journal
+from otkit.distribute import distribute
+from otkit.liquids import LiquidPipette
+from otkit.profiler import Profiler
+from otkit.runlog import CommandLog
+from otkit.schedule import Timers, schedule
+from otkit.tips import pause_with_refill
+from otkit.volumes import TrackedPipette, VolumeTracker
+from otkit.wells import WellIndex
+
+PLATE_COLUMNS = 12
+
+DEFAULT_SETTINGS = {
+    'bottom_offset': 0.3,
+    'disposal_volume': 1,
+    'fill_volume': None,        # ul a multi-dispense aspiration fills a tip to, None for the tip's working volume
+    'flow_rate': None,          # ul/s for aspirate and dispense, None keeps the pipette default
+    'mix_reps': 5,
+    'mix_rate': 20,
+    'mix_volume': None,         # ul mixed in every well, at most a move's mix; None uses each move's mix
+    'reagent_excess': 5,        # ul loaded in each reagent tube beyond what the run draws
+    'same_volumes_every_set': False,    # volume lists hold one plate of 12 columns, repeated for each plate set
+    'index_pair': None,         # i5/i7 index plate pair of the first plate set, the next sets count on (otkit.fleet)
+    'journal': None,            # run journal file, None runs without checkpoints
+    'resume': False,            # continue the run recorded in the journal
+    'calibration': None,        # otkit.calibration curve file, None or a missing file runs uncorrected
+    'profile': None,            # otkit.profiler timing file written at the end of a robot run, None to skip
+    'command_log': None,        # otkit.runlog JSONL of every command of a robot run, None to skip
+}
+
+
+def load_spec(path):
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _batch_slice(values, col_num, first, total, every_set):
+    """
+    values of col_num columns from column first of a batch of total columns: the list covers
+    the batch, or with every_set holds one plate set's columns
+    """
+    if every_set:
+        if not min(total, PLATE_COLUMNS) <= len(values) <= PLATE_COLUMNS:
+            raise ValueError('{} values with same_volumes_every_set; give one per column of a plate set ({})'.format(
+                len(values), min(total, PLATE_COLUMNS)))
+        return values[first % PLATE_COLUMNS:first % PLATE_COLUMNS + col_num]
+    if len(values) < total:
+        raise ValueError('{} values for {} columns; give one per column of the batch, '
+                         'or {} with same_volumes_every_set'.format(len(values), total, PLATE_COLUMNS))
+    return values[first:first + col_num]
+
+
+def column_volumes(volume, col_num, first=0, total=None, every_set=False):
+    """
+    volumes of col_num columns starting at column first of a batch of total columns
+    (first + col_num by default); see _batch_slice for lists
+    """
+    total = first + col_num if total is None else total
+    if isinstance(volume, dict):
+        sample = volume['sample_volume']
+        return [sample / volume['dilute_to'] * concentration - sample
+                for concentration in _batch_slice(volume['concentrations'], col_num, first, total, every_set)]
+    if isinstance(volume, list):
+        return _batch_slice(volume, col_num, first, total, every_set)
+    return [volume] * col_num
+
+
+def plate_sets(col_num):
+    """
+    (first column, columns) of each plate set of a batch
+    """
+    return [(first, min(PLATE_COLUMNS, col_num - first)) for first in range(0, col_num, PLATE_COLUMNS)]
+
+
+def select_steps(steps, stages=None):
+    """
+    (index, stage, step) of the steps of the selected stages, with their pauses;
+    load steps are always kept
+    """
+    selected = []
+    stage = None
+    for n, step in enumerate(steps):
+        stage = step.get('stage', stage)
+        if stages is None or 'load' in step or stage in stages:
+            selected.append((n, stage, step))
+    return selected
+
+
+class AssayRun:
+    """
+    state of one run of an assay spec on a protocol context
+    """
+
+    def __init__(self, protocol, spec, col_num=None, settings=None, stages=None):
+        self.protocol = protocol
+        self.spec = spec
+        self.total = col_num or spec['columns']
+        self.col_num = min(self.total, PLATE_COLUMNS)   # columns of the plate set in progress
+        self.first = 0
+        self.settings = dict(DEFAULT_SETTINGS, **spec.get('settings', {}))
+        self.settings.update(settings or {})
+        self.stages = stages
+        self.labware = {}
+        self.cols = {}
+        self.journal = None
+        self.profiler = None
+        self.command_log = None
+        self.pipette = None
+        self.check_volumes()
+
+    def check_volumes(self):
+        """
+        raise ValueError for a volume list that does not fit the batch, before anything moves
+        """
+        for n, step in enumerate(self.spec['steps']):
+            for item in [step.get('distribute')] + list(step.get('columns') or []):
+                if not item:
+                    continue
+                for first, col_num in plate_sets(self.total):
+                    try:
+                        self.volumes_of(item['volume'], col_num, first)
+                    except ValueError as error:
+                        raise ValueError('step {} ({}): {}'.format(n + 1, step.get('stage', ''), error)) from None
+
+    def volumes_of(self, volume, col_num=None, first=None):
+        """
+        column_volumes of the plate set in progress
+        """
+        return column_volumes(volume, self.col_num if col_num is None else col_num,
+                              self.first if first is None else first, self.total,
+                              self.settings['same_volumes_every_set'])
+
+    def _pick_up(self, pipette):
+        """
+        pick up tip, if no tip available, pause and wait for tip replacement
+        """
+        from opentrons import protocol_api
+
+        try:
+            pipette.pick_up_tip(presses=2, increment=1)
+        except protocol_api.labware.OutOfTipsError:
+            with self.alert:
+                self.protocol.pause("Replace empty tip racks")
+            pipette.reset_tipracks()
+            pipette.pick_up_tip(presses=2, increment=1)
+
+    def load(self, alias, definition):
+        slot = str(definition['slot'])
+        if self.protocol.deck[slot] is not None:
+            for labware in self.labware.values():
+                if str(labware.parent) == slot:
+                    self.volumes.discard(labware)
+            del self.protocol.deck[slot]
+        labware = self.protocol.load_labware(definition['load_name'], location=slot)
+        self.labware[alias] = labware
+        self.cols[alias] = WellIndex(labware, self.settings['bottom_offset'])
+        # a partial run starts from plates whose contents were made by earlier stages
+        if definition.get('track') and self.stages is None:
+            self.volumes.add(labware)
+        return labware
+
+    def setup(self):
+        protocol = self.protocol
+        if self.settings['profile'] and not protocol.is_simulating():
+            self.profiler = Profiler(protocol)
+        if self.settings['command_log'] and not protocol.is_simulating():
+            self.command_log = CommandLog(protocol, self.settings['command_log'],
+                                          context=lambda: {'liquid': self.pipette and self.pipette.current},
+                                          append=self.settings['resume'])
+        if not protocol.rail_lights_on:
+            protocol.set_rail_lights(True)
+        protocol.home()
+        self.alert = Alert(protocol)
+        self.timers = Timers(protocol)
+        self.volumes = VolumeTracker(bottom_offset=self.settings['bottom_offset'])
+        for alias, definition in self.spec['labware'].items():
+            self.load(alias, definition)
+        racks = self.spec['tipracks']
+        self.tipracks = [protocol.load_labware(racks['load_name'], location=str(s)) for s in racks['slots']]
+        pipette = protocol.load_instrument(self.spec['pipette']['name'], self.spec['pipette']['mount'],
+                                           tip_racks=self.tipracks)
+        if self.profiler is not None:
+            self.profiler.instrument(pipette)
+        if self.settings['flow_rate']:
+            pipette.flow_rate.aspirate = self.settings['flow_rate']
+            pipette.flow_rate.dispense = self.settings['flow_rate']
+        curves = load_curves(self.settings['calibration'])
+        # tracked volumes are the ones asked for, whatever a calibration correction commands
+        pipette = LiquidPipette(pipette, protocol, self.spec.get('liquid_classes'),
+                                corrections(curves, self.spec['pipette']['name'], racks['load_name']))
+        self.pipette = TrackedPipette(pipette, self.volumes)
+        if self.settings['journal']:
+            self.journal = Journal(self.settings['journal'], write=not protocol.is_simulating())
+            self.journal.start(self.spec['name'], self.total, self.settings['resume'])
+
+    def state(self):
+        """
+        tip rack positions and tracked volumes, keyed by slot
+        """
+        tips = {}
+        for rack in self.tipracks:
+            next_tip = rack.next_tip(1)
+            tips[str(rack.parent)] = rack.wells().index(next_tip) if next_tip is not None else len(rack.wells())
+        volumes = {str(labware.parent): array.tolist() for labware, array in self.volumes.volumes.items()}
+        return {'tips': tips, 'volumes': volumes}
+
+    def restore(self):
+        """
+        tips and volumes of the last journaled column, and a pause to clear the interrupted one
+        """
+        state = self.journal.last_state()
+        if state is None:
+            return
+        for rack in self.tipracks:
+            rack.reset()
+            wells = rack.wells()
+            for well in wells[:state['tips'].get(str(rack.parent), 0)]:
+                rack.use_tips(well, 1)
+        for labware in self.volumes.volumes:
+            if str(labware.parent) in state['volumes']:
+                self.volumes.add(labware, state['volumes'][str(labware.parent)])
+        interrupted = self.journal.interrupted()
+        if interrupted:
+            message = 'Resuming {} at column {}. Remove any tip left on the pipette and check the column that was in progress.'
+            with self.alert:
+                self.protocol.pause(message.format(*interrupted))
+
+    def checkpoint(self, n, stage, column=None, **extra):
+        if self.journal is not None:
+            self.journal.record(n, stage, column, dict(self.state(), **extra))
+
+    def remaining(self, n):
+        """
+        columns of step n not yet done in a resumed run
+        """
+        if self.journal is None:
+            return list(range(self.col_num))
+        return [i for i in range(self.col_num) if not self.journal.is_done(n, i)]
+
+    def reagent(self, name):
+        well = self.spec['reagents'][name]
+        return self.labware[well['labware']].wells_by_name()[well['well']]
+
+    def liquid(self, move, source):
+        if 'liquid' in move:
+            return move['liquid']
+        return self.spec['reagents'].get(source, {}).get('liquid')
+
+    def fill(self, name, volume):
+        """
+        a reagent tube holds what the rest of the step draws plus reagent_excess
+        """
+        self.volumes.set(self.reagent(name), volume + self.settings['reagent_excess'])
+
+    def run_distribute(self, step, n, stage):
+        columns = self.remaining(n)
+        volumes = self.volumes_of(step['volume'])
+        volumes = [volumes[i] for i in columns]
+        dest = self.cols[step['dest']]
+        self.fill(step['reagent'], sum(volumes))
+        contact = [step.get('contact', False)] * len(columns)
+        with self.pipette.liquid(self.liquid(step, step['reagent'])):
+            distribute(self.pipette, volumes, self.reagent(step['reagent']), [dest.bottom(i) for i in columns],
+                       self._pick_up, disposal_volume=self.settings['disposal_volume'],
+                       max_volume=self.settings['fill_volume'], contact=contact,
+                       dispensed=lambda k: self.checkpoint(n, stage, columns[k]))
+
+    def run_columns(self, moves, n, stage):
+        pipette = self.pipette
+        columns = self.remaining(n)
+        for move in moves:
+            if move['source'] in self.spec['reagents']:
+                volumes = self.volumes_of(move['volume'])
+                self.fill(move['source'], sum(volumes[i] for i in columns))
+        for i in columns:
+            self._pick_up(pipette)
+            for move in moves:
+                volume = self.volumes_of(move['volume'])[i]
+                if move['source'] in self.spec['reagents']:
+                    source = self.reagent(move['source'])
+                else:
+                    source = self.cols[move['source']].bottom(i)
+                dest = self.cols[move['dest']]
+                with pipette.liquid(self.liquid(move, move['source'])):
+                    pipette.aspirate(volume, source)
+                    pipette.dispense(volume, dest.bottom(i))
+                if move.get('mix'):
+                    pipette.mix(self.settings['mix_reps'], self.mix_volume(move), rate=self.settings['mix_rate'],
+                                location=dest.mix(i))
+            pipette.drop_tip(home_after=i == columns[-1])
+            self.checkpoint(n, stage, i)
+
+    def mix_volume(self, move):
+        """
+        the mix_volume setting (otkit.mixstudy), never more than the move's mix volume
+        """
+        if self.settings['mix_volume'] is None:
+            return move['mix']
+        return min(self.settings['mix_volume'], move['mix'])
+
+    def index_pair(self, plate_set):
+        return (self.settings['index_pair'] or 1) + plate_set
+
+    def swap_message(self, plate_set, sets):
+        slots = ', '.join('{} on {}'.format(alias, definition['slot'])
+                          for alias, definition in self.spec['labware'].items())
+        return 'Then load plate set {}/{}: {}, and have index plate pair {} ready.'.format(
+            plate_set + 1, sets, slots, self.index_pair(plate_set))
+
+    def plate_set_steps(self, k, sets):
+        """
+        scheduled steps of plate set k, numbered apart from the other sets for the journal;
+        the last pause of every set but the last also asks for the next set, and the pauses
+        name the set and its index plate pair
+        """
+        stride = len(self.spec['steps']) + 1
+        ordered = schedule(select_steps(self.spec['steps'], self.stages))
+        if k + 1 < sets:
+            pauses = [i for i, (_, _, step) in enumerate(ordered) if 'pause' in step]
+            if pauses:
+                n, stage, step = ordered[pauses[-1]]
+                ordered[pauses[-1]] = (n, stage, dict(step, pause=step['pause'] + ' ' + self.swap_message(k + 1, sets)))
+            else:
+                ordered.append((len(self.spec['steps']), None, {'pause': self.swap_message(k + 1, sets)}))
+        if sets > 1 or self.settings['index_pair'] is not None:
+            ordered = [(n, stage, dict(step, pause='Plate set {}/{}, index pair {}: {}'.format(
+                k + 1, sets, self.index_pair(k), step['pause'])))
+                if 'pause' in step else (n, stage, step) for n, stage, step in ordered]
+        return [(None if n is None else k * stride + n, stage, step) for n, stage, step in ordered]
+
+    @staticmethod
+    def tips_of(step, col_num):
+        """
+        tip pickups of a step over col_num columns: one per column, or one for a distribute
+        into empty columns
+        """
+        if 'distribute' in step:
+            return col_num if step['distribute'].get('contact', False) else 1
+        return col_num if 'columns' in step else 0
+
+    def run(self):
+        self.setup()
+        resuming = self.journal is not None and self.journal.entries
+        sets = plate_sets(self.total)
+        steps = []
+        for k, (first, col_num) in enumerate(sets):
+            # a (first, columns) marker where the deck is reloaded with the next plate set
+            steps.append((None, None, {'plate_set': (first, col_num)}))
+            steps.extend(self.plate_set_steps(k, len(sets)))
+        # tip pickups after each step, for the refills at pauses
+        tips = []
+        for _, _, step in steps:
+            col_num = step['plate_set'][1] if 'plate_set' in step else col_num
+            tips.append(self.tips_of(step, col_num))
+        tips_after = [sum(tips[j + 1:]) for j in range(len(tips))]
+        for j, (n, stage, step) in enumerate(steps):
+            if 'plate_set' in step:
+                self.first, self.col_num = step['plate_set']
+                if self.first:
+                    for alias, definition in self.spec['labware'].items():
+                        self.load(alias, definition)
+                continue
+            if 'load' in step:
+                for alias, definition in step['load'].items():
+                    self.load(alias, definition)
+                continue
+            if self.journal is not None and self.journal.is_done(n):
+                if 'incubate' in step:
+                    # the incubation went on while the run was down
+                    incubate = step['incubate']
+                    self.timers.start(incubate['name'], incubate['minutes'], self.journal.entry(n).get('started'),
+                                      self.journal.stopped())
+                continue
+            if resuming:
+                # load steps before this point have run, so every tracked plate is on the deck
+                self.restore()
+                resuming = False
+            if 'wait' in step:
+                self.protocol.comment('Stage: {} incubation'.format(step['wait']))
+                self.timers.wait(step['wait'])
+                continue
+            if 'stage' in step:
+                self.protocol.comment('Stage: ' + step['stage'])
+            if 'incubate' in step:
+                started = self.timers.start(step['incubate']['name'], step['incubate']['minutes'])
+                self.checkpoint(n, stage, started=started)
+                continue
+            if 'distribute' in step:
+                self.run_distribute(step['distribute'], n, stage)
+            elif 'columns' in step:
+                self.run_columns(step['columns'], n, stage)
+            elif 'pause' in step:
+                with self.alert:
+                    pause_with_refill(self.protocol, self.tipracks, step['pause'], tips_after[j])
+            self.checkpoint(n, stage)
+        self.protocol.comment('Protocol complete!')
+        if self.profiler is not None:
+            self.profiler.save(self.settings['profile'])
+            print(self.profiler.summary())
+        if self.command_log is not None:
+            self.command_log.close()
+
+
+def run_assay(protocol, spec, col_num=None, settings=None, stages=None):
+    AssayRun(protocol, spec, col_num, settings, stages).run()
+
+
+PROTOCOL_TEMPLATE = '''"""
+{name}
+compiled from {source} by otkit.assay, edit the spec and recompile
+"""
+
+import os
+import sys
+
+from opentrons import protocol_api
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.assay import run_assay
+
+metadata = {metadata}
+
+################{config_title} configuration################
+col_num = {col_num}    # above 12 runs a batch of plate sets, 12 columns each
+{settings}
+################End {config_title} configuration################
+
+stages = {stages!r}
+spec = {spec}
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    settings = {{name: globals()[name] for name in spec['settings']}}
+    run_assay(protocol, spec, col_num, settings, stages)
+'''
+
+
+def compile_spec(spec, source, stages=None):
+    """
+    protocol file source that runs the spec; settings become module-level configuration
+    """
+    spec = dict(spec, settings=dict(DEFAULT_SETTINGS, **spec.get('settings', {})))
+    metadata = {'protocolName': spec['name'], 'author': spec.get('author', ''), 'apiLevel': spec.get('api_level', '2.13')}
+    settings = '\n'.join('{} = {!r}'.format(name, value) for name, value in spec['settings'].items())
+    return PROTOCOL_TEMPLATE.format(
+        name=spec['name'] + (' (stages: {})'.format(', '.join(stages)) if stages else ''),
+        source=source,
+        metadata=pprint.pformat(metadata, sort_dicts=False),
+        config_title=spec['name'],
+        col_num=spec['columns'],
+        settings=settings,
+        stages=stages,
+        spec=pprint.pformat(spec, sort_dicts=False, width=110),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('spec', help='assay spec, .yaml or .json')
+    parser.add_argument('-o', '--output', help='protocol file to write, default: print it')
+    parser.add_argument('--stages', help='comma separated stages to keep, e.g. "index,PCR mix"')
+    args = parser.parse_args()
+    spec = load_spec(args.spec)
+    stages = args.stages.split(',') if args.stages else None
+    source = compile_spec(spec, os.path.relpath(args.spec), stages)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(source)
+    else:
+        print(source)
+
+
+if __name__ == '__main__':
+    main()
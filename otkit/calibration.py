@@ -0,0 +1,197 @@
+"""
+Volume calibration curves
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Fit volume corrections per pipette, tip rack and liquid class from calibration results
+(the protocols/test runs: dilution.py, mix.py, viscous.py, tracklevel.py) and store them for
+the robot:
+
+    python -m otkit.calibration viscous_2026-10.csv dilution_2026-10.csv -o calibration/curves.json
+    python -m otkit.calibration --show calibration/curves.json
+
+Result CSVs have one row per measured dispense with columns
+pipette, tiprack, liquid, target_ul and one of
+    measured_ul                   volume measured by any method
+    mass_mg [, density_g_ml]      gravimetric, density 1.0 when left out
+    signal [, kind]               fluorescence; rows with kind=standard hold a known
+                                  volume in target_ul and set the linear signal scale
+e.g.
+    pipette,tiprack,liquid,target_ul,mass_mg,density_g_ml
+    p20_multi_gen2,axygen_96_diytiprack_10ul,tn5_mix,2,2.31,1.15
+
+A curve maps the volume asked for to the volume to command, so the delivered volume is the
+one asked for. LiquidPipette applies it to every aspirate and dispense of that liquid class
+when the assay `calibration` setting points at the stored file.
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+GRID_POINTS = 50
+
+
+def _measured(row, scale):
+    if row.get('measured_ul'):
+        return float(row['measured_ul'])
+    if row.get('mass_mg'):
+        return float(row['mass_mg']) / float(row.get('density_g_ml') or 1.0)
+    return scale(float(row['signal']))
+
+
+def _signal_scales(rows):
+    """
+    signal -> ul per (pipette, tiprack, liquid), fitted to the standard rows
+    """
+    standards = {}
+    for row in rows:
+        if row.get('kind') == 'standard':
+            standards.setdefault(_group(row), []).append((float(row['signal']), float(row['target_ul'])))
+    scales = {}
+    for group, points in standards.items():
+        signal, volume = np.array(points).T
+        slope, intercept = np.polyfit(signal, volume, 1)
+        scales[group] = lambda s, slope=slope, intercept=intercept: slope * s + intercept
+    return scales
+
+
+def _group(row):
+    return (row['pipette'], row['tiprack'], row['liquid'])
+
+
+def read_results(paths):
+    """
+    {(pipette, tiprack, liquid): (target array, measured array)}
+    """
+    rows = []
+    for path in paths:
+        with open(path, newline='') as f:
+            rows.extend(csv.DictReader(f))
+    scales = _signal_scales(rows)
+    points = {}
+    for row in rows:
+        if row.get('kind') == 'standard':
+            continue
+        group = _group(row)
+        points.setdefault(group, []).append((float(row['target_ul']), _measured(row, scales.get(group))))
+    return {group: tuple(np.array(p).T) for group, p in points.items()}
+
+
+def fit_curve(target, measured):
+    """
+    {'requested': [...], 'commanded': [...]} over the measured range; a straight line
+    through the means, a quadratic from 4 distinct volumes on
+    """
+    degree = 2 if len(np.unique(target)) >= 4 else 1
+    if len(np.unique(target)) < 2:
+        # one volume: a single gain
+        gain = measured.mean() / target.mean()
+        return {'requested': [float(target.mean())], 'commanded': [float(target.mean() / gain)], 'degree': 0}
+    delivered = np.poly1d(np.polyfit(target, measured, degree))
+    commanded = np.linspace(target.min(), target.max(), GRID_POINTS)
+    requested = delivered(commanded)
+    if np.any(np.diff(requested) <= 0):
+        raise ValueError('delivered volume does not rise with the commanded volume; check the results')
+    return {'requested': requested.round(4).tolist(), 'commanded': commanded.round(4).tolist(), 'degree': degree}
+
+
+def fit(results):
+    curves = {}
+    for (pipette, tiprack, liquid), (target, measured) in sorted(results.items()):
+        curve = fit_curve(target, measured)
+        curve.update(points=len(target), bias=float((measured.mean() - target.mean()) / target.mean()),
+                     cv=float(_cv(target, measured)))
+        curves.setdefault(pipette, {}).setdefault(tiprack, {})[liquid] = curve
+    return curves
+
+
+def _cv(target, measured):
+    """
+    mean coefficient of variation over the target volumes
+    """
+    cvs = [measured[target == t].std() / measured[target == t].mean()
+           for t in np.unique(target) if (target == t).sum() > 1]
+    return np.mean(cvs) if cvs else 0.0
+
+
+def save_curves(curves, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(curves, f, indent=1)
+
+
+def load_curves(path):
+    """
+    stored curves, {} when there is no file (an uncalibrated robot)
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class Correction:
+    """
+    volume to command for a requested volume; outside the calibrated range the gain at the
+    nearest end applies
+    """
+
+    def __init__(self, curve):
+        self.requested = np.asarray(curve['requested'])
+        self.gain = np.asarray(curve['commanded']) / self.requested
+
+    def __call__(self, volume):
+        if volume <= 0:
+            return volume
+        return float(volume * np.interp(volume, self.requested, self.gain))
+
+
+def corrections(curves, pipette, tiprack):
+    """
+    {liquid class: Correction} for one pipette and tip rack
+    """
+    return {liquid: Correction(curve) for liquid, curve in curves.get(pipette, {}).get(tiprack, {}).items()}
+
+
+def report(curves):
+    lines = ['{:<16} {:<28} {:<10} {:>6} {:>7} {:>6}  {}'.format(
+        'pipette', 'tiprack', 'liquid', 'points', 'bias', 'cv', 'command for 1/2/5/10 ul')]
+    for pipette, racks in curves.items():
+        for tiprack, liquids in racks.items():
+            for liquid, curve in liquids.items():
+                correct = Correction(curve)
+                lines.append('{:<16} {:<28} {:<10} {:>6} {:>+6.1f}% {:>5.1f}%  {}'.format(
+                    pipette, tiprack, liquid, curve['points'], 100 * curve['bias'], 100 * curve['cv'],
+                    ' '.join('{:.2f}'.format(correct(v)) for v in [1, 2, 5, 10])))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('results', nargs='*', help='calibration result CSVs')
+    parser.add_argument('-o', '--output', default='calibration/curves.json', help='curve file to write')
+    parser.add_argument('--show', metavar='CURVES', help='print a stored curve file instead of fitting')
+    args = parser.parse_args()
+    if args.show:
+        print(report(load_curves(args.show)))
+        return
+    if not args.results:
+        parser.error('give result CSVs or --show')
+    curves = load_curves(args.output)
+    for pipette, racks in fit(read_results(args.results)).items():
+        for tiprack, liquids in racks.items():
+            curves.setdefault(pipette, {}).setdefault(tiprack, {}).update(liquids)
+    save_curves(curves, args.output)
+    print(report(curves))
+    print('curves in {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Contamination-aware tip reuse planner
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Follow what every well and every tip has touched through a simulated trace, then find the
+fewest tips that never carry a liquid into a well that would not get it anyway:
+
+    python -m otkit.carryover protocols/CHARM_libprep/libprep.charm.py
+    python -m otkit.carryover protocols/libprep/Pool96_to_8.py
+
+Each well that is drawn from before anything is dispensed into it holds its own liquid
+(a sample column, an index column, a reagent tube). Transfers spread liquids the way the
+protocol intends; a tip picks up the liquids it aspirates and, when it dispenses into a well
+that already holds liquid, the liquids of that well. Reusing a tip is safe while every well
+it enters ends up holding all the liquids on the tip. Tips only change when they are empty.
+"""
+
+import argparse
+
+from otkit.trace import parse_overrides, simulate_protocol, split_stages
+
+LIQUID_COMMANDS = {'aspirate', 'dispense', 'blow_out'}
+
+
+def _label(key):
+    slot, well, plate = key
+    return '{}:{}'.format(slot, well) if plate == 0 else '{}:{} (plate {})'.format(slot, well, plate + 1)
+
+
+def liquid_ops(trace):
+    """
+    aspirate, dispense and blow out entries with the liquids in their well just before,
+    the liquids every well holds at the end, and the stage of each op
+    """
+    stage_of = {}
+    for name, entries in split_stages(trace):
+        for entry in entries:
+            stage_of[id(entry)] = name
+    contents = {}
+    plates = {}     # labware loaded on each slot so far, a swapped-in plate holds new liquids
+    ops = []
+    liquid = frozenset()
+    last = None
+    for entry in trace:
+        if entry['command'] == 'load_labware':
+            plates[entry['slot']] = plates.get(entry['slot'], -1) + 1
+            continue
+        if entry['command'] not in LIQUID_COMMANDS or not entry.get('well'):
+            continue
+        key = (entry['slot'], entry['well'], plates.get(entry['slot'], 0))
+        if entry['command'] == 'aspirate':
+            held = contents.setdefault(key, frozenset([_label(key)]))
+            liquid = held if last != 'aspirate' else liquid | held
+        else:
+            held = contents.get(key, frozenset())
+            contents[key] = held | liquid
+        ops.append({'entry': entry, 'key': key, 'held': held, 'stage': stage_of.get(id(entry), 'setup')})
+        last = entry['command']
+    return ops, contents
+
+
+def _tip_contact(tip, op):
+    """
+    liquids on the tip after op
+    """
+    if op['entry']['command'] in ('aspirate', 'dispense'):
+        return tip | op['held']     # dispensing into a wet well wets the tip too
+    return tip
+
+
+def _unsafe(tip, op, final):
+    """
+    liquids the tip would carry into the op's well that the well does not get anyway
+    """
+    return tip - final.get(op['key'], frozenset())
+
+
+def empty_tip_blocks(ops):
+    """
+    ops grouped into runs that start and end with an empty tip
+    """
+    blocks = [[]]
+    volume = 0.0
+    for op in ops:
+        entry = op['entry']
+        blocks[-1].append(op)
+        if entry['command'] == 'aspirate':
+            volume += entry.get('volume', 0)
+        elif entry['command'] == 'dispense':
+            volume -= entry.get('volume', 0)
+        if entry['command'] == 'blow_out' or (entry['command'] == 'dispense' and volume < 1e-6):
+            volume = 0.0
+            blocks.append([])
+    return [block for block in blocks if block]
+
+
+def _run_block(tip, block, final):
+    for op in block:
+        if _unsafe(tip, op, final):
+            return None
+        tip = _tip_contact(tip, op)
+    return tip
+
+
+def plan_tips(ops, final):
+    """
+    fewest tips for the ops in run order: keep the tip for the next block while that is safe.
+    safety only gets harder as a tip collects liquids, so keeping it as long as possible is optimal.
+    returns the stage of each planned tip pickup
+    """
+    pickups = []
+    tip = None
+    for block in empty_tip_blocks(ops):
+        kept = _run_block(tip, block, final) if tip is not None else None
+        if kept is None:
+            pickups.append(block[0]['stage'])
+            kept = _run_block(frozenset(), block, final)
+        tip = kept
+    return pickups
+
+
+def current_tips(trace, ops, final):
+    """
+    stage of each tip the protocol picks up, and the reuses that carry liquid where it should not go
+    """
+    op_of = {id(op['entry']): op for op in ops}
+    stage_of = {}
+    for name, entries in split_stages(trace):
+        for entry in entries:
+            stage_of[id(entry)] = name
+    pickups = []
+    violations = []
+    tip = frozenset()
+    for entry in trace:
+        if entry['command'] == 'pick_up_tip' and entry.get('level', 0) == 0:
+            pickups.append(stage_of.get(id(entry), 'setup'))
+            tip = frozenset()
+        elif id(entry) in op_of:
+            op = op_of[id(entry)]
+            unsafe = _unsafe(tip, op, final)
+            if unsafe and not (violations and violations[-1]['tip'] == len(pickups)):
+                # the first place each tip carries liquid where it should not go
+                violations.append({'stage': op['stage'], 'tip': len(pickups), 'well': _label(op['key']),
+                                   'command': entry['command'], 'liquids': sorted(unsafe)})
+            tip = _tip_contact(tip, op)
+    return pickups, violations
+
+
+def plan(trace):
+    ops, final = liquid_ops(trace)
+    current, violations = current_tips(trace, ops, final)
+    planned = plan_tips(ops, final)
+    stages = []
+    for stage in current + planned:
+        if stage not in stages:
+            stages.append(stage)
+    return {
+        'stages': [(stage, current.count(stage), planned.count(stage)) for stage in stages],
+        'current': len(current),
+        'planned': len(planned),
+        'violations': violations,
+    }
+
+
+def _policy(tips):
+    return 'one tip' if tips == 1 else '{} tips'.format(tips)
+
+
+def report(result):
+    lines = ['{:<28} {:>8} {:>8}'.format('stage', 'current', 'planned')]
+    for stage, current, planned in result['stages']:
+        lines.append('{:<28} {:>8} {:>8}  {}'.format(stage[:28], current, planned, _policy(planned)))
+    lines.append('')
+    if result['violations']:
+        lines.append('carryover in the current protocol:')
+        for v in result['violations']:
+            lines.append('  {} tip {}: {} {} with {}'.format(
+                v['stage'], v['tip'], v['command'], v['well'], ', '.join(v['liquids'])))
+    else:
+        lines.append('no carryover in the current protocol')
+    lines.append('')
+    saved = result['current'] - result['planned']
+    lines.append('{} tips now, {} planned: {} {}'.format(
+        result['current'], result['planned'], abs(saved), 'saved' if saved >= 0 else 'more needed to stop carryover'))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocol')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a module-level setting, e.g. col_num=6')
+    args = parser.parse_args()
+    print(report(plan(simulate_protocol(args.protocol, parse_overrides(args.set)))))
+
+
+if __name__ == '__main__':
+    main()
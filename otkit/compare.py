@@ -0,0 +1,184 @@
+"""
+Cost of the differences between two protocols
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Run two protocols (or variants of one, or saved traces), line their stages up and report,
+stage by stage, the change in robot time, tips, reagent drawn and gantry travel:
+
+    python -m otkit.compare protocols/CHARM_libprep/libprep.charm.py protocols/HiRES_libprep/hires_libprep.py
+    python -m otkit.compare protocols/CHARM_libprep/libprep.charm.py protocols/CHARM_libprep/libprep.charm.py \
+        --set-b flow_rate=7.5 --commands 10
+    python -m otkit.compare charm.trace.json runs/charm.commands.jsonl
+
+Stages with the same name are paired in run order; between them, stages are paired by the
+closest name ('SDS split' with 'SDS'), a stage that matches several on the other side is
+reported with all of them as one row ('index' with 'i5 index + i7 index'), and the rest are
+listed as only in one protocol. Times are otkit.estimate; reagent is what the reagent wells give up
+(otkit.sweep). --commands N also lists the first N commands that differ in each stage pair.
+"""
+
+import argparse
+import difflib
+
+from otkit.estimate import estimate, format_seconds
+from otkit.golden import diff, golden_entries
+from otkit.sweep import reagent_flows
+from otkit.trace import load_trace, parse_overrides, simulate_protocol, split_stages
+from otkit.virtual import run_protocol
+
+NAME_MATCH = 0.5    # least name similarity for pairing differently named stages
+
+
+def load(source, overrides=None, engine='virtual'):
+    """
+    trace of a protocol file, or a saved trace or command log
+    """
+    if source.endswith(('.json', '.jsonl')):
+        return load_trace(source)
+    return (simulate_protocol if engine == 'opentrons' else run_protocol)(source, overrides)
+
+
+def stage_costs(trace):
+    """
+    (name, costs, entries) per stage: seconds, travel, tips, commands and reagent ul
+    """
+    flows = {}
+    for entry, _, volume in reagent_flows(trace):
+        flows[id(entry)] = flows.get(id(entry), 0.0) + volume
+    # estimate() keeps the stages of split_stages in order, less an empty setup
+    by_name = {}
+    for stage in estimate(trace)['stages']:
+        by_name.setdefault(stage['stage'], []).append(stage)
+    stages = []
+    for name, entries in split_stages(trace):
+        if not by_name.get(name):
+            continue
+        costs = dict(by_name[name].pop(0))
+        costs['reagent'] = sum(flows.get(id(entry), 0.0) for entry in entries)
+        stages.append((name, costs, entries))
+    return stages
+
+
+def _similarity(x, y):
+    return difflib.SequenceMatcher(None, x.lower(), y.lower()).ratio()
+
+
+def align(a, b):
+    """
+    groups of indices into the stage name lists a and b, ([i], [j]) for a pair and [] where
+    a stage has no partner; a differently named pair takes in the stages left over on
+    either side that match its names as well ('index' with 'i5 index' and 'i7 index')
+    """
+    pairs = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            pairs.extend(zip(range(i1, i2), range(j1, j2)))
+            continue
+        j = j1
+        for i in range(i1, i2):
+            scores = [(_similarity(a[i], b[k]), k) for k in range(j, j2)]
+            score, k = max(scores) if scores else (0, None)
+            if score < NAME_MATCH:
+                pairs.append((i, None))
+                continue
+            pairs.extend((None, skipped) for skipped in range(j, k))
+            pairs.append((i, k))
+            j = k + 1
+        pairs.extend((None, k) for k in range(j, j2))
+    groups = [([i] if i is not None else [], [j] if j is not None else []) for i, j in pairs]
+    for group in groups:
+        if not group[0] or not group[1] or a[group[0][0]] == b[group[1][0]]:
+            continue
+        for side, names, other in ((1, b, a[group[0][0]]), (0, a, b[group[1][0]])):
+            for left in groups:
+                if left is not group and not left[1 - side] and left[side] and \
+                        _similarity(other, names[left[side][0]]) >= NAME_MATCH:
+                    group[side].extend(left[side])
+                    left[side].clear()
+    return [group for group in groups if group[0] or group[1]]
+
+
+def _signed_time(seconds):
+    return ('+' if seconds >= 0 else '-') + format_seconds(abs(seconds))
+
+
+def _merged(stages):
+    """
+    one (name, costs, entries) for stages reported together, (None, None, []) for none
+    """
+    if not stages:
+        return None, None, []
+    if len(stages) == 1:
+        return stages[0]
+    costs = {key: sum(stage[1][key] for stage in stages)
+             for key, value in stages[0][1].items() if isinstance(value, (int, float))}
+    return (' + '.join(stage[0] for stage in stages), costs,
+            [entry for stage in stages for entry in stage[2]])
+
+
+def compare(trace_a, trace_b):
+    """
+    rows of (name a, name b, costs a, costs b, entries a, entries b) in run order
+    """
+    a, b = stage_costs(trace_a), stage_costs(trace_b)
+    rows = []
+    for group_a, group_b in align([name for name, _, _ in a], [name for name, _, _ in b]):
+        name_a, costs_a, entries_a = _merged([a[i] for i in group_a])
+        name_b, costs_b, entries_b = _merged([b[j] for j in group_b])
+        rows.append((name_a, name_b, costs_a, costs_b, entries_a, entries_b))
+    return rows
+
+
+def report(rows, trace_a, trace_b, commands=0):
+    empty = {'seconds': 0.0, 'tips': 0, 'reagent': 0.0, 'travel': 0.0}
+    header = '{:<34} {:>9} {:>9} {:>9} {:>4} {:>4} {:>4} {:>7} {:>7} {:>7} {:>6} {:>6} {:>6}'
+    lines = ['{:<34} {:^29} {:^14} {:^23} {:^20}'.format('', 'time', 'tips', 'reagent ul', 'travel m'),
+             header.format('stage (A / B)', 'A', 'B', 'delta', 'A', 'B', 'delta', 'A', 'B', 'delta', 'A', 'B', 'delta')]
+
+    def row(label, x, y):
+        x, y = x or empty, y or empty
+        return '{:<34} {:>9} {:>9} {:>9} {:>4} {:>4} {:>+4} {:>7.1f} {:>7.1f} {:>+7.1f} {:>6.1f} {:>6.1f} {:>+6.1f}'.format(
+            label[:34], format_seconds(x['seconds']), format_seconds(y['seconds']),
+            _signed_time(y['seconds'] - x['seconds']), x['tips'], y['tips'], y['tips'] - x['tips'],
+            x['reagent'], y['reagent'], y['reagent'] - x['reagent'],
+            x['travel'] / 1000, y['travel'] / 1000, (y['travel'] - x['travel']) / 1000)
+
+    for name_a, name_b, costs_a, costs_b, entries_a, entries_b in rows:
+        label = name_a if name_a == name_b else '{} / {}'.format(name_a or '-', name_b or '-')
+        lines.append(row(label, costs_a, costs_b))
+        if commands and entries_a and entries_b:
+            lines.extend('    ' + line for line in diff(golden_entries(entries_a), golden_entries(entries_b), commands)[:-1])
+    total = []
+    for trace in (trace_a, trace_b):
+        result = estimate(trace)['total']
+        result['reagent'] = sum(volume for _, _, volume in reagent_flows(trace))
+        total.append(result)
+    lines.append('')
+    lines.append(row('total', *total))
+    lines.append('{:<34} {:>9} {:>9} {:>+9}'.format('commands', total[0]['commands'], total[1]['commands'],
+                                                    total[1]['commands'] - total[0]['commands']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('a', help='protocol file, saved trace or command log')
+    parser.add_argument('b', help='protocol file, saved trace or command log')
+    parser.add_argument('--set-a', action='append', metavar='NAME=VALUE', help='override a setting of A')
+    parser.add_argument('--set-b', action='append', metavar='NAME=VALUE', help='override a setting of B')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a setting of both, e.g. col_num=6')
+    parser.add_argument('--commands', type=int, default=0, help='list this many differing commands per stage')
+    parser.add_argument('--opentrons', action='store_true', help='simulate with opentrons instead of otkit.virtual')
+    args = parser.parse_args()
+    engine = 'opentrons' if args.opentrons else 'virtual'
+    both = parse_overrides(args.set)
+    trace_a = load(args.a, dict(both, **parse_overrides(args.set_a)), engine)
+    trace_b = load(args.b, dict(both, **parse_overrides(args.set_b)), engine)
+    print('A {}\nB {}\n'.format(args.a, args.b))
+    print(report(compare(trace_a, trace_b), trace_a, trace_b, args.commands))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Compile Python protocols into JSON command protocols
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Run a protocol once for a given configuration (module-level settings) on the virtual OT-2
+(otkit.virtual) and write what it did as a JSON protocol (schema 6): the labware with their
+definitions, the pipettes and every resolved command, wells and offsets included. The robot
+loads that without running any Python, so upload and analysis take a fraction of the time,
+and the file can be cached per configuration and diffed between versions:
+
+    python -m otkit.compile protocols/CHARM_libprep/libprep.charm.py --set col_num=6 -o charm.6.json
+    python -m otkit.compile protocols/HiRES_libprep/hires_libprep.py --opentrons
+
+The file records a fingerprint of the protocol source, the settings and the custom labware
+in 3Dprinting/; a file whose fingerprint is current is not compiled again (--force does).
+A mix or return_tip becomes the commands it is made of, a delay waitForDuration and a pause
+waitForResume. A plate loaded on an occupied slot (del protocol.deck[...] in the script) keeps
+the labware id of the one it replaces, with a comment where it comes in; schema 6 cannot move
+labware, so a slot that changes to another kind of labware is an error. The compiled protocol is
+one fixed run: Python logic that depends on the robot (a sensor, is_simulating) is resolved
+the way it went in the simulation.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+
+from otkit.trace import LABWARE_DIR, load_labware_defs, parse_overrides, simulate_protocol
+from otkit.virtual import PIPETTES, TRASH_SLOT, Labware, run_protocol, standard_definition
+
+SCHEMA = '#/protocol/schemas/6'
+ROBOT = {'model': 'OT-2 Standard', 'deckId': 'ot2_standard'}
+TRASH_ID = 'fixedTrash'
+TRASH_LOAD_NAME = 'opentrons_1_trash_1100ml_fixed'
+# trace command: JSON command type and the well origin its offset is taken from
+WELL_COMMANDS = {
+    'aspirate': ('aspirate', 'bottom'),
+    'dispense': ('dispense', 'bottom'),
+    'blow_out': ('blowout', 'top'),
+    'touch_tip': ('touchTip', 'top'),
+    'move_to': ('moveToWell', 'top'),
+}
+# commands the trace records around the ones they are made of
+PARENT_COMMANDS = {'mix', 'return_tip'}
+
+
+def fingerprint(path, overrides=None, labware_dir=LABWARE_DIR):
+    """
+    sha256 of the protocol source, the settings and the custom labware definitions
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps(overrides or {}, sort_keys=True).encode())
+    digest.update(json.dumps(load_labware_defs(labware_dir), sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def protocol_metadata(path):
+    """
+    the metadata dict a protocol script assigns, read without running it
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == 'metadata' for t in node.targets):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return {}
+    return {}
+
+
+def definition_id(definition):
+    return '{}/{}/{}'.format(definition['namespace'], definition['parameters']['loadName'], definition['version'])
+
+
+def _offset(point, origin):
+    return {axis: round(a - b, 3) + 0.0 for axis, a, b in zip('xyz', point, origin)}
+
+
+class Compiler:
+    """
+    turns a trace into the labware, pipettes and commands of a JSON protocol
+    """
+
+    def __init__(self, labware_dir=LABWARE_DIR):
+        self.custom = load_labware_defs(labware_dir)
+        self.definitions = {}
+        self.labware = {}
+        self.pipettes = {}
+        self.commands = []
+        self._on_deck = {}      # slot: (labware id, virtual labware for its geometry)
+        self._rack_owner = {}   # tip rack slot: pipette id
+        self._holding = []      # pipette ids with a tip on
+        self._last_pipette = None
+        self.load_labware(TRASH_LOAD_NAME, TRASH_SLOT, TRASH_ID)
+
+    def definition(self, load_name):
+        if load_name in self.custom:
+            return self.custom[load_name]
+        definition = standard_definition(load_name)
+        if definition is None:
+            raise FileNotFoundError('Unable to find a labware definition for "{}"'.format(load_name))
+        return definition
+
+    def add(self, command_type, **params):
+        self.commands.append({'commandType': command_type, 'params': params})
+
+    def load_labware(self, load_name, slot, labware_id=None):
+        definition = self.definition(load_name)
+        self.definitions[definition_id(definition)] = definition
+        if slot in self._on_deck:
+            # schema 6 has no labware move: a fresh plate of the same kind is the same labware to the robot
+            labware_id = self._on_deck[slot][0]
+            if self.labware[labware_id]['definitionId'] != definition_id(definition):
+                raise ValueError('slot {} changes from {} to {}; a JSON protocol (schema 6) cannot move labware'.format(
+                    slot, self.labware[labware_id]['definitionId'], definition_id(definition)))
+            self.add('comment', message='New {} on slot {}'.format(definition['metadata']['displayName'], slot))
+            return
+        labware_id = labware_id or 'labware-{}'.format(slot)
+        self.labware[labware_id] = {'definitionId': definition_id(definition),
+                                    'displayName': definition['metadata']['displayName']}
+        self._on_deck[slot] = (labware_id, Labware(definition, slot))
+        if labware_id != TRASH_ID:    # the robot loads its fixed trash itself
+            self.add('loadLabware', labwareId=labware_id, location={'slotName': slot})
+
+    def load_pipette(self, name, mount, tip_racks):
+        pipette_id = 'pipette-{}'.format(mount)
+        self.pipettes[pipette_id] = {'name': name}
+        for slot in tip_racks:
+            self._rack_owner[slot] = pipette_id
+        self.add('loadPipette', pipetteId=pipette_id, mount=mount)
+
+    def pipette(self, entry):
+        """
+        id of the pipette a command is for: the one whose tip rack a tip comes from, the one
+        holding a tip, or the last one used
+        """
+        if not self.pipettes:
+            raise ValueError('{} before any pipette is loaded'.format(entry['command']))
+        if entry['command'] == 'pick_up_tip' and entry.get('slot') in self._rack_owner:
+            pipette_id = self._rack_owner[entry['slot']]
+        elif len(self.pipettes) == 1:
+            pipette_id = next(iter(self.pipettes))
+        elif len(self._holding) == 1:
+            pipette_id = self._holding[0]
+        elif self._last_pipette is not None and entry['command'] != 'pick_up_tip':
+            pipette_id = self._last_pipette
+        else:
+            raise ValueError('cannot tell which pipette runs "{}"'.format(entry.get('text', entry['command'])))
+        self._last_pipette = pipette_id
+        return pipette_id
+
+    def well(self, entry, origin):
+        """
+        labwareId, wellName and wellLocation of a command at a well
+        """
+        labware_id, labware = self._on_deck[entry['slot']]
+        well = labware[entry['well']]
+        reference = well.bottom() if origin == 'bottom' else well.top()
+        point = (entry['x'], entry['y'], entry['z'])
+        return {'labwareId': labware_id, 'wellName': entry['well'],
+                'wellLocation': {'origin': origin, 'offset': _offset(point, reference.point)}}
+
+    def command(self, entry):
+        command = entry['command']
+        if command == 'load_labware':
+            self.load_labware(entry['load_name'], entry['slot'])
+        elif command == 'load_instrument':
+            self.load_pipette(entry['instrument'], entry['mount'], entry.get('tip_racks', []))
+        elif command in PARENT_COMMANDS:
+            return
+        elif command == 'comment':
+            self.add('comment', message=entry.get('message', ''))
+        elif command == 'pause':
+            self.add('waitForResume', message=entry.get('message', ''))
+        elif command == 'delay':
+            self.add('waitForDuration', seconds=entry['seconds'], message=entry.get('text', ''))
+        elif command == 'home':
+            self.add('home')
+        elif command in ('pick_up_tip', 'drop_tip'):
+            pipette_id = self.pipette(entry)
+            if command == 'pick_up_tip':
+                self._holding.append(pipette_id)
+            elif pipette_id in self._holding:
+                self._holding.remove(pipette_id)
+            well = self.well(entry, 'top')
+            del well['wellLocation']    # the robot's own pick-up and drop positions
+            self.add('pickUpTip' if command == 'pick_up_tip' else 'dropTip', pipetteId=pipette_id, **well)
+        elif command in WELL_COMMANDS:
+            command_type, origin = WELL_COMMANDS[command]
+            pipette_id = self.pipette(entry)
+            params = {'pipetteId': pipette_id}
+            if command in ('aspirate', 'dispense'):
+                params.update(volume=entry['volume'], flowRate=entry['rate'])
+            elif command == 'blow_out':
+                params['flowRate'] = PIPETTES[self.pipettes[pipette_id]['name']][3]
+            if entry.get('well') is not None:
+                params.update(self.well(entry, origin))
+                self.add(command_type, **params)
+            elif command == 'blow_out':
+                self.add('blowOutInPlace', **params)
+            elif command == 'move_to' and entry.get('x') is not None:
+                self.add('moveToCoordinates', pipetteId=pipette_id,
+                         coordinates={'x': entry['x'], 'y': entry['y'], 'z': entry['z']})
+            else:
+                raise ValueError('cannot compile "{}" outside a well'.format(entry.get('text', command)))
+        else:
+            raise ValueError('no JSON command for {}'.format(command))
+
+
+def compile_trace(trace, metadata=None, labware_dir=LABWARE_DIR, designer=None):
+    """
+    a JSON protocol (schema 6) that runs the commands of a trace
+    """
+    compiler = Compiler(labware_dir)
+    for entry in trace:
+        compiler.command(entry)
+    protocol = {
+        '$otSharedSchema': SCHEMA,
+        'schemaVersion': 6,
+        'metadata': {key: value for key, value in (metadata or {}).items() if key != 'apiLevel'},
+        'robot': ROBOT,
+        'pipettes': compiler.pipettes,
+        'labwareDefinitions': compiler.definitions,
+        'labware': compiler.labware,
+        'liquids': {},
+        'modules': {},
+        'commands': compiler.commands,
+    }
+    if designer is not None:
+        protocol['designerApplication'] = designer
+    return protocol
+
+
+def compile_protocol(path, overrides=None, engine='virtual', labware_dir=LABWARE_DIR):
+    """
+    run a protocol file once with the given settings and return it as a JSON protocol
+    """
+    trace = (simulate_protocol if engine == 'opentrons' else run_protocol)(path, overrides, labware_dir)
+    designer = {'name': 'otkit.compile', 'version': '0.1',
+                'data': {'source': path, 'overrides': overrides or {},
+                         'fingerprint': fingerprint(path, overrides, labware_dir)}}
+    return compile_trace(trace, protocol_metadata(path), labware_dir, designer)
+
+
+def save(protocol, path):
+    """
+    write with sorted keys and one command per line, so compiled protocols diff cleanly
+    """
+    commands = protocol['commands']
+    head = json.dumps(dict(protocol, commands=[]), indent=1, sort_keys=True)
+    lines = ',\n'.join('  ' + json.dumps(command, sort_keys=True) for command in commands)
+    with open(path, 'w') as f:
+        f.write(head.replace('"commands": []', '"commands": [\n{}\n ]'.format(lines) if lines else '"commands": []', 1))
+        f.write('\n')
+
+
+def up_to_date(output, path, overrides=None, labware_dir=LABWARE_DIR):
+    """
+    True when output is a compiled protocol of the current source, settings and labware
+    """
+    if not os.path.exists(output):
+        return False
+    try:
+        with open(output) as f:
+            data = json.load(f).get('designerApplication', {}).get('data', {})
+    except ValueError:
+        return False
+    return data.get('fingerprint') == fingerprint(path, overrides, labware_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocol', help='protocol file to compile')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a module-level setting, e.g. col_num=6')
+    parser.add_argument('-o', '--output', help='JSON protocol to write, default <protocol name>.json here')
+    parser.add_argument('--opentrons', action='store_true', help='simulate with opentrons instead of otkit.virtual')
+    parser.add_argument('--force', action='store_true', help='compile even when the output is up to date')
+    args = parser.parse_args()
+    overrides = parse_overrides(args.set)
+    output = args.output or os.path.splitext(os.path.basename(args.protocol))[0] + '.json'
+    if not args.force and up_to_date(output, args.protocol, overrides):
+        print('{} is up to date'.format(output))
+        return
+    start = time.perf_counter()
+    protocol = compile_protocol(args.protocol, overrides, 'opentrons' if args.opentrons else 'virtual')
+    save(protocol, output)
+    print('{}: {} commands, {} labware, {} pipettes in {:.0f} ms'.format(
+        output, len(protocol['commands']), len(protocol['labware']), len(protocol['pipettes']),
+        1000 * (time.perf_counter() - start)))
+
+
+if __name__ == '__main__':
+    main()
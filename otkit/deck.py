@@ -0,0 +1,43 @@
+"""
+OT-2 deck geometry
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+"""
+
+import math
+import re
+
+# front-left corner of each slot, mm
+SLOT_ORIGINS = {
+    '1': (0.0, 0.0), '2': (132.5, 0.0), '3': (265.0, 0.0),
+    '4': (0.0, 90.5), '5': (132.5, 90.5), '6': (265.0, 90.5),
+    '7': (0.0, 181.0), '8': (132.5, 181.0), '9': (265.0, 181.0),
+    '10': (0.0, 271.5), '11': (132.5, 271.5), '12': (265.0, 271.5),
+}
+SLOT_SIZE = (127.76, 85.48)
+WELL_PITCH = 9.0
+TRASH_SLOT = '12'
+
+
+def slot_center(slot):
+    x, y = SLOT_ORIGINS[str(slot)]
+    return x + SLOT_SIZE[0] / 2, y + SLOT_SIZE[1] / 2
+
+
+def well_point(slot, well=None):
+    """
+    approximate (x, y) of a well in an SBS 96 layout, or the slot center
+    """
+    x, y = slot_center(slot)
+    match = re.match(r'^([A-H])(\d+)$', well or '')
+    if match and str(slot) != TRASH_SLOT:
+        row = ord(match.group(1)) - ord('A')
+        column = int(match.group(2)) - 1
+        x += (column - 5.5) * WELL_PITCH
+        y += (3.5 - row) * WELL_PITCH
+    return x, y
+
+
+def distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
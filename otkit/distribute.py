@@ -0,0 +1,110 @@
+"""
+Multi-dispense of one reagent into several columns
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+"""
+
+
+def plan_distribute(volumes, max_volume, disposal_volume=1, contact=None, tip_volume=None):
+    """
+    group columns into aspirations.
+    columns whose destination already holds sample (contact) get their own aspiration
+    and a fresh tip; the others are packed in order until the tip holds max_volume, and a
+    column that alone takes more gets an aspiration of its own. No aspiration goes over
+    tip_volume (max_volume by default).
+    returns a list of (fresh_tip, columns) tuples.
+    """
+    if contact is None:
+        contact = [False] * len(volumes)
+    if tip_volume is None:
+        tip_volume = max_volume
+    plan = []
+    group = []
+    group_volume = disposal_volume
+    for i, volume in enumerate(volumes):
+        if contact[i]:
+            if volume > tip_volume:
+                raise ValueError('column {}: {} uL does not fit in a {} uL tip'.format(i+1, volume, tip_volume))
+            if group:
+                plan.append((False, group))
+                group, group_volume = [], disposal_volume
+            plan.append((True, [i]))
+            continue
+        if volume + disposal_volume > tip_volume:
+            raise ValueError('column {}: {} uL + {} uL disposal does not fit in a {} uL tip'.format(
+                i+1, volume, disposal_volume, tip_volume))
+        if group and group_volume + volume > max_volume:
+            plan.append((False, group))
+            group, group_volume = [], disposal_volume
+        group.append(i)
+        group_volume += volume
+    if group:
+        plan.append((False, group))
+    return plan
+
+
+def tip_volume(pipette):
+    """
+    working volume of the pipette's tips: its max volume, or the tip racks' well volume when smaller
+    """
+    volume = pipette.max_volume
+    for rack in pipette.tip_racks:
+        volume = min(volume, rack.wells()[0].max_volume)
+    return volume
+
+
+def distribute(pipette, volumes, source, dests, pick_up, source_height=None, disposal_volume=1,
+               contact=None, max_volume=None, home_after=True, dispensed=None):
+    """
+    add reagent from one source well to a list of destination locations.
+    one tip serves every column without sample contact, aspirating for as many columns as it
+    can hold plus disposal_volume, which is blown back into the source after each aspiration.
+    columns with contact fall back to one fresh tip per column.
+
+    pick_up: the protocol's _pick_up(pipette)
+    source_height: bottom offset of the source for an aspiration, called with the last
+        column it serves, e.g. lambda i: heights.aspirate_height((col_num - i - 1)*volume).
+        None aspirates from the source well itself, for a TrackedPipette to place.
+    dispensed: called with the index of each column once it has its reagent
+    max_volume: the most an aspiration for several columns fills a tip to, disposal volume
+        included; None for the tip's working volume (tip_volume), which bounds contact columns
+    """
+    working_volume = tip_volume(pipette)
+    if max_volume is None:
+        max_volume = working_volume
+    plan = plan_distribute(volumes, max_volume, disposal_volume, contact, working_volume)
+
+    def source_location(i):
+        return source if source_height is None else source.bottom(source_height(i))
+
+    has_tip = False
+    for n, (fresh_tip, columns) in enumerate(plan):
+        last = n == len(plan) - 1
+        if fresh_tip:
+            if has_tip:
+                pipette.drop_tip(home_after=False)
+                has_tip = False
+            i = columns[0]
+            pick_up(pipette)
+            pipette.aspirate(volumes[i], source_location(i))
+            pipette.dispense(volumes[i], dests[i])
+            pipette.drop_tip(home_after=home_after and last)
+            if dispensed is not None:
+                dispensed(i)
+            continue
+        if not has_tip:
+            pick_up(pipette)
+            has_tip = True
+        # a calibrated LiquidPipette corrects each aliquot once, as it corrects their dispenses
+        aliquots = {'aliquots': [volumes[i] for i in columns]} if getattr(pipette, 'corrections', None) else {}
+        pipette.aspirate(sum(volumes[i] for i in columns) + disposal_volume, source_location(columns[-1]), **aliquots)
+        for i in columns:
+            pipette.dispense(volumes[i], dests[i])
+        pipette.blow_out(source.top())
+        if dispensed is not None:
+            for i in columns:
+                dispensed(i)
+    if has_tip:
+        pipette.drop_tip(home_after=home_after)
+    return plan
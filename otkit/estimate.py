@@ -0,0 +1,170 @@
+"""
+Offline run-time estimator
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Estimate wall time per stage and per pause segment from a command trace:
+
+    python -m otkit.estimate protocols/CHARM_libprep/libprep.charm.py --set col_num=6 --set flow_rate=7.5
+    python -m otkit.estimate --trace charm.trace.json
+
+Operator time at pauses is not included; each pause closes a segment.
+"""
+
+import argparse
+import math
+
+from otkit import deck
+from otkit.trace import load_trace, parse_overrides, save_trace, simulate_protocol, split_stages
+
+# deterministic timing model of an OT-2 with a p20 multi gen2
+TIMING = {
+    'xy_speed': 400.0,          # mm/s, default X/Y max speed
+    'z_speed': 125.0,           # mm/s
+    'arc_height': 60.0,         # mm, travel height between labware
+    'well_arc_height': 10.0,    # mm, lift between wells of one labware
+    'move_overhead': 0.2,       # s per move, acceleration and settling
+    'plunger_overhead': 0.4,    # s per aspirate or dispense
+    'default_rate': 7.56,       # uL/s, p20 gen2 default flow rate
+    'default_z': 10.0,          # mm, when the trace carries no coordinates
+    'pick_up_tip': 4.0,         # s, presses=2
+    'drop_tip': 2.5,
+    'return_tip': 2.5,
+    'blow_out': 1.0,
+    'touch_tip': 2.0,
+    'home': 8.0,
+}
+HOME = (418.0, 353.0, 205.0, None, None)
+MOVING_COMMANDS = {'aspirate', 'dispense', 'pick_up_tip', 'drop_tip', 'return_tip', 'blow_out', 'touch_tip', 'move_to'}
+
+
+def _position(entry, timing):
+    if 'x' in entry:
+        return (entry['x'], entry['y'], entry['z'], entry.get('slot'), entry.get('well'))
+    x, y = deck.well_point(entry['slot'], entry.get('well'))
+    return (x, y, timing['default_z'], entry.get('slot'), entry.get('well'))
+
+
+def move_cost(a, b, timing=TIMING):
+    """
+    seconds and mm of travel for one move between positions (x, y, z, slot, well)
+    """
+    xy = math.hypot(a[0] - b[0], a[1] - b[1])
+    if a[3:] == b[3:]:
+        vertical = abs(a[2] - b[2])
+    else:
+        lift = timing['well_arc_height'] if a[3] == b[3] else timing['arc_height']
+        arc_z = max(a[2], b[2]) + lift if a[3] == b[3] else max(a[2], b[2], lift)
+        vertical = (arc_z - a[2]) + (arc_z - b[2])
+    seconds = xy / timing['xy_speed'] + vertical / timing['z_speed'] + timing['move_overhead']
+    return seconds, xy + vertical
+
+
+def action_time(entry, timing=TIMING):
+    command = entry['command']
+    if command in ('aspirate', 'dispense'):
+        return entry.get('volume', 0) / (entry.get('rate') or timing['default_rate']) + timing['plunger_overhead']
+    if command == 'delay':
+        return entry.get('seconds', 0)
+    return timing.get(command, 0.0)
+
+
+def command_cost(entry, position, timing=TIMING):
+    """
+    seconds and mm of travel of one entry from position, and the position after it
+    """
+    seconds, travel = 0.0, 0.0
+    if entry['command'] in MOVING_COMMANDS and entry.get('slot'):
+        target = _position(entry, timing)
+        seconds, travel = move_cost(position, target, timing)
+        position = target
+    elif entry['command'] == 'home':
+        travel = math.dist(position[:3], HOME[:3])
+        position = HOME
+    return seconds + action_time(entry, timing), travel, position
+
+
+def command_costs(trace, timing=TIMING):
+    """
+    (seconds, travel mm) for each entry of the trace
+    """
+    position = HOME
+    costs = []
+    for entry in trace:
+        seconds, travel, position = command_cost(entry, position, timing)
+        costs.append((seconds, travel))
+    return costs
+
+
+def _summary(entries, costs):
+    return {
+        'seconds': sum(costs[id(e)][0] for e in entries),
+        'travel': sum(costs[id(e)][1] for e in entries),
+        'tips': sum(1 for e in entries if e['command'] == 'pick_up_tip'),
+        'commands': len(entries),
+    }
+
+
+def estimate(trace, timing=TIMING):
+    """
+    per-stage, per-pause-segment and total estimates of a trace
+    """
+    costs = dict(zip(map(id, trace), command_costs(trace, timing)))
+    stages = [dict(stage=name, **_summary(entries, costs)) for name, entries in split_stages(trace)]
+    stages = [stage for stage in stages if stage['stage'] != 'setup' or stage['seconds'] > 0]
+    segments = []
+    entries = []
+    for entry in trace:
+        entries.append(entry)
+        if entry['command'] == 'pause':
+            segments.append(dict(pause=entry.get('message', ''), **_summary(entries, costs)))
+            entries = []
+    if entries:
+        segments.append(dict(pause=None, **_summary(entries, costs)))
+    return {'stages': stages, 'segments': segments, 'total': _summary(trace, costs)}
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+
+
+def report(result):
+    lines = ['{:<28} {:>9} {:>10} {:>5}'.format('stage', 'time', 'travel(m)', 'tips')]
+    for stage in result['stages']:
+        lines.append('{:<28} {:>9} {:>10.1f} {:>5}'.format(
+            stage['stage'][:28], format_seconds(stage['seconds']), stage['travel'] / 1000, stage['tips']))
+    lines.append('')
+    lines.append('pause segments')
+    for n, segment in enumerate(result['segments']):
+        lines.append('{:>2} {:>9}  -> {}'.format(
+            n + 1, format_seconds(segment['seconds']), segment['pause'] if segment['pause'] is not None else 'end of run'))
+    total = result['total']
+    lines.append('')
+    lines.append('total {} robot time, {:.1f} m gantry travel, {} tips, {} commands'.format(
+        format_seconds(total['seconds']), total['travel'] / 1000, total['tips'], total['commands']))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocol', nargs='?', help='protocol file to simulate')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a module-level setting, e.g. col_num=6')
+    parser.add_argument('--trace', help='read a saved trace instead of simulating')
+    parser.add_argument('--save-trace', help='write the trace to this file')
+    args = parser.parse_args()
+    if args.trace:
+        trace = load_trace(args.trace)
+    elif args.protocol:
+        trace = simulate_protocol(args.protocol, parse_overrides(args.set))
+    else:
+        parser.error('give a protocol or --trace')
+    if args.save_trace:
+        save_trace(trace, args.save_trace)
+    print(report(estimate(trace)))
+
+
+if __name__ == '__main__':
+    main()
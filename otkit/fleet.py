@@ -0,0 +1,208 @@
+"""
+Fleet sharding of a sample batch across OT-2s
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Split a sample sheet (CSV with sample and concentration columns, in plate order, 8 samples
+to a column) across robots, write one compiled assay protocol per robot, simulate each one
+and report the makespan of the batch:
+
+    python -m otkit.fleet assays/charm.yaml samples.csv --robots 3 -o fleet/
+    python -m otkit.fleet assays/charm.yaml samples.csv --robots ot2-a,ot2-b,ot2-c
+
+Robots get contiguous columns, as even as the column count allows while each robot fits in
+one plate set; with the same protocol on every robot the time only grows with columns, so even
+columns finish together. Larger batches are split on plate-set boundaries, since a plate set
+brings its own pauses and reagent excess (see split_columns). Each robot
+runs its share as a batch of 12-column plate sets (otkit.assay) and needs one i5/i7 index
+plate pair per plate set; pairs are numbered across the batch so no two plate sets share
+barcodes, and each robot's pauses name the pair of the set it runs (the index_pair setting). Robot time excludes operator time at pauses.
+"""
+
+import argparse
+import copy
+import csv
+import math
+import os
+import tempfile
+
+from otkit.assay import PLATE_COLUMNS, column_volumes, compile_spec, load_spec, plate_sets
+from otkit.estimate import estimate, format_seconds
+from otkit.tips import COLUMNS_PER_RACK
+from otkit.trace import simulate_protocol
+
+ROWS = 8
+
+
+def read_sheet(path):
+    """
+    [{'sample', 'concentration'}, ...] in plate order
+    """
+    with open(path, newline='') as f:
+        return [{'sample': row['sample'], 'concentration': float(row['concentration'])}
+                for row in csv.DictReader(f) if row.get('sample')]
+
+
+def column_concentrations(samples):
+    """
+    mean concentration of every 8 samples; the channels of one column share a water volume
+    """
+    columns = []
+    for first in range(0, len(samples), ROWS):
+        column = samples[first:first + ROWS]
+        columns.append(sum(s['concentration'] for s in column) / len(column))
+    return columns
+
+
+def split_columns(col_num, robots):
+    """
+    contiguous (first column, columns) per robot. While every robot fits in one plate set,
+    sizes differ by at most one; beyond that robots get whole 12-column plate sets, as even
+    as the set count allows, and the columns short of full sets come off the robots with the
+    most sets, so no robot runs an extra plate set for a few columns
+    """
+    if col_num <= PLATE_COLUMNS * robots:
+        sizes = [col_num // robots + (r < col_num % robots) for r in range(robots)]
+    else:
+        sets = math.ceil(col_num / PLATE_COLUMNS)
+        sizes = [PLATE_COLUMNS * (sets // robots + (r < sets % robots)) for r in range(robots)]
+        short = sum(sizes) - col_num
+        most = [r for r in range(robots) if sizes[r] == max(sizes)]
+        for k, r in enumerate(most):
+            sizes[r] -= short // len(most) + (k < short % len(most))
+    shares = []
+    first = 0
+    for n in sizes:
+        shares.append((first, n))
+        first += n
+    return shares
+
+
+def robot_spec(spec, concentrations):
+    """
+    copy of the spec for one robot's columns, diluting with its own concentrations
+    """
+    spec = copy.deepcopy(spec)
+    spec['columns'] = len(concentrations)
+    for step in spec['steps']:
+        for move in step.get('columns', []) + ([step['distribute']] if 'distribute' in step else []):
+            if isinstance(move['volume'], dict) and 'concentrations' in move['volume']:
+                move['volume']['concentrations'] = [round(c, 2) for c in concentrations]
+    return spec
+
+
+def reagent_volumes(spec):
+    """
+    ul to load in each tube of every reagent, one value per plate set: the strip is
+    reloaded with each set
+    """
+    excess = spec.get('settings', {}).get('reagent_excess', 5)
+    every_set = spec.get('settings', {}).get('same_volumes_every_set', False)
+    volumes = {}
+    sets = plate_sets(spec['columns'])
+    for k, (first, col_num) in enumerate(sets):
+        for step in spec['steps']:
+            moves = step.get('columns', []) + ([step['distribute']] if 'distribute' in step else [])
+            for move in moves:
+                name = move.get('reagent', move.get('source'))
+                if name in spec['reagents']:
+                    draw = sum(column_volumes(move['volume'], col_num, first, spec['columns'], every_set))
+                    volumes.setdefault(name, [0.0] * len(sets))[k] += draw + excess
+    return volumes
+
+
+def plan(spec, samples, robots):
+    """
+    one shard per robot: name, columns, samples, index plate pairs and spec
+    """
+    concentrations = column_concentrations(samples)
+    shards = []
+    plate_pair = 0
+    for name, (first, col_num) in zip(robots, split_columns(len(concentrations), len(robots))):
+        if not col_num:
+            continue
+        sets = plate_sets(col_num)
+        shard_spec = robot_spec(spec, concentrations[first:first + col_num])
+        shard_spec.setdefault('settings', {})['index_pair'] = plate_pair + 1
+        shards.append({
+            'robot': name,
+            'first': first,
+            'columns': col_num,
+            'samples': samples[first * ROWS:(first + col_num) * ROWS],
+            'index_plates': list(range(plate_pair + 1, plate_pair + len(sets) + 1)),
+            'spec': shard_spec,
+        })
+        plate_pair += len(sets)
+    return shards
+
+
+def write_shards(shards, source, output):
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'samples.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['sample', 'robot', 'plate_set', 'column', 'row', 'index_plates'])
+        for shard in shards:
+            for i, sample in enumerate(shard['samples']):
+                column, row = divmod(i, ROWS)
+                plate_set = column // PLATE_COLUMNS
+                writer.writerow([sample['sample'], shard['robot'], plate_set + 1, column % PLATE_COLUMNS + 1,
+                                 'ABCDEFGH'[row], shard['index_plates'][plate_set]])
+    for shard in shards:
+        shard['protocol'] = os.path.join(output, '{}.py'.format(shard['robot']))
+        with open(shard['protocol'], 'w') as f:
+            f.write(compile_spec(shard['spec'], source))
+
+
+def simulate_shards(shards):
+    """
+    simulate every robot's protocol and add its estimate to the shard
+    """
+    for shard in shards:
+        shard['estimate'] = estimate(simulate_protocol(shard['protocol']))['total']
+
+
+def report(shards):
+    lines = ['{:<10} {:>8} {:>8} {:>6} {:>9} {:>5} {:>6}  {}'.format(
+        'robot', 'columns', 'samples', 'plates', 'time', 'tips', 'racks', 'index plate pairs')]
+    for shard in shards:
+        total = shard['estimate']
+        lines.append('{:<10} {:>8} {:>8} {:>6} {:>9} {:>5} {:>6}  {}'.format(
+            shard['robot'], '{}-{}'.format(shard['first'] + 1, shard['first'] + shard['columns']),
+            len(shard['samples']), len(shard['index_plates']), format_seconds(total['seconds']), total['tips'],
+            math.ceil(total['tips'] / COLUMNS_PER_RACK), ', '.join(map(str, shard['index_plates']))))
+    lines.append('')
+    lines.append('reagents per tube and plate set (ul)')
+    for shard in shards:
+        volumes = reagent_volumes(shard['spec'])
+        for k in range(len(shard['index_plates'])):
+            lines.append('  {:<10} set {} {}'.format(shard['robot'] if not k else '', k + 1, ', '.join(
+                '{} {:.1f}'.format(name, per_set[k]) for name, per_set in volumes.items())))
+    seconds = [shard['estimate']['seconds'] for shard in shards]
+    lines.append('')
+    lines.append('makespan {} robot time, slowest minus fastest {}'.format(
+        format_seconds(max(seconds)), format_seconds(max(seconds) - min(seconds))))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('spec', help='assay spec, .yaml or .json')
+    parser.add_argument('sheet', help='sample sheet CSV with sample and concentration columns')
+    parser.add_argument('--robots', default='2', help='number of robots, or their names, e.g. ot2-a,ot2-b')
+    parser.add_argument('-o', '--output', help='directory for the robot protocols and samples.csv, default: a temporary one')
+    args = parser.parse_args()
+    if args.robots.isdigit():
+        robots = ['robot{}'.format(r + 1) for r in range(int(args.robots))]
+    else:
+        robots = args.robots.split(',')
+    shards = plan(load_spec(args.spec), read_sheet(args.sheet), robots)
+    output = args.output or tempfile.mkdtemp(prefix='otkit-fleet-')
+    write_shards(shards, os.path.relpath(args.spec), output)
+    simulate_shards(shards)
+    print(report(shards))
+    print('protocols in {}'.format(output))
+
+
+if __name__ == '__main__':
+    main()
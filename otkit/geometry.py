@@ -0,0 +1,122 @@
+"""
+Liquid height model from labware definitions
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Wells are modelled from the shape their definition declares: a cylinder of the well diameter
+over a hemispherical (u), conical (v) or flat bottom; rectangular wells are boxes.
+Heights are read from a volume -> height table built once per labware.
+"""
+
+import math
+import os
+
+import numpy as np
+
+from otkit.trace import load_labware_defs
+
+LABWARE_DIRS = ['3Dprinting', '/var/lib/jupyter/notebooks/3Dprinting', '/var/lib/jupyter/notebooks']
+TABLE_POINTS = 2001
+
+_MODELS = {}
+
+
+def bottom_height(shape, radius):
+    """
+    height of the rounded or conical bottom; v bottoms are taken as 90 degree cones
+    """
+    return radius if shape in ('u', 'v') else 0.0
+
+
+def well_volume(h, shape, radius):
+    """
+    liquid volume (uL = mm^3) at height h above the bottom of a circular well
+    """
+    bottom = bottom_height(shape, radius)
+    if h <= bottom:
+        if shape == 'u':
+            return math.pi * h ** 2 * (3 * radius - h) / 3
+        return math.pi * h ** 3 / 3
+    if shape == 'u':
+        bottom_volume = 2 / 3 * math.pi * radius ** 3
+    elif shape == 'v':
+        bottom_volume = math.pi * radius ** 3 / 3
+    else:
+        bottom_volume = 0.0
+    return bottom_volume + math.pi * radius ** 2 * (h - bottom)
+
+
+class HeightModel:
+    """
+    volume -> liquid height lookup for the wells of one labware.
+    heights are mm above the well bottom; height() takes a float or an array of volumes.
+    """
+
+    def __init__(self, well_def, bottom_shape='u'):
+        self.depth = well_def['depth']
+        self.max_volume = well_def['totalLiquidVolume']
+        self.shape = bottom_shape
+        self.heights_table = np.linspace(0, self.depth, TABLE_POINTS)
+        if well_def.get('shape') == 'rectangular':
+            area = well_def['xDimension'] * well_def['yDimension']
+            self.volumes_table = self.heights_table * area
+        else:
+            radius = well_def['diameter'] / 2
+            self.volumes_table = np.array([well_volume(h, bottom_shape, radius) for h in self.heights_table])
+
+    @classmethod
+    def from_definition(cls, labware_def):
+        first_well = labware_def['ordering'][0][0]
+        bottom_shape = 'u'
+        for group in labware_def.get('groups', []):
+            if first_well in group.get('wells', []):
+                bottom_shape = group.get('metadata', {}).get('wellBottomShape', bottom_shape)
+        return cls(labware_def['wells'][first_well], bottom_shape)
+
+    def height(self, volume):
+        """
+        liquid height for a volume, clipped to the well depth
+        """
+        heights = np.interp(volume, self.volumes_table, self.heights_table)
+        return float(heights) if np.ndim(heights) == 0 else heights
+
+    def volume(self, height):
+        return np.interp(height, self.heights_table, self.volumes_table)
+
+    def aspirate_height(self, volume_after, immersion=1.0, bottom_offset=0.3):
+        """
+        bottom offset that keeps the tip `immersion` mm under the meniscus
+        left once the aspiration is done
+        """
+        return max(self.height(volume_after) - immersion, bottom_offset)
+
+
+def find_definition(load_name, labware_dirs=LABWARE_DIRS):
+    for labware_dir in labware_dirs:
+        if os.path.isdir(labware_dir):
+            labware_def = load_labware_defs(labware_dir).get(load_name)
+            if labware_def is not None:
+                return labware_def
+    return None
+
+
+def height_model(labware, bottom_shape='u'):
+    """
+    cached HeightModel of a loaded labware; uses its JSON definition when one is found
+    in LABWARE_DIRS, otherwise the geometry of its first well with bottom_shape
+    """
+    load_name = labware.load_name
+    if load_name not in _MODELS:
+        labware_def = find_definition(load_name)
+        if labware_def is not None:
+            _MODELS[load_name] = HeightModel.from_definition(labware_def)
+        else:
+            well = labware.wells()[0]
+            well_def = {'depth': well.depth, 'totalLiquidVolume': well.max_volume}
+            if well.diameter is not None:
+                well_def.update(shape='circular', diameter=well.diameter)
+            else:
+                well_def.update(shape='rectangular', xDimension=well.length, yDimension=well.width)
+            _MODELS[load_name] = HeightModel(well_def, bottom_shape)
+    return _MODELS[load_name]
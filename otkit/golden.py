@@ -0,0 +1,222 @@
+"""
+Golden command traces of the production protocols
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Every protocol in protocols/CHARM_libprep, protocols/HiRES_libprep and protocols/libprep has a
+stored trace in golden/ (one command per line: loads, commands, slot and well, coordinates,
+volumes, rates, tips). The check reruns each on the virtual OT-2 (otkit.virtual), a couple
+of seconds for all of them, and fails when a trace changed, with a diff of the commands
+that differ and what the change does to tips, volume and commands:
+
+    python -m otkit.golden check                     # exit status 1 when a trace changed
+    python -m otkit.golden check -x protocols/CHARM_libprep/libprep.charm.py
+    python -m otkit.golden update                    # after an intended change, then commit golden/
+
+A protocol that does not run (a labware definition missing from 3Dprinting/) is stored with
+its error. The check lists it as not checked, never as a match, and fails once it runs or
+fails differently.
+"""
+
+import argparse
+import difflib
+import glob
+import json
+import os
+import sys
+
+from otkit.trace import STAGE_PREFIX
+from otkit.virtual import run_protocol
+
+GOLDEN_DIR = 'golden'
+PROTOCOL_DIRS = ['protocols/CHARM_libprep', 'protocols/HiRES_libprep', 'protocols/libprep']
+KEYS = ['command', 'level', 'load_name', 'instrument', 'mount', 'tip_racks', 'slot', 'well',
+        'volume', 'rate', 'repetitions', 'seconds', 'message', 'x', 'y', 'z']
+
+
+def protocols(paths=None):
+    if paths:
+        return list(paths)
+    return sorted(path for folder in PROTOCOL_DIRS for path in glob.glob(os.path.join(folder, '*.py')))
+
+
+def golden_path(protocol, golden_dir=GOLDEN_DIR):
+    """
+    golden/CHARM_libprep/libprep.charm.jsonl for protocols/CHARM_libprep/libprep.charm.py
+    """
+    relative = os.path.relpath(protocol, 'protocols')
+    return os.path.join(golden_dir, os.path.splitext(relative)[0] + '.jsonl')
+
+
+def golden_entries(trace):
+    """
+    the fields of each entry a golden trace keeps, floats rounded so the text is stable
+    """
+    entries = []
+    for entry in trace:
+        kept = {}
+        for key in KEYS:
+            if entry.get(key) is not None:
+                value = entry[key]
+                kept[key] = round(value, 3) if isinstance(value, float) else value
+        entries.append(kept)
+    return entries
+
+
+def capture(protocol):
+    """
+    golden entries of a protocol, or {'error': ...} when it does not run
+    """
+    try:
+        return golden_entries(run_protocol(protocol))
+    except Exception as error:
+        return {'error': '{}: {}'.format(type(error).__name__, str(error).splitlines()[0] if str(error) else '')}
+
+
+def save(path, golden):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        for entry in golden if isinstance(golden, list) else [golden]:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def load(path):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    if len(entries) == 1 and 'error' in entries[0]:
+        return entries[0]
+    return entries
+
+
+def describe(entry):
+    command = entry['command']
+    parts = ['  ' * entry.get('level', 0) + command]
+    if command in ('load_labware', 'load_instrument'):
+        parts.append(entry.get('load_name') or entry.get('instrument'))
+    if 'repetitions' in entry:
+        parts.append('{}x'.format(entry['repetitions']))
+    if 'volume' in entry:
+        parts.append('{:g} ul'.format(entry['volume']))
+    if 'slot' in entry:
+        parts.append('{}:{}'.format(entry['slot'], entry['well']) if 'well' in entry else 'slot {}'.format(entry['slot']))
+    if 'rate' in entry:
+        parts.append('at {:g} ul/s'.format(entry['rate']))
+    if 'seconds' in entry:
+        parts.append('{:g} s'.format(entry['seconds']))
+    if 'message' in entry:
+        parts.append(repr(entry['message'][:60]))
+    if 'z' in entry:
+        parts.append('z {:g}'.format(entry['z']))
+    return ' '.join(parts)
+
+
+def _stages(entries):
+    stage = 'setup'
+    names = []
+    for entry in entries:
+        if entry['command'] == 'comment' and entry.get('message', '').startswith(STAGE_PREFIX):
+            stage = entry['message'][len(STAGE_PREFIX):]
+        names.append(stage)
+    return names
+
+
+def _totals(entries):
+    return {
+        'commands': len(entries),
+        'tips': sum(1 for e in entries if e['command'] == 'pick_up_tip'),
+        'aspirated ul': round(sum(e.get('volume', 0) for e in entries if e['command'] == 'aspirate' and not e.get('level')), 3),
+    }
+
+
+def diff(expected, actual, limit=20):
+    """
+    lines describing how actual differs from expected, [] when they match
+    """
+    if isinstance(expected, dict) or isinstance(actual, dict):
+        if expected == actual:
+            return []
+        return ['  golden: {}'.format(expected.get('error') if isinstance(expected, dict) else '{} commands'.format(len(expected))),
+                '  now:    {}'.format(actual.get('error') if isinstance(actual, dict) else '{} commands'.format(len(actual)))]
+    a = [json.dumps(entry, sort_keys=True) for entry in expected]
+    b = [json.dumps(entry, sort_keys=True) for entry in actual]
+    if a == b:
+        return []
+    stages = _stages(expected)
+    lines = []
+    shown = 0
+    opcodes = [op for op in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes() if op[0] != 'equal']
+    for tag, i1, i2, j1, j2 in opcodes:
+        if shown >= limit:
+            break
+        stage = stages[i1] if i1 < len(stages) else stages[-1] if stages else 'setup'
+        lines.append('  command {} ({}): {}'.format(i1 + 1, stage, {'replace': 'changed', 'delete': 'removed',
+                                                                     'insert': 'added'}[tag]))
+        for entry in expected[i1:i2][:limit - shown]:
+            lines.append('    - ' + describe(entry))
+        for entry in actual[j1:j2][:limit - shown]:
+            lines.append('    + ' + describe(entry))
+        shown += max(i2 - i1, j2 - j1)
+    if len(opcodes) > 1 or shown >= limit:
+        lines.append('  {} changed blocks in all'.format(len(opcodes)))
+    before, after = _totals(expected), _totals(actual)
+    lines.append('  ' + ', '.join('{} {} -> {}'.format(key, before[key], after[key])
+                                 for key in before if before[key] != after[key]) or '  same totals')
+    return lines
+
+
+def check(paths, golden_dir=GOLDEN_DIR, exit_first=False, limit=20):
+    """
+    print the differences from the golden traces; (True when no trace changed, the protocols
+    whose golden is only an error and so checked no commands)
+    """
+    ok = True
+    unchecked = []
+    for protocol in paths:
+        path = golden_path(protocol, golden_dir)
+        if not os.path.exists(path):
+            print('{}: no golden trace at {}; run update'.format(protocol, path))
+            ok = False
+        else:
+            golden = load(path)
+            lines = diff(golden, capture(protocol), limit)
+            if not lines:
+                if isinstance(golden, dict):
+                    unchecked.append(protocol)
+                    print('{}: not checked, does not run ({})'.format(protocol, golden['error']))
+                continue
+            print('{}: trace changed'.format(protocol))
+            print('\n'.join(lines))
+            ok = False
+        if exit_first:
+            break
+    return ok, unchecked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    check_parser = commands.add_parser('check', help='compare the protocols with their golden traces')
+    check_parser.add_argument('protocols', nargs='*', help='default: every production protocol')
+    check_parser.add_argument('-x', '--exit-first', action='store_true', help='stop at the first changed trace')
+    check_parser.add_argument('--limit', type=int, default=20, help='commands shown per protocol')
+    update_parser = commands.add_parser('update', help='store the current traces as golden')
+    update_parser.add_argument('protocols', nargs='*', help='default: every production protocol')
+    args = parser.parse_args()
+    paths = protocols(args.protocols)
+    if args.command == 'update':
+        for protocol in paths:
+            golden = capture(protocol)
+            save(golden_path(protocol), golden)
+            print('{}: {}'.format(golden_path(protocol), golden['error'] if isinstance(golden, dict)
+                                  else '{} commands'.format(len(golden))))
+        return
+    ok, unchecked = check(paths, exit_first=args.exit_first, limit=args.limit)
+    if not ok:
+        sys.exit(1)
+    print('{} protocols match their golden traces'.format(len(paths) - len(unchecked)) +
+          ('; {} do not run and were not checked'.format(len(unchecked)) if unchecked else ''))
+
+
+if __name__ == '__main__':
+    main()
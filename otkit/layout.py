@@ -0,0 +1,170 @@
+"""
+Deck layout optimizer
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Propose the slot assignment with the least gantry time for a protocol's moves:
+
+    python -m otkit.layout protocols/CHARM_libprep/libprep.charm.py
+    python -m otkit.layout --trace charm.trace.json --fix 9
+
+Every slot used by the protocol keeps its labware together, including plates the operator
+swaps in later (i5 index replacing the MALBAC plate on 6), and moves as one to a new slot.
+The trash (slot 12) stays put. Travel is costed with the otkit.estimate timing model.
+"""
+
+import argparse
+import random
+from collections import Counter
+
+from otkit import deck
+from otkit.estimate import MOVING_COMMANDS, command_costs, format_seconds
+from otkit.trace import load_trace, parse_overrides, simulate_protocol, split_stages
+
+SLOTS = [slot for slot in deck.SLOT_ORIGINS if slot != deck.TRASH_SLOT]
+
+
+def transfer_graph(trace):
+    """
+    number of gantry moves between each pair of slots, in run order
+    """
+    graph = Counter()
+    previous = None
+    for entry in trace:
+        if entry['command'] in MOVING_COMMANDS and entry.get('slot'):
+            if previous is not None and previous != entry['slot']:
+                graph[(previous, entry['slot'])] += 1
+            previous = entry['slot']
+    return graph
+
+
+def relocate(trace, mapping):
+    """
+    copy of the trace with labware moved from slot to mapping[slot]
+    """
+    moved = []
+    for entry in trace:
+        slot = entry.get('slot')
+        if slot in mapping and mapping[slot] != slot:
+            entry = dict(entry, slot=mapping[slot])
+            if 'x' in entry:
+                old, new = deck.SLOT_ORIGINS[slot], deck.SLOT_ORIGINS[mapping[slot]]
+                entry['x'] += new[0] - old[0]
+                entry['y'] += new[1] - old[1]
+        moved.append(entry)
+    return moved
+
+
+def layout_cost(trace, mapping=None):
+    """
+    (seconds, travel mm) of the trace with labware relocated by mapping
+    """
+    costs = command_costs(relocate(trace, mapping or {}))
+    return sum(c[0] for c in costs), sum(c[1] for c in costs)
+
+
+def _moving_trace(trace):
+    # layout only changes the cost of moves; the rest is left out to keep the search fast
+    return [entry for entry in trace if entry['command'] in MOVING_COMMANDS or entry['command'] == 'home']
+
+
+def _improve(trace, mapping, movable):
+    """
+    swap slots pairwise until no swap lowers the cost
+    """
+    best = layout_cost(trace, mapping)[0]
+    improved = True
+    while improved:
+        improved = False
+        for i, a in enumerate(movable):
+            for b in movable[i + 1:]:
+                candidate = dict(mapping)
+                candidate[a], candidate[b] = mapping[b], mapping[a]
+                cost = layout_cost(trace, candidate)[0]
+                if cost < best - 1e-9:
+                    mapping, best = candidate, cost
+                    improved = True
+    return mapping, best
+
+
+def optimize(trace, fixed=(), restarts=10, seed=0):
+    """
+    best mapping {current slot: proposed slot} found by swap search from the current layout
+    and from `restarts` random layouts
+    """
+    moves = _moving_trace(trace)
+    movable = [slot for slot in SLOTS if slot not in fixed]
+    identity = {slot: slot for slot in SLOTS}
+    best_mapping, best = _improve(moves, identity, movable)
+    rng = random.Random(seed)
+    for _ in range(restarts):
+        shuffled = movable[:]
+        rng.shuffle(shuffled)
+        start = dict(identity, **dict(zip(movable, shuffled)))
+        mapping, cost = _improve(moves, start, movable)
+        if cost < best - 1e-9:
+            best_mapping, best = mapping, cost
+    return best_mapping
+
+
+def labware_by_slot(trace):
+    """
+    'labware (stages using it)' for each slot the protocol loads
+    """
+    names = {}
+    for entry in trace:
+        if entry['command'] == 'load_labware' and entry['labware'] not in names.setdefault(entry['slot'], []):
+            names[entry['slot']].append(entry['labware'])
+    used = {}
+    for stage, entries in split_stages(trace):
+        for entry in entries:
+            if entry['command'] in MOVING_COMMANDS and entry.get('slot') in names:
+                if stage not in used.setdefault(entry['slot'], []):
+                    used[entry['slot']].append(stage)
+    return {slot: '{} ({})'.format(', '.join(labware), ', '.join(used.get(slot, [])))
+            for slot, labware in names.items()}
+
+
+def report(trace, mapping):
+    current = layout_cost(trace)
+    proposed = layout_cost(trace, mapping)
+    names = labware_by_slot(trace)
+    lines = ['busiest slot pairs (moves):']
+    for (a, b), n in transfer_graph(trace).most_common(8):
+        lines.append('  {:>2} -> {:<2} {:>5}'.format(a, b, n))
+    lines.append('')
+    lines.append('proposed layout:')
+    for slot in SLOTS:
+        if slot in names:
+            marker = '' if mapping[slot] == slot else '  (was {})'.format(slot)
+            lines.append('  slot {:<2} {}{}'.format(mapping[slot], names[slot], marker))
+    lines.append('')
+    lines.append('current  {} robot time, {:.1f} m gantry travel'.format(format_seconds(current[0]), current[1] / 1000))
+    lines.append('proposed {} robot time, {:.1f} m gantry travel'.format(format_seconds(proposed[0]), proposed[1] / 1000))
+    lines.append('saving   {} ({:.1f}%), {:.1f} m'.format(
+        format_seconds(current[0] - proposed[0]), 100 * (current[0] - proposed[0]) / current[0],
+        (current[1] - proposed[1]) / 1000))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocol', nargs='?', help='protocol file to simulate')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a module-level setting, e.g. col_num=6')
+    parser.add_argument('--trace', help='read a saved trace instead of simulating')
+    parser.add_argument('--fix', default='', help='slots that must keep their labware, e.g. 9,2')
+    parser.add_argument('--restarts', type=int, default=10, help='random starting layouts to search from')
+    args = parser.parse_args()
+    if args.trace:
+        trace = load_trace(args.trace)
+    elif args.protocol:
+        trace = simulate_protocol(args.protocol, parse_overrides(args.set))
+    else:
+        parser.error('give a protocol or --trace')
+    fixed = [slot for slot in args.fix.split(',') if slot]
+    print(report(trace, optimize(trace, fixed, args.restarts)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Liquid classes
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Handling parameters per liquid, applied to each aspirate and dispense instead of one
+flow rate for the whole run:
+
+    pipette = LiquidPipette(pipette, protocol)
+    with pipette.liquid('tn5_mix'):
+        pipette.aspirate(6.2, tn5)      # 3 ul/s, 2 s to settle, 10 mm/s out of the liquid
+        pipette.dispense(6.2, dest)
+    pipette.aspirate(14, water)         # no class: the pipette's own flow rate
+
+Each class sets aspirate and dispense rates (ul/s), delays after aspirating and dispensing,
+the Z speed (mm/s) for leaving the well after each (None keeps the default speed), and
+whether to blow out at the top of the well after a dispense. Values for glycerol mixes
+follow protocols/test/viscous.py (4 ul/s and 2 s) and NCsep.py (Z at 20 mm/s).
+With corrections from otkit.calibration, volumes of a calibrated class are corrected too: each
+dispense once, and a multi-dispense aspiration as the sum of its corrected aliquots.
+"""
+
+from contextlib import contextmanager
+
+from otkit.volumes import VolumeError, _well
+
+LIQUID_CLASSES = {
+    'water': {'aspirate_rate': 7.56, 'dispense_rate': 7.56, 'aspirate_delay': 0, 'dispense_delay': 0,
+              'withdraw_speed': None, 'blow_out': False},
+    'sample': {'aspirate_rate': 5, 'dispense_rate': 5, 'aspirate_delay': 0, 'dispense_delay': 0,
+               'withdraw_speed': None, 'blow_out': False},
+    'index': {'aspirate_rate': 5, 'dispense_rate': 5, 'aspirate_delay': 0, 'dispense_delay': 0,
+              'withdraw_speed': None, 'blow_out': False},
+    # 50% glycerol storage buffer
+    'tn5_mix': {'aspirate_rate': 3, 'dispense_rate': 3, 'aspirate_delay': 2, 'dispense_delay': 1,
+                'withdraw_speed': 10, 'blow_out': False},
+    # foams when pushed hard; a blow out would spray bubbles
+    'sds': {'aspirate_rate': 4, 'dispense_rate': 3, 'aspirate_delay': 1, 'dispense_delay': 0.5,
+            'withdraw_speed': 20, 'blow_out': False},
+    'pcr_mix': {'aspirate_rate': 4, 'dispense_rate': 4, 'aspirate_delay': 1, 'dispense_delay': 0.5,
+                'withdraw_speed': 20, 'blow_out': True},
+}
+
+
+class LiquidPipette:
+    """
+    pipette wrapper that moves liquid with the liquid class in use;
+    everything else goes to the pipette unchanged
+    """
+
+    def __init__(self, pipette, protocol, classes=None, corrections=None):
+        self._pipette = pipette
+        self.protocol = protocol
+        self.classes = dict(LIQUID_CLASSES, **(classes or {}))
+        self.corrections = corrections or {}
+        self.current = None
+
+    def __getattr__(self, name):
+        return getattr(self._pipette, name)
+
+    @contextmanager
+    def liquid(self, name):
+        """
+        use liquid class name inside the block; None keeps the pipette defaults
+        """
+        if name is not None and name not in self.classes:
+            raise KeyError('unknown liquid class {!r}, not one of {}'.format(name, ', '.join(self.classes)))
+        previous, self.current = self.current, name
+        try:
+            yield self
+        finally:
+            self.current = previous
+
+    @property
+    def max_volume(self):
+        """
+        largest volume to ask for that still fits once corrected
+        """
+        if self.current in self.corrections:
+            return self._pipette.max_volume / max(1.0, float(self.corrections[self.current].gain.max()))
+        return self._pipette.max_volume
+
+    def _class(self):
+        return self.classes[self.current] if self.current is not None else None
+
+    def _leave(self, location, delay, speed):
+        if delay:
+            self.protocol.delay(seconds=delay)
+        well = _well(location)
+        if speed and well is not None:
+            self._pipette.move_to(well.top(), speed=speed)
+
+    def aspirate(self, volume, location, rate=1.0, aliquots=None):
+        """
+        aliquots: the volumes this aspiration is dispensed in (a multi-dispense); each is
+        corrected on its own, as its dispense is, and the rest of volume (the disposal
+        volume) is taken as asked
+        """
+        liquid = self._class()
+        if liquid is None:
+            self._pipette.aspirate(volume, location, rate=rate)
+            return self
+        if self.current in self.corrections:
+            correct = self.corrections[self.current]
+            if aliquots:
+                volume = sum(correct(v) for v in aliquots) + volume - sum(aliquots)
+            else:
+                volume = correct(volume)
+        self._pipette.aspirate(volume, location, rate=liquid['aspirate_rate'] / self._pipette.flow_rate.aspirate)
+        self._leave(location, liquid['aspirate_delay'], liquid['withdraw_speed'])
+        return self
+
+    def dispense(self, volume, location, rate=1.0):
+        liquid = self._class()
+        if liquid is None:
+            self._pipette.dispense(volume, location, rate=rate)
+            return self
+        if self.current in self.corrections:
+            asked, volume = volume, self.corrections[self.current](volume)
+            if volume > self._pipette.current_volume + 1e-6:
+                raise VolumeError('dispensing {} uL of {} takes {:.2f} uL corrected, the tip holds {:.2f} uL'.format(
+                    asked, self.current, volume, self._pipette.current_volume))
+        self._pipette.dispense(volume, location, rate=liquid['dispense_rate'] / self._pipette.flow_rate.dispense)
+        self._leave(location, liquid['dispense_delay'], liquid['withdraw_speed'])
+        well = _well(location)
+        if liquid['blow_out'] and well is not None and not self._pipette.current_volume:
+            self._pipette.blow_out(well.top())
+        return self
@@ -0,0 +1,255 @@
+"""
+Mix efficiency study and mix policy
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Design a plate of mix conditions, one per column, run it, read the plate, and pick the
+mix with the least robot time that keeps the wells homogeneous:
+
+    python -m otkit.mixstudy design --reps 0,1,2,3,5,8 --volumes 4,8 --rates 20 \
+        -o protocols/test/mix_study.py --layout mix_layout.csv
+    python -m otkit.mixstudy analyse mix_layout.csv reader.csv --cv 0.05
+
+Each column gets water, then a DNA spike, then its mix (0 repetitions is the unmixed
+control). After an aliquot of each well is read, the 8 rows of a column are its replicates
+and their CV measures how well the column mixed. Reader CSVs are either long (well,value) or
+a plate grid (a row letter, then 12 values).
+
+The policy is the (repetitions, volume, rate) with the shortest mix time whose CV meets the
+target, counting a repetition count only when every larger count tested with the same volume
+and rate meets it too; one noisy column does not set the policy. The report gives it as the
+mix_reps, mix_volume and mix_rate settings of an assay spec (otkit.assay).
+"""
+
+import argparse
+import csv
+import itertools
+import pprint
+
+import numpy as np
+
+from otkit.estimate import TIMING
+
+PLATE_COLUMNS = 12
+ROWS = 'ABCDEFGH'
+
+STUDY_TEMPLATE = '''"""
+Mix efficiency study
+generated by otkit.mixstudy, rerun it to change the grid
+"""
+
+import os
+import sys
+
+from opentrons import protocol_api
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
+from otkit.distribute import distribute
+from otkit.wells import WellIndex
+
+metadata = {{
+    'protocolName': 'Mix efficiency study',
+    'author': 'zliu <skelviper@hotmail.com>',
+    'apiLevel': '2.13'
+}}
+
+################Mix study configuration################
+water_volume = {water_volume}
+dna_volume = {dna_volume}
+flow_rate = {flow_rate}
+bottom_offset = 0.5
+# one condition per column: mix repetitions, volume (ul) and rate (x flow_rate)
+conditions = {conditions}
+################End mix study configuration################
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    if not protocol.rail_lights_on:
+        protocol.set_rail_lights(True)
+    protocol.home()
+    alert = Alert(protocol)
+
+    def _pick_up(pipette):
+        """
+        pick up tip, if no tip available, pause and wait for tip replacement
+        """
+        try:
+            pipette.pick_up_tip(presses=2, increment=1)
+        except protocol_api.labware.OutOfTipsError:
+            with alert:
+                protocol.pause("Replace empty tip racks")
+            pipette.reset_tipracks()
+            pipette.pick_up_tip(presses=2, increment=1)
+
+    tubes = protocol.load_labware('xinglab_8stripetube', location='3')
+    plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul', location='2')
+    tipracks = [protocol.load_labware('axygen_96_diytiprack_10ul', location=s) for s in ['1', '4']]
+    pipette = protocol.load_instrument('p20_multi_gen2', 'right', tip_racks=tipracks)
+    pipette.flow_rate.aspirate = flow_rate
+    pipette.flow_rate.dispense = flow_rate
+
+    water = tubes.wells_by_name()['A1']
+    dna = tubes.wells_by_name()['A2']
+    plate_cols = WellIndex(plate, bottom_offset)
+
+    protocol.comment('Stage: water')
+    distribute(pipette, [water_volume] * len(conditions), water,
+               [plate_cols.bottom(i) for i in range(len(conditions))], _pick_up)
+
+    protocol.comment('Stage: DNA and mix')
+    for i, condition in enumerate(conditions):
+        _pick_up(pipette)
+        pipette.aspirate(dna_volume, dna.bottom(bottom_offset))
+        pipette.dispense(dna_volume, plate_cols.bottom(i))
+        if condition['reps']:
+            pipette.mix(condition['reps'], condition['volume'], rate=condition['rate'], location=plate_cols.mix(i))
+        pipette.drop_tip()
+
+    alert.ring(block=True)
+    protocol.comment('Protocol complete!')
+'''
+
+
+def study_grid(reps, volumes, rates):
+    """
+    one condition per column, every combination; unmixed controls (0 repetitions) once per grid
+    """
+    conditions = []
+    if 0 in reps:
+        conditions.append({'reps': 0, 'volume': 0, 'rate': 0})
+    for r, volume, rate in itertools.product([r for r in reps if r], volumes, rates):
+        conditions.append({'reps': r, 'volume': volume, 'rate': rate})
+    if len(conditions) > PLATE_COLUMNS:
+        raise ValueError('{} conditions, a plate holds {}; split the grid'.format(len(conditions), PLATE_COLUMNS))
+    return conditions
+
+
+def study_protocol(conditions, water_volume=8.75, dna_volume=1.25, flow_rate=5):
+    for condition in conditions:
+        if condition['volume'] > water_volume + dna_volume:
+            raise ValueError('mixing {} ul in {} ul'.format(condition['volume'], water_volume + dna_volume))
+    return STUDY_TEMPLATE.format(water_volume=water_volume, dna_volume=dna_volume, flow_rate=flow_rate,
+                                 conditions=pprint.pformat(conditions, sort_dicts=False))
+
+
+def write_layout(conditions, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['column', 'reps', 'volume', 'rate'])
+        for i, condition in enumerate(conditions):
+            writer.writerow([i + 1, condition['reps'], condition['volume'], condition['rate']])
+
+
+def read_layout(path):
+    with open(path, newline='') as f:
+        return {int(row['column']): {'reps': int(row['reps']), 'volume': float(row['volume']), 'rate': float(row['rate'])}
+                for row in csv.DictReader(f)}
+
+
+def read_plate(path):
+    """
+    {well name: reading} from a long (well,value) or grid plate reader export
+    """
+    with open(path, newline='') as f:
+        rows = [row for row in csv.reader(f) if row and any(cell.strip() for cell in row)]
+    header = [cell.strip().lower() for cell in rows[0]]
+    if 'well' in header:
+        well, value = header.index('well'), header.index('value')
+        return {row[well].strip(): float(row[value]) for row in rows[1:]}
+    readings = {}
+    for row in rows:
+        letter = row[0].strip().upper()
+        if letter in ROWS and len(letter) == 1:
+            for column, cell in enumerate(row[1:PLATE_COLUMNS + 1]):
+                if cell.strip():
+                    readings['{}{}'.format(letter, column + 1)] = float(cell)
+    return readings
+
+
+def column_cv(readings, column):
+    values = np.array([readings[row + str(column)] for row in ROWS if row + str(column) in readings])
+    return float(values.std(ddof=1) / values.mean())
+
+
+def mix_seconds(condition, flow_rate=5, timing=TIMING):
+    """
+    time of the mix in the otkit.estimate model
+    """
+    if not condition['reps']:
+        return 0.0
+    stroke = condition['volume'] / (flow_rate * condition['rate']) + timing['plunger_overhead']
+    return condition['reps'] * 2 * stroke
+
+
+def analyse(layout, readings, cv_target, flow_rate=5):
+    """
+    per-column results and the chosen policy, None when no condition meets the target
+    """
+    results = []
+    for column, condition in sorted(layout.items()):
+        results.append(dict(condition, column=column, cv=column_cv(readings, column),
+                            seconds=mix_seconds(condition, flow_rate)))
+    for result in results:
+        # this repetition count and every larger one of the same volume and rate meet the target
+        same = [r for r in results if (r['volume'], r['rate']) == (result['volume'], result['rate'])
+                and r['reps'] >= result['reps']]
+        result['meets'] = all(r['cv'] <= cv_target for r in same)
+    passing = [r for r in results if r['meets'] and r['reps']]
+    policy = min(passing, key=lambda r: (r['seconds'], r['reps'])) if passing else None
+    return results, policy
+
+
+def report(results, policy, cv_target):
+    lines = ['{:>6} {:>5} {:>7} {:>5} {:>7} {:>8}'.format('column', 'reps', 'volume', 'rate', 'cv', 'seconds')]
+    for r in results:
+        lines.append('{:>6} {:>5} {:>7g} {:>5g} {:>6.1f}% {:>8.1f}{}'.format(
+            r['column'], r['reps'], r['volume'], r['rate'], 100 * r['cv'], r['seconds'], '  ok' if r['meets'] else ''))
+    lines.append('')
+    if policy is None:
+        lines.append('no mix reaches CV {:.1f}%; extend the grid'.format(100 * cv_target))
+    else:
+        lines.append('policy: mix({}, {:g}, rate={:g}), {:.1f} s per column at CV {:.1f}% (target {:.1f}%)'.format(
+            policy['reps'], policy['volume'], policy['rate'], policy['seconds'], 100 * policy['cv'], 100 * cv_target))
+        lines.append('assay spec settings: mix_reps: {}, mix_volume: {:g}, mix_rate: {:g}'.format(
+            policy['reps'], policy['volume'], policy['rate']))
+    return '\n'.join(lines)
+
+
+def _numbers(text):
+    return [float(x) if '.' in x else int(x) for x in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    design = commands.add_parser('design', help='write a study protocol and its plate layout')
+    design.add_argument('--reps', default='0,1,2,3,5,8', help='mix repetitions, 0 adds an unmixed control')
+    design.add_argument('--volumes', default='4,8', help='mix volumes in ul')
+    design.add_argument('--rates', default='20', help='mix rates, x flow rate')
+    design.add_argument('--flow-rate', type=float, default=5)
+    design.add_argument('-o', '--output', required=True, help='study protocol file to write')
+    design.add_argument('--layout', required=True, help='plate layout CSV to write, for analyse')
+    analysis = commands.add_parser('analyse', help='pick the mix policy from plate reader results')
+    analysis.add_argument('layout', help='plate layout CSV written by design')
+    analysis.add_argument('readings', help='plate reader CSV')
+    analysis.add_argument('--cv', type=float, default=0.05, help='CV target across the rows of a column')
+    analysis.add_argument('--flow-rate', type=float, default=5)
+    args = parser.parse_args()
+    if args.command == 'design':
+        conditions = study_grid(_numbers(args.reps), _numbers(args.volumes), _numbers(args.rates))
+        with open(args.output, 'w') as f:
+            f.write(study_protocol(conditions, flow_rate=args.flow_rate))
+        write_layout(conditions, args.layout)
+        print('{} conditions in {}, layout in {}'.format(len(conditions), args.output, args.layout))
+    else:
+        results, policy = analyse(read_layout(args.layout), read_plate(args.readings), args.cv, args.flow_rate)
+        print(report(results, policy, args.cv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Per-command timing on the robot
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Opt-in wrappers around the pipette and protocol calls of a run that record monotonic start
+and end times, the stage ('Stage: ' comments) and the nesting depth (the aspirates of a mix):
+
+    profiler = Profiler(protocol)
+    profiler.instrument(pipette)
+    ...
+    profiler.save('/var/lib/jupyter/notebooks/runs/charm.profile.json')
+    print(profiler.summary())
+
+    python -m otkit.profiler runs/charm.profile.json
+
+A call costs one list append and two clock reads, a few microseconds against commands that
+take seconds, so it can stay on in production. Assay specs turn it on with the profile setting.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+
+from otkit.alert import wait_for_resume
+from otkit.estimate import format_seconds
+from otkit.trace import STAGE_PREFIX
+
+PIPETTE_METHODS = ['pick_up_tip', 'aspirate', 'dispense', 'mix', 'blow_out', 'drop_tip', 'move_to']
+PROTOCOL_METHODS = ['delay', 'pause', 'home']
+HISTOGRAM_BINS = [0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000]   # upper edges, s
+
+
+class Profiler:
+    """
+    timing records of the instrumented calls: (command, stage, depth, start, end)
+    """
+
+    def __init__(self, protocol=None):
+        self.records = []
+        self.stage = 'setup'
+        self.depth = 0
+        self.started = time.monotonic()
+        if protocol is not None:
+            self.instrument_protocol(protocol)
+
+    def _wrap(self, name, method):
+        records = self.records
+        clock = time.monotonic
+
+        def timed(*args, **kwargs):
+            self.depth += 1
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.depth -= 1
+                records.append((name, self.stage, self.depth, start, clock()))
+        return timed
+
+    @staticmethod
+    def _hold(pause, protocol):
+        """
+        pause that returns when the operator resumes (otkit.alert.wait_for_resume), so the
+        operator's time is the pause's and not the next motion's
+        """
+        def held(*args, **kwargs):
+            result = pause(*args, **kwargs)
+            wait_for_resume(protocol)
+            return result
+        return held
+
+    def instrument(self, pipette, methods=PIPETTE_METHODS):
+        """
+        time the pipette's calls; calls made inside them (mix -> aspirate) are timed too
+        """
+        for name in methods:
+            setattr(pipette, name, self._wrap(name, getattr(pipette, name)))
+        return pipette
+
+    def instrument_protocol(self, protocol, methods=PROTOCOL_METHODS):
+        for name in methods:
+            method = getattr(protocol, name)
+            if name == 'pause':
+                method = self._hold(method, protocol)
+            setattr(protocol, name, self._wrap(name, method))
+        comment = protocol.comment
+
+        def stage_comment(msg, *args, **kwargs):
+            if msg.startswith(STAGE_PREFIX):
+                self.stage = msg[len(STAGE_PREFIX):]
+            return comment(msg, *args, **kwargs)
+        protocol.comment = stage_comment
+        return protocol
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'started': self.started, 'finished': time.monotonic(),
+                       'records': [list(record) for record in self.records]}, f)
+
+    def summary(self, top=10):
+        return summarize(self.records, time.monotonic() - self.started, top)
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return [tuple(record) for record in data['records']], data['finished'] - data['started']
+
+
+def histogram(durations, width=30):
+    """
+    text histogram over HISTOGRAM_BINS
+    """
+    counts = [0] * (len(HISTOGRAM_BINS) + 1)
+    for d in durations:
+        counts[next((i for i, edge in enumerate(HISTOGRAM_BINS) if d < edge), len(HISTOGRAM_BINS))] += 1
+    peak = max(counts) or 1
+    lines = []
+    lower = 0
+    for edge, count in zip(HISTOGRAM_BINS + [math.inf], counts):
+        if count:
+            label = '{:g}-{:g}s'.format(lower, edge) if edge != math.inf else '>{:g}s'.format(lower)
+            lines.append('    {:>10} {:>5} {}'.format(label, count, '#' * max(1, round(width * count / peak))))
+        lower = edge
+    return lines
+
+
+def summarize(records, wall, top=10):
+    """
+    per-command totals and histograms, then the stage and command pairs that took longest.
+    totals count calls at the top level only, so a mix is not counted again in its aspirates
+    """
+    by_command = {}
+    for name, stage, depth, start, end in records:
+        entry = by_command.setdefault(name, {'calls': 0, 'total': 0.0, 'durations': []})
+        entry['durations'].append(end - start)
+        if depth == 0:
+            entry['calls'] += 1
+            entry['total'] += end - start
+    timed = sum(entry['total'] for entry in by_command.values())
+    lines = ['{} wall time, {} in timed calls ({:.0f}%)'.format(
+        format_seconds(wall), format_seconds(timed), 100 * timed / wall if wall else 0)]
+    lines.append('')
+    lines.append('{:<12} {:>6} {:>9} {:>8} {:>8}'.format('command', 'calls', 'total', 'median', 'max'))
+    for name, entry in sorted(by_command.items(), key=lambda item: -item[1]['total']):
+        durations = sorted(entry['durations'])
+        lines.append('{:<12} {:>6} {:>9} {:>7.2f}s {:>7.2f}s'.format(
+            name, entry['calls'], format_seconds(entry['total']), durations[len(durations) // 2], durations[-1]))
+        lines.extend(histogram(durations))
+    hot = {}
+    for name, stage, depth, start, end in records:
+        if depth == 0:
+            hot[(stage, name)] = hot.get((stage, name), 0.0) + end - start
+    lines.append('')
+    lines.append('hot spots')
+    for (stage, name), seconds in sorted(hot.items(), key=lambda item: -item[1])[:top]:
+        lines.append('  {:<28} {:<12} {:>9} {:>5.1f}%'.format(
+            stage[:28], name, format_seconds(seconds), 100 * seconds / wall if wall else 0))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profile', help='profile file saved by a run')
+    parser.add_argument('--top', type=int, default=10, help='hot spots to list')
+    args = parser.parse_args()
+    records, wall = load(args.profile)
+    print(summarize(records, wall, args.top))
+
+
+if __name__ == '__main__':
+    main()
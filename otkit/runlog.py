@@ -0,0 +1,215 @@
+"""
+Command log of a run, and replay
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Stream every command of a run to a JSONL file as it happens: the trace entry (otkit.trace)
+with its resolved coordinates, plus the wall and run-relative time, the pipette mount,
+the tip on the pipette and the liquid class in use:
+
+    log = CommandLog(protocol, '/var/lib/jupyter/notebooks/runs/charm.commands.jsonl')
+    ...                                          # load labware and pipettes after this
+    log.close()
+
+A resumed run (append=True) adds to the log of the interrupted one, after a new start line.
+
+    {"command": "aspirate", "level": 0, "volume": 6.2, "rate": 3.0, "slot": "9", "well": "A2",
+     "x": 279.5, "y": 256.0, "z": 12.1, "time": 1792305032.1, "t": 84.2, "mount": "right",
+     "tip": "1:A3", "liquid": "tn5_mix", "text": "..."}
+
+Replay a log against a simulated context (or the robot's, with --execute on the robot) to
+check it reproduces, or summarize it with the otkit tools, which read logs as traces:
+
+    python -m otkit.runlog replay runs/charm.commands.jsonl
+    python -m otkit.estimate --trace runs/charm.commands.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+
+from otkit.trace import entry_from_payload, load_labware_defs, load_trace, record_loads
+
+REPLAYED_COMMANDS = {'aspirate', 'dispense', 'mix', 'blow_out', 'pick_up_tip', 'drop_tip', 'move_to',
+                     'delay', 'pause', 'comment', 'home'}
+
+
+class CommandLog:
+    """
+    JSONL log of the commands of one run; context() adds fields to every line, e.g.
+    lambda: {'liquid': pipette.current}
+    """
+
+    def __init__(self, protocol, path, context=None, append=False):
+        self.path = path
+        self.context = context
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'a' if append else 'w')
+        self.started = time.monotonic()
+        self.depth = 0
+        self.tips = {}
+        self._write({'command': 'start', 'time': time.time(), 'simulating': protocol.is_simulating(),
+                     'resumed': append})
+        record_loads(protocol, lambda entry: self._write(dict(entry, level=self.depth)))
+        self.unsubscribe = protocol.broker.subscribe('command', self._record)
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+
+    def _record(self, message):
+        if message['$'] != 'before':
+            self.depth -= 1
+            return
+        payload = message['payload']
+        entry = entry_from_payload(payload, self.depth)
+        self.depth += 1
+        entry['time'] = time.time()
+        entry['t'] = round(time.monotonic() - self.started, 3)
+        instrument = payload.get('instrument')
+        if instrument is not None:
+            mount = str(instrument.mount)
+            entry['mount'] = mount
+            if entry['command'] == 'pick_up_tip' and entry.get('well'):
+                self.tips[mount] = '{}:{}'.format(entry['slot'], entry['well'])
+            if self.tips.get(mount):
+                entry['tip'] = self.tips[mount]
+            if entry['command'] in ('drop_tip', 'return_tip'):
+                self.tips[mount] = None
+        if self.context is not None:
+            entry.update(self.context())
+        self._write(entry)
+
+    def close(self):
+        self.unsubscribe()
+        self.file.close()
+
+
+def _location(labware, entry):
+    from opentrons.types import Location, Point
+
+    well = labware[entry['slot']].wells_by_name()[entry['well']]
+    if 'x' not in entry:
+        return well
+    return Location(Point(entry['x'], entry['y'], entry['z']), well)
+
+
+def replay(entries, protocol):
+    """
+    run the top-level commands of a log on a protocol context; nested commands
+    (the aspirates of a mix) come from replaying their parent
+    """
+    labware = {}
+    pipettes = {}
+    for n, entry in enumerate(entries):
+        command = entry['command']
+        if command == 'load_labware':
+            if protocol.deck[entry['slot']] is not None:
+                del protocol.deck[entry['slot']]
+            labware[entry['slot']] = protocol.load_labware(entry['load_name'], location=entry['slot'])
+            continue
+        if command == 'load_instrument':
+            # replace: a resumed run loads its pipettes again
+            pipettes[entry['mount']] = protocol.load_instrument(
+                entry['instrument'], entry['mount'], tip_racks=[labware[slot] for slot in entry['tip_racks']],
+                replace=True)
+            continue
+        if entry.get('level', 0) or command not in REPLAYED_COMMANDS:
+            continue
+        if command == 'delay':
+            protocol.delay(seconds=entry.get('seconds', 0))
+        elif command == 'pause':
+            protocol.pause(entry.get('message', ''))
+        elif command == 'comment':
+            protocol.comment(entry.get('message', ''))
+        elif command == 'home':
+            protocol.home()
+        else:
+            pipette = pipettes.get(entry.get('mount')) or next(iter(pipettes.values()))
+            _replay_pipette(pipette, labware, entry, entries[n + 1:n + 2])
+    return protocol
+
+
+def _replay_pipette(pipette, labware, entry, following):
+    command = entry['command']
+    if command == 'pick_up_tip':
+        pipette.pick_up_tip(labware[entry['slot']].wells_by_name()[entry['well']])
+    elif command == 'drop_tip':
+        if entry.get('slot') in labware:
+            pipette.drop_tip(_location(labware, entry))
+        else:
+            pipette.drop_tip()
+    elif command == 'aspirate':
+        pipette.aspirate(entry['volume'], _location(labware, entry), rate=entry['rate'] / pipette.flow_rate.aspirate)
+    elif command == 'dispense':
+        pipette.dispense(entry['volume'], _location(labware, entry), rate=entry['rate'] / pipette.flow_rate.dispense)
+    elif command == 'mix':
+        # the first aspirate of the mix holds its location and rate
+        first = following[0]
+        pipette.mix(entry['repetitions'], entry['volume'], _location(labware, first),
+                    rate=first['rate'] / pipette.flow_rate.aspirate)
+    elif command == 'blow_out':
+        pipette.blow_out(_location(labware, entry) if entry.get('slot') in labware else None)
+    elif command == 'move_to':
+        pipette.move_to(_location(labware, entry))
+
+
+def compare(logged, replayed):
+    """
+    first top-level command where the replay differs from the log, None when they match
+    """
+    keys = ['command', 'volume', 'slot', 'well']
+
+    def commands(trace):
+        return [{key: entry.get(key) for key in keys} for entry in trace
+                if entry.get('level', 0) == 0 and entry['command'] in REPLAYED_COMMANDS]
+    a, b = commands(logged), commands(replayed)
+    for n, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return n, x, y
+    if len(a) != len(b):
+        return min(len(a), len(b)), a[len(b):len(b) + 1], b[len(a):len(a) + 1]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay_parser = commands.add_parser('replay', help='re-run a command log and compare')
+    replay_parser.add_argument('log')
+    replay_parser.add_argument('--execute', action='store_true', help='move the robot (run on the robot)')
+    replay_parser.add_argument('--api-level', default='2.13')
+    args = parser.parse_args()
+    entries = load_trace(args.log)
+    if args.execute:
+        from opentrons import execute
+        protocol = execute.get_protocol_api(args.api_level, extra_labware=load_labware_defs())
+    else:
+        from opentrons import simulate
+        protocol = simulate.get_protocol_api(args.api_level, extra_labware=load_labware_defs())
+    replayed = []
+    record_loads(protocol, replayed.append)
+    depth = [0]
+
+    def on_command(message):
+        if message['$'] == 'before':
+            replayed.append(entry_from_payload(message['payload'], depth[0]))
+            depth[0] += 1
+        else:
+            depth[0] -= 1
+    protocol.broker.subscribe('command', on_command)
+    replay(entries, protocol)
+    difference = compare(entries, replayed)
+    if difference is None:
+        print('replayed {} commands, same as the log'.format(sum(1 for e in entries if e.get('level', 0) == 0)))
+    else:
+        n, logged, got = difference
+        print('replay differs at command {}: logged {}, replayed {}'.format(n + 1, logged, got))
+
+
+if __name__ == '__main__':
+    main()
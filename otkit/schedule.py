@@ -0,0 +1,134 @@
+"""
+Incubation scheduling for assay steps
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+An incubate step starts a timer instead of a manual pause. Steps that need the incubation
+to be over say so with `after: NAME`; everything else up to the next pause or load runs
+inside the window, and a wait step delays the robot for whatever time is left before the
+first dependent step:
+
+    - stage: SDS split
+      columns: ...
+    - incubate: {name: SDS, minutes: 10}
+    - stage: index                  # runs during the incubation
+      columns: ...
+    - stage: PCR mix                # the Triton in the mix quenches SDS
+      after: SDS
+      distribute: ...
+"""
+
+import time
+
+from otkit.estimate import command_costs
+from otkit.trace import entry_from_payload
+
+
+def schedule(selected):
+    """
+    reorder (index, stage, step) tuples so independent steps run inside incubation windows,
+    with a (None, stage, {'wait': NAME}) entry where each incubation has to be over
+    """
+    ordered = []
+    window = None       # name of the running incubation
+    held = []           # steps that wait for it
+    held_stage = None
+    for n, stage, step in selected:
+        if 'incubate' in step:
+            if window is not None:
+                ordered.append((None, stage, {'wait': window}))
+                ordered.extend(held)
+            window, held, held_stage = step['incubate']['name'], [], None
+            ordered.append((n, stage, step))
+            continue
+        if window is None:
+            ordered.append((n, stage, step))
+            continue
+        continues_held = 'stage' not in step and held_stage is not None and stage == held_stage
+        if held and ('pause' in step or 'load' in step):
+            # the deck changes at pauses and loads; nothing moves ahead of them
+            ordered.append((None, stage, {'wait': window}))
+            ordered.extend(held)
+            ordered.append((n, stage, step))
+            window, held, held_stage = None, [], None
+        elif step.get('after') == window or continues_held:
+            held.append((n, stage, step))
+            held_stage = stage
+        else:
+            ordered.append((n, stage, step))
+            held_stage = None if 'stage' in step else held_stage
+    if window is not None:
+        ordered.append((None, None, {'wait': window}))
+        ordered.extend(held)
+    return ordered
+
+
+class Clock:
+    """
+    seconds since a mark: wall time on the robot,
+    the otkit.estimate timing model of the commands issued while simulating
+    """
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.simulating = protocol.is_simulating()
+        self.entries = []
+        if self.simulating:
+            protocol.broker.subscribe('command', self._record)
+
+    def _record(self, message):
+        if message['$'] == 'before':
+            self.entries.append(entry_from_payload(message['payload']))
+
+    def now(self):
+        if self.simulating:
+            return len(self.entries)
+        return time.time()
+
+    def elapsed(self, mark):
+        """
+        seconds since now() returned mark
+        """
+        if self.simulating:
+            return sum(cost[0] for cost in command_costs(self.entries)[mark:])
+        return time.time() - mark
+
+
+class Timers:
+    """
+    running incubations by name
+    """
+
+    def __init__(self, protocol, clock=None):
+        self.protocol = protocol
+        self.clock = clock or Clock(protocol)
+        self.running = {}
+
+    def start(self, name, minutes, mark=None, stopped=None):
+        """
+        start a timer now, or at a mark journaled by an earlier run on the robot. Journaled
+        marks are wall time; a simulated resume counts the time from the mark to stopped (the
+        journal's last line) as already incubated, so the estimate of a journal is the same on
+        every run and waits for what is left if the run continued where it stopped
+        """
+        seconds = minutes * 60
+        if mark is not None and self.clock.simulating:
+            if stopped is not None:
+                seconds -= max(0.0, stopped - mark)
+            mark = None
+        if mark is None:
+            mark = self.clock.now()
+        self.running[name] = (mark, seconds)
+        return mark
+
+    def wait(self, name):
+        """
+        delay the robot for the rest of the incubation
+        """
+        if name not in self.running:
+            return
+        mark, seconds = self.running.pop(name)
+        remaining = seconds - self.clock.elapsed(mark)
+        if remaining > 0:
+            self.protocol.delay(seconds=round(remaining), msg='{} incubation'.format(name))
@@ -0,0 +1,218 @@
+"""
+Parameter sweeps over protocol variants
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Expand a grid of module-level settings, run every variant of every protocol on the virtual
+OT-2 (otkit.virtual) across a process pool, and list estimated time, tips and reagent use
+side by side:
+
+    python -m otkit.sweep protocols/CHARM_libprep/libprep.charm.py protocols/HiRES_libprep/hires.assay.py \
+        --grid flow_rate=3,5,7.5 --grid mix_reps=3,5,8 --grid disposal_volume=0,1,2 --grid col_num=6,12 -o sweep.csv
+
+Every grid name must be a setting of every script: a name assigned at module level, or in an
+if block at module level (col_num after if_test_run); anything else is an error. Reagent use
+is what each reagent well (a well drawn from before anything is dispensed into it: tubes and
+index plates) gives up over the run, after disposal volume blown back. Within each protocol and
+col_num, rows marked * are Pareto-best: no other variant is as good in time, tips and reagent
+and better in one. Variants that fail (a VolumeError, an aspirate that does not fit the tip) show the error.
+--opentrons runs the variants through opentrons.simulate instead, seconds per variant.
+"""
+
+import argparse
+import csv
+import ast
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from otkit.carryover import _label
+from otkit.estimate import estimate, format_seconds
+from otkit.trace import parse_overrides, simulate_protocol
+from otkit.virtual import run_protocol
+
+OBJECTIVES = ['seconds', 'tips', 'reagent']
+
+
+def parse_grid(pairs):
+    """
+    ['flow_rate=3,5', 'col_num=6,12'] -> {'flow_rate': [3, 5], 'col_num': [6, 12]}
+    """
+    grid = {}
+    for pair in pairs or []:
+        name, values = pair.split('=', 1)
+        grid[name] = [parse_overrides(['{}={}'.format(name, value)])[name] for value in values.split(',')]
+    return grid
+
+
+def settings(path):
+    """
+    names a protocol assigns at module level, directly or in module-level if blocks;
+    assignments inside run() are not settings
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.If):
+            nodes.extend(node.body + node.orelse)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names.update(n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name))
+    return names
+
+
+def variants(path, grid):
+    """
+    overrides of every variant of one protocol over the grid
+    """
+    missing = [name for name in grid if name not in settings(path)]
+    if missing:
+        raise ValueError('{} has no module-level {}'.format(path, ', '.join(missing)))
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+def reagent_flows(trace):
+    """
+    (entry, reagent well, ul drawn) for each aspirate from a reagent well and each dispense
+    or blow out back into one (negative); a swapped-in plate on a slot counts as new wells
+    """
+    plates = {}
+    touched = set()
+    sources = set()
+    flows = []
+    tip = 0.0
+    for entry in trace:
+        command = entry['command']
+        if command == 'load_labware':
+            plates[entry['slot']] = plates.get(entry['slot'], -1) + 1
+            continue
+        key = (entry.get('slot'), entry.get('well'), plates.get(entry.get('slot'), 0)) if entry.get('well') else None
+        if key is not None and command in ('aspirate', 'dispense', 'blow_out') and key not in touched:
+            touched.add(key)
+            if command == 'aspirate':
+                sources.add(key)
+        if command == 'aspirate':
+            if key in sources:
+                flows.append((entry, _label(key), entry['volume']))
+            tip += entry['volume']
+        elif command == 'dispense':
+            if key in sources:
+                flows.append((entry, _label(key), -min(entry['volume'], tip)))
+            tip = max(0.0, tip - entry['volume'])
+        elif command == 'blow_out':
+            if key in sources and tip:
+                flows.append((entry, _label(key), -tip))
+            tip = 0.0
+        elif command in ('drop_tip', 'return_tip'):
+            tip = 0.0
+    return flows
+
+
+def reagent_use(trace):
+    """
+    ul each reagent well gives up over the run, keyed 'slot:well'
+    """
+    use = {}
+    for _, label, volume in reagent_flows(trace):
+        use[label] = use.get(label, 0.0) + volume
+    return {label: round(volume, 3) for label, volume in use.items()}
+
+
+def run_variant(job):
+    """
+    estimate of one variant; runs in a worker process
+    """
+    path, overrides, engine = job
+    result = {'protocol': path, 'overrides': overrides}
+    try:
+        trace = (simulate_protocol if engine == 'opentrons' else run_protocol)(path, overrides)
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, str(error).splitlines()[0] if str(error) else '')
+        return result
+    total = estimate(trace)['total']
+    reagents = reagent_use(trace)
+    result.update(seconds=total['seconds'], tips=total['tips'], commands=total['commands'],
+                  reagent=round(sum(reagents.values()), 3), reagents=reagents)
+    return result
+
+
+def pareto(results):
+    """
+    mark results no other of the same protocol and col_num dominates on OBJECTIVES
+    """
+    ok = [r for r in results if 'error' not in r]
+    for r in ok:
+        group = [o for o in ok if o['protocol'] == r['protocol']
+                 and o['overrides'].get('col_num') == r['overrides'].get('col_num')]
+        r['pareto'] = not any(all(o[k] <= r[k] for k in OBJECTIVES) and any(o[k] < r[k] for k in OBJECTIVES)
+                              for o in group)
+    return results
+
+
+def sweep(paths, grid, jobs=None, engine='virtual'):
+    runs = [(path, overrides, engine) for path in paths for overrides in variants(path, grid)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(run_variant, runs, chunksize=max(1, len(runs) // (4 * (jobs or os.cpu_count() or 1)))))
+    return pareto(results)
+
+
+def _settings(overrides):
+    return ' '.join('{}={}'.format(name, value) for name, value in overrides.items()) or '(as written)'
+
+
+def report(results):
+    width = max([len(_settings(r['overrides'])) for r in results] + [8])
+    lines = ['  {:<36} {:<{}} {:>9} {:>5} {:>9}'.format('protocol', 'settings', width, 'time', 'tips', 'reagent')]
+    order = sorted(results, key=lambda r: (r['protocol'], r['overrides'].get('col_num') or 0,
+                                           'error' in r, r.get('seconds', 0)))
+    for r in order:
+        name = os.path.basename(r['protocol'])[:36]
+        if 'error' in r:
+            lines.append('  {:<36} {:<{}} {}'.format(name, _settings(r['overrides']), width, r['error'][:60]))
+            continue
+        lines.append('{} {:<36} {:<{}} {:>9} {:>5} {:>7.1f}ul'.format(
+            '*' if r['pareto'] else ' ', name, _settings(r['overrides']), width,
+            format_seconds(r['seconds']), r['tips'], r['reagent']))
+    failed = sum(1 for r in results if 'error' in r)
+    lines.append('')
+    lines.append('{} variants, {} failed; * Pareto-best in time, tips and reagent per protocol and col_num'.format(
+        len(results), failed))
+    return '\n'.join(lines)
+
+
+def save(results, path):
+    names = sorted({name for r in results for name in r['overrides']})
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['protocol'] + names + ['seconds', 'tips', 'reagent_ul', 'commands', 'pareto', 'reagents', 'error'])
+        for r in results:
+            writer.writerow([r['protocol']] + [r['overrides'].get(name, '') for name in names] + [
+                round(r['seconds'], 1) if 'seconds' in r else '', r.get('tips', ''), r.get('reagent', ''),
+                r.get('commands', ''), int(r['pareto']) if 'pareto' in r else '',
+                ';'.join('{}={}'.format(k, v) for k, v in r.get('reagents', {}).items()), r.get('error', '')])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocols', nargs='+', help='protocol files')
+    parser.add_argument('--grid', action='append', metavar='NAME=V1,V2', help='values of a module-level setting')
+    parser.add_argument('--jobs', type=int, help='worker processes, default one per CPU')
+    parser.add_argument('--opentrons', action='store_true', help='simulate with opentrons instead of otkit.virtual')
+    parser.add_argument('-o', '--output', help='CSV of every variant')
+    args = parser.parse_args()
+    try:
+        results = sweep(args.protocols, parse_grid(args.grid), args.jobs, 'opentrons' if args.opentrons else 'virtual')
+    except ValueError as error:
+        parser.error(str(error))
+    print(report(results))
+    if args.output:
+        save(results, args.output)
+        print('written to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
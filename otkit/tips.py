@@ -0,0 +1,196 @@
+"""
+Tip budget planner
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+Count tip pickups per stage from a simulated trace, map them onto the loaded tip racks
+and line rack refills up with the operator pauses the protocol already has:
+
+    python -m otkit.tips protocols/CHARM_libprep/libprep.charm.py --racks 1,4,7,8,10,11
+
+In the protocols, pause_with_refill() is given the tip pickups the rest of the run makes;
+when the tips left in the racks cannot cover them, it asks for empty racks at the pause
+and resets them after resume, which is the refill policy the planner checks.
+"""
+
+import argparse
+
+from otkit.trace import parse_overrides, simulate_protocol, split_stages
+
+COLUMNS_PER_RACK = 12
+STALL_MESSAGE = 'Replace empty tip racks'
+
+
+def empty_racks(tipracks, num_tips=8):
+    """
+    racks without a full column of tips left
+    """
+    return [rack for rack in tipracks if rack.next_tip(num_tips) is None]
+
+
+def tips_left(tipracks, num_tips=8):
+    """
+    pickups of num_tips tips the racks still hold
+    """
+    return sum(sum(well.has_tip for well in column) // num_tips for rack in tipracks for column in rack.columns())
+
+
+def pause_with_refill(protocol, tipracks, message, needed, num_tips=8):
+    """
+    protocol.pause(message), asking the operator to replace as many empty tip racks as the
+    needed pickups still to come take beyond the tips left
+    """
+    short = needed - tips_left(tipracks, num_tips)
+    racks = []
+    for rack in empty_racks(tipracks, num_tips):
+        if short <= 0:
+            break
+        racks.append(rack)
+        short -= len(rack.wells()) // num_tips
+    if racks:
+        message = '{} Replace empty tip racks in slot {}.'.format(message, ', '.join(str(rack.parent) for rack in racks))
+    protocol.pause(message)
+    for rack in racks:
+        rack.reset()
+
+
+def tip_events(trace):
+    """
+    one (segment, stage, n) per tip pickup; segments are counted between operator pauses
+    """
+    stage_of = {}
+    for name, entries in split_stages(trace):
+        for entry in entries:
+            stage_of[id(entry)] = name
+    events = []
+    pauses = []
+    counts = {}
+    for entry in trace:
+        if entry['command'] == 'pause' and not entry.get('message', '').startswith(STALL_MESSAGE):
+            pauses.append(entry.get('message', '').split(' ' + STALL_MESSAGE)[0])
+        elif entry['command'] == 'pick_up_tip' and entry.get('level', 0) == 0:
+            stage = stage_of.get(id(entry), 'setup')
+            counts[stage] = counts.get(stage, 0) + 1
+            events.append({'segment': len(pauses), 'stage': stage, 'n': counts[stage], 'slot': entry.get('slot')})
+    return events, pauses
+
+
+def rack_order(events, trace=None):
+    """
+    tip rack slots of the first pipette with tip racks, or the slots tips were picked from
+    """
+    for entry in trace or []:
+        if entry['command'] == 'load_instrument' and entry.get('tip_racks'):
+            return entry['tip_racks']
+    order = []
+    for event in events:
+        if event['slot'] and event['slot'] not in order:
+            order.append(event['slot'])
+    return order
+
+
+def simulate_racks(events, racks, refill_at_pauses):
+    """
+    replay tip pickups against racks (slot names, in pickup order).
+    refill_at_pauses replaces empty racks at an operator pause when the tips left do not
+    cover the pickups after it, as pause_with_refill does;
+    otherwise racks are only replaced when the pipette runs out (a stall).
+    """
+    remaining = {slot: COLUMNS_PER_RACK for slot in racks}
+    refills = []
+    stalls = []
+    dry = []
+    segment = 0
+    for k, event in enumerate(events):
+        while segment < event['segment']:
+            segment += 1
+            if refill_at_pauses:
+                short = len(events) - k - sum(remaining.values())
+                empty = []
+                for slot in racks:
+                    if short <= 0:
+                        break
+                    if remaining[slot] == 0:
+                        empty.append(slot)
+                        short -= COLUMNS_PER_RACK
+                if empty:
+                    refills.append({'pause': segment, 'racks': empty})
+                    for slot in empty:
+                        remaining[slot] = COLUMNS_PER_RACK
+        slot = next((slot for slot in racks if remaining[slot] > 0), None)
+        if slot is None:
+            stalls.append(event)
+            for slot in racks:
+                remaining[slot] = COLUMNS_PER_RACK
+            slot = racks[0]
+        remaining[slot] -= 1
+        if remaining[slot] == 0:
+            dry.append(dict(event, rack=slot))
+    return {'refills': refills, 'stalls': stalls, 'dry': dry}
+
+
+def plan(trace, racks=None):
+    events, pauses = tip_events(trace)
+    racks = racks or rack_order(events, trace)
+    per_stage = {}
+    for event in events:
+        per_stage[event['stage']] = per_stage.get(event['stage'], 0) + 1
+    per_segment = [sum(1 for e in events if e['segment'] == n) for n in range(len(pauses) + 1)]
+    return {
+        'racks': racks,
+        'pauses': pauses,
+        'per_stage': per_stage,
+        'per_segment': per_segment,
+        'current': simulate_racks(events, racks, refill_at_pauses=False),
+        'aligned': simulate_racks(events, racks, refill_at_pauses=True),
+    }
+
+
+def _where(event):
+    return '{} tip {} (segment {})'.format(event['stage'], event['n'], event['segment'] + 1)
+
+
+def report(result):
+    capacity = len(result['racks']) * COLUMNS_PER_RACK
+    lines = ['{} tip columns in racks {} ({} columns loaded)'.format(
+        sum(result['per_stage'].values()), ', '.join(result['racks']), capacity)]
+    for stage, tips in result['per_stage'].items():
+        lines.append('  {:<28} {:>4}'.format(stage[:28], tips))
+    lines.append('')
+    lines.append('racks run dry:')
+    for event in result['current']['dry']:
+        lines.append('  slot {:<3} at {}'.format(event['rack'], _where(event)))
+    lines.append('')
+    if result['current']['stalls']:
+        lines.append('current script stalls for tips at:')
+        for event in result['current']['stalls']:
+            lines.append('  ' + _where(event))
+    else:
+        lines.append('current script never runs out of tips')
+    lines.append('')
+    lines.append('refills at operator pauses:')
+    for refill in result['aligned']['refills']:
+        lines.append('  pause {} ({}): replace slot {}'.format(
+            refill['pause'], result['pauses'][refill['pause'] - 1], ', '.join(refill['racks'])))
+    for event in result['aligned']['stalls']:
+        lines.append('  still short at {}: add a pause before it or load more racks'.format(_where(event)))
+    for n, tips in enumerate(result['per_segment']):
+        if tips > capacity:
+            lines.append('  segment {} needs {} columns, more than the {} loaded'.format(n + 1, tips, capacity))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocol')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a module-level setting, e.g. col_num=6')
+    parser.add_argument('--racks', help='tip rack slots in load order, e.g. 1,4,7,8,10,11')
+    args = parser.parse_args()
+    trace = simulate_protocol(args.protocol, parse_overrides(args.set))
+    racks = args.racks.split(',') if args.racks else None
+    print(report(plan(trace, racks)))
+
+
+if __name__ == '__main__':
+    main()
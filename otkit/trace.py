@@ -0,0 +1,247 @@
+"""
+Command traces from protocol simulation
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+A trace is a list of dicts, one per robot command, e.g.
+{'command': 'aspirate', 'level': 0, 'volume': 6.2, 'rate': 5.0, 'slot': '9', 'well': 'A2',
+ 'labware': 'xinglab_8stripetube', 'x': 279.5, 'y': 256.0, 'z': 12.1, 'text': '...'}
+Commands issued inside another (the aspirates of a mix) have a higher level.
+"""
+
+import json
+import os
+import re
+
+STAGE_PREFIX = 'Stage: '
+LABWARE_DIR = '3Dprinting'
+
+COMMAND_PATTERNS = [
+    ('aspirate', re.compile(r'^Aspirating (?P<volume>[\d.]+) uL from (?P<location>.*?) at (?P<rate>[\d.]+) uL/sec')),
+    ('dispense', re.compile(r'^Dispensing (?P<volume>[\d.]+) uL into (?P<location>.*?) at (?P<rate>[\d.]+) uL/sec')),
+    ('mix', re.compile(r'^Mixing (?P<repetitions>\d+) times with a volume of (?P<volume>[\d.]+) ul')),
+    ('pick_up_tip', re.compile(r'^Picking up tip from (?P<location>.*)')),
+    ('drop_tip', re.compile(r'^Dropping tip into (?P<location>.*)')),
+    ('return_tip', re.compile(r'^Returning tip')),
+    ('blow_out', re.compile(r'^Blowing out(?: at (?P<location>.*))?')),
+    ('touch_tip', re.compile(r'^Touching tip')),
+    ('move_to', re.compile(r'^Moving to (?P<location>.*)')),
+    ('delay', re.compile(r'^Delaying for (?P<minutes>\d+) minutes and (?P<seconds>[\d.]+) seconds')),
+    ('pause', re.compile(r'^Pausing robot operation:?\s*(?P<message>.*)')),
+    ('home', re.compile(r'^Homing')),
+]
+LOCATION_PATTERN = re.compile(r'^(?P<well>[A-P]\d+) of (?P<labware>.*) on (?P<slot>\d+)')
+
+
+def parse_text(text):
+    """
+    command name and fields of one opentrons run log line
+    """
+    for command, pattern in COMMAND_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        entry = {'command': command}
+        fields = match.groupdict()
+        for key in ['volume', 'rate']:
+            if fields.get(key) is not None:
+                entry[key] = float(fields[key])
+        if fields.get('repetitions') is not None:
+            entry['repetitions'] = int(fields['repetitions'])
+        if fields.get('seconds') is not None:
+            entry['seconds'] = int(fields['minutes']) * 60 + float(fields['seconds'])
+        if fields.get('message') is not None:
+            entry['message'] = fields['message']
+        location = LOCATION_PATTERN.match(fields.get('location') or '')
+        if location:
+            entry.update(location.groupdict())
+        return entry
+    return {'command': 'comment', 'message': text}
+
+
+def _point(location):
+    point = getattr(location, 'point', None)
+    if point is None and hasattr(location, 'top'):
+        point = location.top().point
+    return point
+
+
+def entry_from_payload(payload, level=0):
+    """
+    trace entry of one opentrons command message payload
+    """
+    entry = parse_text(payload.get('text', ''))
+    entry['level'] = level
+    entry['text'] = payload.get('text', '')
+    point = _point(payload.get('location'))
+    if point is not None:
+        entry['x'], entry['y'], entry['z'] = point.x, point.y, point.z
+    return entry
+
+
+def from_runlog(runlog):
+    """
+    convert the run log of opentrons.simulate.simulate into a trace
+    """
+    return [entry_from_payload(item['payload'], item.get('level', 0)) for item in runlog]
+
+
+def _labware_name(labware):
+    return str(labware).rsplit(' on ', 1)[0]
+
+
+def override_source(source, overrides):
+    """
+    append module-level assignments so run() sees them, e.g. {'col_num': 6}
+    """
+    lines = ['{} = {!r}'.format(name, value) for name, value in overrides.items()]
+    return source + '\n\n# overrides\n' + '\n'.join(lines) + '\n'
+
+
+def parse_overrides(pairs):
+    """
+    ['col_num=6', 'flow_rate=7.5'] -> {'col_num': 6, 'flow_rate': 7.5}
+    """
+    overrides = {}
+    for pair in pairs or []:
+        name, value = pair.split('=', 1)
+        try:
+            overrides[name] = json.loads(value)
+        except ValueError:
+            overrides[name] = value
+    return overrides
+
+
+def load_labware_defs(labware_dir=LABWARE_DIR):
+    """
+    custom labware definitions by load name
+    """
+    defs = {}
+    for name in sorted(os.listdir(labware_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(labware_dir, name)) as f:
+                labware_def = json.load(f)
+            defs[labware_def['parameters']['loadName']] = labware_def
+    return defs
+
+
+def record_loads(protocol, append):
+    """
+    call append with a load_labware or load_instrument entry after each load
+    """
+    load_labware = protocol.load_labware
+    load_instrument = protocol.load_instrument
+
+    def recording_load_labware(load_name, location, *args, **kwargs):
+        labware = load_labware(load_name, location, *args, **kwargs)
+        append({'command': 'load_labware', 'load_name': load_name,
+                'labware': _labware_name(labware), 'slot': str(labware.parent)})
+        return labware
+
+    def recording_load_instrument(instrument_name, mount, *args, **kwargs):
+        instrument = load_instrument(instrument_name, mount, *args, **kwargs)
+        append({'command': 'load_instrument', 'instrument': instrument_name,
+                'mount': str(mount), 'tip_racks': [str(rack.parent) for rack in instrument.tip_racks]})
+        return instrument
+
+    protocol.load_labware = recording_load_labware
+    protocol.load_instrument = recording_load_instrument
+
+
+def simulate_protocol(path, overrides=None, labware_dir=LABWARE_DIR):
+    """
+    simulate a protocol file with opentrons and return its trace,
+    including load_labware and load_instrument entries in load order
+    """
+    from opentrons import simulate
+
+    with open(path) as f:
+        source = f.read()
+    if overrides:
+        source = override_source(source, overrides)
+    namespace = {'__file__': os.path.abspath(path), '__name__': 'protocol'}
+    exec(compile(source, path, 'exec'), namespace)
+    api_level = namespace.get('metadata', {}).get('apiLevel', '2.13')
+    protocol = simulate.get_protocol_api(api_level, extra_labware=load_labware_defs(labware_dir))
+
+    trace = []
+    depth = [0]
+
+    def on_command(message):
+        if message['$'] == 'before':
+            trace.append(entry_from_payload(message['payload'], depth[0]))
+            depth[0] += 1
+        else:
+            depth[0] -= 1
+
+    record_loads(protocol, lambda entry: trace.append(dict(entry, level=depth[0])))
+    unsubscribe = protocol.broker.subscribe('command', on_command)
+    try:
+        namespace['run'](protocol)
+    finally:
+        unsubscribe()
+    return trace
+
+
+def save_trace(trace, path):
+    with open(path, 'w') as f:
+        json.dump(trace, f, indent=1)
+
+
+def load_trace(path):
+    """
+    a saved trace, or the entries of an otkit.runlog command log (.jsonl)
+    """
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            entries = [json.loads(line) for line in f if line.strip()]
+            return [entry for entry in entries if entry['command'] != 'start']
+        return json.load(f)
+
+
+def _column(well):
+    return int(well[1:]) if well else None
+
+
+def split_stages(trace):
+    """
+    group a trace into (stage, entries) in run order.
+    stages start at 'Stage: <name>' comments. traces without them are cut into tip cycles,
+    and a cycle starts a new stage when its source or destination labware changes
+    or its destination column starts over.
+    """
+    marked = any(e['command'] == 'comment' and e.get('message', '').startswith(STAGE_PREFIX) for e in trace)
+    if marked:
+        stages = []
+        name, entries = 'setup', []
+        for entry in trace:
+            if entry['command'] == 'comment' and entry.get('message', '').startswith(STAGE_PREFIX):
+                if entries:
+                    stages.append((name, entries))
+                name, entries = entry['message'][len(STAGE_PREFIX):], []
+            entries.append(entry)
+        if entries:
+            stages.append((name, entries))
+        return stages
+
+    cycles = [[]]
+    for entry in trace:
+        if entry['command'] == 'pick_up_tip' and entry.get('level', 0) == 0:
+            cycles.append([])
+        cycles[-1].append(entry)
+
+    stages = [('setup', [])]
+    previous = None
+    for cycle in cycles:
+        source = next((e for e in cycle if e['command'] == 'aspirate'), None)
+        dest = next((e for e in cycle if e['command'] == 'dispense'), None)
+        if source is not None and dest is not None:
+            if (previous is None
+                    or source.get('slot') != previous[0].get('slot')
+                    or dest.get('slot') != previous[1].get('slot')
+                    or (_column(dest.get('well')) or 0) <= (_column(previous[1].get('well')) or 0)):
+                stages.append(('{} {}'.format(source.get('labware', '?'), source.get('well', '')).strip(), []))
+            previous = (source, dest)
+        stages[-1][1].extend(cycle)
+    return [stage for stage in stages if stage[1]]
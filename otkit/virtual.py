@@ -0,0 +1,616 @@
+"""
+Virtual OT-2 for fast simulation
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+A stand-in ProtocolContext with the part of the Protocol API the protocols in protocols/ use:
+load_labware, load_instrument, deck, wells and columns of labware, aspirate, dispense, mix,
+tips, pause, delay, comment, home and rail lights. Commands are checked the way the robot
+checks them (tips attached, volume in the tip) and recorded as a trace (otkit.trace) with
+the same entries opentrons.simulate gives; the otkit.estimate timing model keeps a virtual
+clock. No opentrons import, so a protocol runs in milliseconds instead of seconds:
+
+    trace = run_protocol('protocols/CHARM_libprep/libprep.charm.py', {'col_num': 6})
+
+    python -m otkit.virtual protocols/CHARM_libprep/libprep.charm.py --set col_num=6
+    python -m otkit.virtual protocols/HiRES_libprep/hires_libprep.py --compare   # against opentrons
+
+While a protocol runs, `from opentrons import protocol_api` in the script gets stand-in modules,
+so scripts run unmodified. Modules, thermocyclers and anything else outside that subset are
+not there; use otkit.trace.simulate_protocol for those.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import types
+from collections import namedtuple
+from contextlib import contextmanager
+
+from otkit.estimate import HOME, TIMING, command_cost, estimate, report
+from otkit.trace import (LABWARE_DIR, entry_from_payload, load_labware_defs, override_source,
+                         parse_overrides, save_trace)
+
+# pipette name: max volume, min volume, channels, default flow rate (uL/s)
+PIPETTES = {
+    'p20_single_gen2': (20, 1, 1, 7.56),
+    'p20_multi_gen2': (20, 1, 8, 7.56),
+    'p300_single_gen2': (300, 20, 1, 92.86),
+    'p300_multi_gen2': (300, 20, 8, 94.0),
+    'p1000_single_gen2': (1000, 100, 1, 274.7),
+}
+TRASH_DEFINITION = {
+    'metadata': {'displayName': 'Opentrons Fixed Trash'},
+    'parameters': {'loadName': 'opentrons_1_trash_1100ml_fixed', 'isTiprack': False},
+    'cornerOffsetFromSlot': {'x': 0, 'y': 0, 'z': 0},
+    'ordering': [['A1']],
+    'wells': {'A1': {'shape': 'rectangular', 'xDimension': 107.11, 'yDimension': 165.67, 'depth': 0,
+                     'totalLiquidVolume': 1100000, 'x': 82.84, 'y': 80, 'z': 82}},
+}
+TRASH_SLOT = '12'
+SLOT_ORIGINS = {str(n): ((n - 1) % 3 * 132.5, (n - 1) // 3 * 90.5) for n in range(1, 13)}
+
+# custom labware definitions by labware directory, read once per process
+_EXTRA_LABWARE = {}
+
+
+class OutOfTipsError(Exception):
+    pass
+
+
+class Point(namedtuple('Point', 'x y z')):
+    def __add__(self, other):
+        return Point(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return Point(self.x - other.x, self.y - other.y, self.z - other.z)
+
+
+class LabwareLike:
+    """
+    what a Location points into, a well or a labware
+    """
+
+    def __init__(self, obj):
+        self.object = obj
+
+    @property
+    def is_well(self):
+        return isinstance(self.object, Well)
+
+    @property
+    def is_labware(self):
+        return isinstance(self.object, Labware)
+
+    def as_well(self):
+        return self.object
+
+    def as_labware(self):
+        return self.object
+
+    def __str__(self):
+        return str(self.object)
+
+
+class Location:
+    def __init__(self, point, labware):
+        self.point = point
+        self.labware = labware if isinstance(labware, LabwareLike) else LabwareLike(labware)
+
+    def move(self, point):
+        return Location(self.point + point, self.labware)
+
+    def __repr__(self):
+        return 'Location(point={!r}, labware={})'.format(self.point, self.labware)
+
+
+class Well:
+    def __init__(self, parent, name, well_def, origin):
+        self.parent = parent
+        self.well_name = name
+        self.depth = well_def['depth']
+        self.max_volume = well_def['totalLiquidVolume']
+        self.diameter = well_def.get('diameter')
+        self.length = well_def.get('xDimension')
+        self.width = well_def.get('yDimension')
+        self._origin = Point(origin[0] + well_def['x'], origin[1] + well_def['y'], origin[2] + well_def['z'])
+        self._bottom = self._origin
+        self.has_tip = parent.is_tiprack
+
+    def bottom(self, z=0.0):
+        return Location(Point(self._bottom.x, self._bottom.y, self._bottom.z + z), self)
+
+    def top(self, z=0.0):
+        return Location(Point(self._bottom.x, self._bottom.y, self._bottom.z + self.depth + z), self)
+
+    def center(self):
+        return Location(Point(self._bottom.x, self._bottom.y, self._bottom.z + self.depth / 2), self)
+
+    def __str__(self):
+        return '{} of {}'.format(self.well_name, self.parent)
+
+    __repr__ = __str__
+
+
+class Labware:
+    def __init__(self, definition, slot):
+        parameters = definition['parameters']
+        self.load_name = self.name = parameters['loadName']
+        self.display_name = definition['metadata']['displayName']
+        self.parent = slot
+        self.is_tiprack = parameters.get('isTiprack', False)
+        self.tip_length = parameters.get('tipLength')
+        corner = definition['cornerOffsetFromSlot']
+        x, y = SLOT_ORIGINS[slot]
+        origin = (x + corner['x'], y + corner['y'], corner['z'])
+        self._columns = [[Well(self, name, definition['wells'][name], origin) for name in column]
+                         for column in definition['ordering']]
+        self._wells = [well for column in self._columns for well in column]
+        self._by_name = {well.well_name: well for well in self._wells}
+        rows = {}
+        for well in self._wells:
+            rows.setdefault(well.well_name[0], []).append(well)
+        self._rows = [rows[letter] for letter in sorted(rows)]
+
+    def wells(self):
+        return list(self._wells)
+
+    def wells_by_name(self):
+        return dict(self._by_name)
+
+    def columns(self):
+        return [list(column) for column in self._columns]
+
+    def columns_by_name(self):
+        return {column[0].well_name[1:]: list(column) for column in self._columns}
+
+    def rows(self):
+        return [list(row) for row in self._rows]
+
+    def rows_by_name(self):
+        return {row[0].well_name[0]: list(row) for row in self._rows}
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def set_offset(self, x, y, z):
+        """
+        labware position calibration, as on the robot
+        """
+        for well in self._wells:
+            well._bottom = well._origin + Point(x, y, z)
+
+    def next_tip(self, num_tips=1, starting_tip=None):
+        """
+        first well of num_tips tips in a row of one column, None when the rack has none
+        """
+        for column in self._columns:
+            for i in range(len(column) - num_tips + 1):
+                if starting_tip is not None and self._wells.index(column[i]) < self._wells.index(starting_tip):
+                    continue
+                if all(well.has_tip for well in column[i:i + num_tips]):
+                    return column[i]
+        return None
+
+    def use_tips(self, start_well, num_channels=1):
+        column = next(column for column in self._columns if start_well in column)
+        i = column.index(start_well)
+        for well in column[i:i + num_channels]:
+            well.has_tip = False
+
+    def return_tips(self, start_well, num_channels=1):
+        column = next(column for column in self._columns if start_well in column)
+        i = column.index(start_well)
+        for well in column[i:i + num_channels]:
+            well.has_tip = True
+
+    def reset(self):
+        for well in self._wells:
+            well.has_tip = self.is_tiprack
+
+    def __str__(self):
+        return '{} on {}'.format(self.display_name, self.parent)
+
+    __repr__ = __str__
+
+
+class Deck(dict):
+    """
+    labware by slot name; an empty slot reads as None
+    """
+
+    def __getitem__(self, slot):
+        return self.get(str(slot))
+
+    def __delitem__(self, slot):
+        self.pop(str(slot), None)
+
+
+class Broker:
+    """
+    command messages for subscribers such as otkit.schedule.Clock, as the opentrons broker sends them
+    """
+
+    def __init__(self):
+        self.handlers = {}
+
+    def subscribe(self, topic, handler):
+        self.handlers.setdefault(topic, []).append(handler)
+        return lambda: self.handlers[topic].remove(handler)
+
+    def publish(self, topic, message):
+        for handler in list(self.handlers.get(topic, [])):
+            handler(message)
+
+
+class FlowRates:
+    def __init__(self, rate):
+        self.aspirate = rate
+        self.dispense = rate
+        self.blow_out = rate
+
+
+class Clearances:
+    def __init__(self):
+        self.aspirate = 1.0
+        self.dispense = 1.0
+
+
+def _text(location):
+    if isinstance(location, Location):
+        return str(location.labware)
+    return str(location)
+
+
+class InstrumentContext:
+    def __init__(self, protocol, name, mount, tip_racks):
+        if name not in PIPETTES:
+            raise ValueError('unknown pipette {!r}, not one of {}'.format(name, ', '.join(PIPETTES)))
+        self.max_volume, self.min_volume, self.channels, rate = PIPETTES[name]
+        self.name = name
+        self.mount = mount
+        self.tip_racks = list(tip_racks or [])
+        self.flow_rate = FlowRates(rate)
+        self.well_bottom_clearance = Clearances()
+        self.starting_tip = None
+        self.trash_container = protocol.fixed_trash
+        self.current_volume = 0.0
+        self._protocol = protocol
+        self._tip = None
+        self._working_volume = self.max_volume
+        self._location = None
+
+    @property
+    def has_tip(self):
+        return self._tip is not None
+
+    def _require_tip(self, action):
+        if self._tip is None:
+            raise RuntimeError('Cannot {} without a tip attached ({} on {})'.format(action, self.name, self.mount))
+
+    def _target(self, location, clearance):
+        if location is None:
+            if self._location is None:
+                raise RuntimeError('no location given and the pipette has not moved yet')
+            return self._location
+        if isinstance(location, Well):
+            return location.bottom(clearance)
+        return location
+
+    def aspirate(self, volume=None, location=None, rate=1.0):
+        self._require_tip('aspirate')
+        target = self._target(location, self.well_bottom_clearance.aspirate)
+        volume = self._working_volume - self.current_volume if volume is None else volume
+        flow = self.flow_rate.aspirate * rate
+        with self._protocol._command('Aspirating {} uL from {} at {} uL/sec'.format(
+                float(volume), _text(target), float(flow)), target, self):
+            assert self.current_volume + volume <= self._working_volume + 1e-9, \
+                'Cannot aspirate more than pipette max volume'
+            self.current_volume += volume
+            self._location = target
+        return self
+
+    def dispense(self, volume=None, location=None, rate=1.0):
+        self._require_tip('dispense')
+        target = self._target(location, self.well_bottom_clearance.dispense)
+        volume = self.current_volume if volume is None else volume
+        flow = self.flow_rate.dispense * rate
+        with self._protocol._command('Dispensing {} uL into {} at {} uL/sec'.format(
+                float(volume), _text(target), float(flow)), target, self):
+            self.current_volume -= min(volume, self.current_volume)
+            self._location = target
+        return self
+
+    def mix(self, repetitions=1, volume=None, location=None, rate=1.0):
+        self._require_tip('mix')
+        volume = volume or self._working_volume
+        with self._protocol._command('Mixing {} times with a volume of {} ul'.format(
+                repetitions, float(volume)), location, self):
+            self.aspirate(volume, location, rate)
+            for _ in range(repetitions - 1):
+                self.dispense(volume, rate=rate)
+                self.aspirate(volume, rate=rate)
+            self.dispense(volume, rate=rate)
+        return self
+
+    def blow_out(self, location=None):
+        target = self._target(location, 0) if location is not None or self._location is not None else None
+        text = 'Blowing out at {}'.format(_text(target)) if target is not None else 'Blowing out'
+        with self._protocol._command(text, target, self):
+            self.current_volume = 0.0
+            if target is not None:
+                self._location = target
+        return self
+
+    def touch_tip(self, location=None, radius=1.0, v_offset=-1.0, speed=60.0):
+        self._require_tip('touch tip')
+        well = location if isinstance(location, Well) else getattr(self._location, 'labware', LabwareLike(None)).object
+        target = well.top(v_offset) if isinstance(well, Well) else self._location
+        with self._protocol._command('Touching tip', target, self):
+            self._location = target
+        return self
+
+    def move_to(self, location, force_direct=False, minimum_z_height=None, speed=None, publish=True):
+        with self._protocol._command('Moving to {}'.format(_text(location)), location, self):
+            self._location = location
+        return self
+
+    def _next_tip(self):
+        for rack in self.tip_racks:
+            tip = rack.next_tip(self.channels, self.starting_tip if self.starting_tip in rack.wells() else None)
+            if tip is not None:
+                return tip
+        raise OutOfTipsError('{} has no tips left in {}'.format(self.name, ', '.join(map(str, self.tip_racks))))
+
+    def pick_up_tip(self, location=None, presses=None, increment=None, prep_after=None):
+        if location is None:
+            tip = self._next_tip()
+        elif isinstance(location, Labware):
+            tip = location.next_tip(self.channels)
+            if tip is None:
+                raise OutOfTipsError('no tips left in {}'.format(location))
+        elif isinstance(location, Location):
+            tip = location.labware.as_well()
+        else:
+            tip = location
+        assert self._tip is None, 'Cannot pick up tip with a tip attached'
+        with self._protocol._command('Picking up tip from {}'.format(tip), tip, self):
+            tip.parent.use_tips(tip, self.channels)
+            self._tip = tip
+            self._working_volume = min(self.max_volume, tip.max_volume)
+            self._location = tip.top()
+        return self
+
+    def drop_tip(self, location=None, home_after=None):
+        self._require_tip('drop tip')
+        if location is None:
+            location = self.trash_container.wells()[0].top()
+        elif isinstance(location, Well):
+            location = location.top()
+        with self._protocol._command('Dropping tip into {}'.format(_text(location)), location, self):
+            self._tip = None
+            self.current_volume = 0.0
+            self._working_volume = self.max_volume
+            self._location = location
+        return self
+
+    def return_tip(self, home_after=None):
+        self._require_tip('return tip')
+        tip = self._tip
+        with self._protocol._command('Returning tip', None, self):
+            self.drop_tip(tip)
+        tip.parent.return_tips(tip, self.channels)
+        return self
+
+    def reset_tipracks(self):
+        for rack in self.tip_racks:
+            rack.reset()
+
+    def __str__(self):
+        return '{} on {} mount'.format(self.name, self.mount)
+
+
+class ProtocolContext:
+    """
+    virtual protocol context; trace holds the recorded commands and elapsed the seconds
+    the otkit.estimate timing model gives them
+    """
+
+    def __init__(self, api_level='2.13', extra_labware=None, timing=TIMING):
+        self.api_level = api_level
+        self.extra_labware = extra_labware or {}
+        self.timing = timing
+        self.deck = Deck()
+        self.broker = Broker()
+        self.max_speeds = {}
+        self.rail_lights_on = False
+        self.trace = []
+        self.elapsed = 0.0
+        self._depth = 0
+        self._position = HOME
+        self.fixed_trash = Labware(TRASH_DEFINITION, TRASH_SLOT)
+        self.deck[TRASH_SLOT] = self.fixed_trash
+
+    def is_simulating(self):
+        return True
+
+    @contextmanager
+    def _command(self, text, location=None, instrument=None):
+        payload = {'text': text, 'location': location, 'instrument': instrument}
+        entry = entry_from_payload(payload, self._depth)
+        self.trace.append(entry)
+        seconds, _, self._position = command_cost(entry, self._position, self.timing)
+        self.elapsed += seconds
+        self.broker.publish('command', {'$': 'before', 'payload': payload})
+        self._depth += 1
+        try:
+            yield entry
+        finally:
+            self._depth -= 1
+            self.broker.publish('command', {'$': 'after', 'payload': payload})
+
+    def _definition(self, load_name, version=None):
+        if load_name in self.extra_labware:
+            return self.extra_labware[load_name]
+        definition = standard_definition(load_name, version)
+        if definition is None:
+            raise FileNotFoundError('Unable to find a labware definition for "{}"'.format(load_name))
+        return definition
+
+    def load_labware_from_definition(self, labware_def, location, label=None):
+        slot = str(location)
+        if self.deck[slot] is not None:
+            raise ValueError('Deck location {} already has an item: {}'.format(slot, self.deck[slot]))
+        labware = Labware(labware_def, slot)
+        self.deck[slot] = labware
+        self.trace.append({'command': 'load_labware', 'load_name': labware.load_name,
+                           'labware': labware.display_name, 'slot': slot, 'level': self._depth})
+        return labware
+
+    def load_labware(self, load_name, location, label=None, namespace=None, version=None):
+        return self.load_labware_from_definition(self._definition(load_name, version), location, label)
+
+    def load_instrument(self, instrument_name, mount, tip_racks=None, replace=False):
+        instrument = InstrumentContext(self, instrument_name, str(mount), tip_racks)
+        self.trace.append({'command': 'load_instrument', 'instrument': instrument_name, 'mount': instrument.mount,
+                           'tip_racks': [rack.parent for rack in instrument.tip_racks], 'level': self._depth})
+        return instrument
+
+    def comment(self, msg):
+        with self._command(msg):
+            pass
+
+    def pause(self, msg=None):
+        with self._command('Pausing robot operation: {}'.format(msg) if msg else 'Pausing robot operation'):
+            pass
+
+    def resume(self):
+        pass
+
+    def delay(self, seconds=0, minutes=0, msg=None):
+        total = minutes * 60 + seconds
+        text = 'Delaying for {} minutes and {} seconds'.format(int(total // 60), float(round(total % 60, 3)))
+        with self._command(text + ('. {}'.format(msg) if msg else '')):
+            pass
+
+    def home(self):
+        # opentrons records no command for a protocol home, so neither does the trace
+        self._position = HOME
+
+    def set_rail_lights(self, on):
+        self.rail_lights_on = bool(on)
+
+
+def standard_definition(load_name, version=None):
+    """
+    an Opentrons labware definition from opentrons_shared_data, read without importing opentrons;
+    None when it is not installed or has no such labware
+    """
+    spec = importlib.util.find_spec('opentrons_shared_data')
+    if spec is None:
+        return None
+    path = os.path.join(list(spec.submodule_search_locations)[0], 'data', 'labware', 'definitions', '2',
+                        load_name, '{}.json'.format(version or 1))
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def api_modules():
+    """
+    stand-ins for the opentrons modules the protocols import, by module name
+    """
+    opentrons = types.ModuleType('opentrons')
+    protocol_api = types.ModuleType('opentrons.protocol_api')
+    labware = types.ModuleType('opentrons.protocol_api.labware')
+    api_types = types.ModuleType('opentrons.types')
+    labware.OutOfTipsError = OutOfTipsError
+    labware.Labware = Labware
+    labware.Well = Well
+    protocol_api.labware = labware
+    protocol_api.ProtocolContext = ProtocolContext
+    protocol_api.InstrumentContext = InstrumentContext
+    protocol_api.Labware = Labware
+    protocol_api.Well = Well
+    protocol_api.OutOfTipsError = OutOfTipsError
+    api_types.Location = Location
+    api_types.Point = Point
+    opentrons.protocol_api = protocol_api
+    opentrons.types = api_types
+    return {'opentrons': opentrons, 'opentrons.protocol_api': protocol_api,
+            'opentrons.protocol_api.labware': labware, 'opentrons.types': api_types}
+
+
+@contextmanager
+def virtual_opentrons():
+    """
+    import the stand-in modules as opentrons inside the block
+    """
+    modules = api_modules()
+    saved = {name: sys.modules.get(name) for name in modules}
+    sys.modules.update(modules)
+    try:
+        yield
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def run_protocol(path, overrides=None, labware_dir=LABWARE_DIR, timing=TIMING):
+    """
+    run a protocol file on the virtual OT-2 and return its trace, the same entries
+    as otkit.trace.simulate_protocol
+    """
+    if labware_dir not in _EXTRA_LABWARE:
+        _EXTRA_LABWARE[labware_dir] = load_labware_defs(labware_dir)
+    with open(path) as f:
+        source = f.read()
+    if overrides:
+        source = override_source(source, overrides)
+    namespace = {'__file__': os.path.abspath(path), '__name__': 'protocol'}
+    with virtual_opentrons():
+        exec(compile(source, path, 'exec'), namespace)
+        api_level = namespace.get('metadata', {}).get('apiLevel', '2.13')
+        protocol = ProtocolContext(api_level, _EXTRA_LABWARE[labware_dir], timing)
+        namespace['run'](protocol)
+    return protocol.trace
+
+
+def main():
+    from otkit.runlog import compare
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('protocol', help='protocol file to run')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUE', help='override a module-level setting, e.g. col_num=6')
+    parser.add_argument('--save-trace', help='write the trace to this file')
+    parser.add_argument('--compare', action='store_true', help='simulate with opentrons too and compare the commands')
+    args = parser.parse_args()
+    overrides = parse_overrides(args.set)
+    start = time.perf_counter()
+    trace = run_protocol(args.protocol, overrides)
+    wall = time.perf_counter() - start
+    if args.save_trace:
+        save_trace(trace, args.save_trace)
+    print(report(estimate(trace)))
+    print('virtual run in {:.0f} ms'.format(1000 * wall))
+    if args.compare:
+        from otkit.trace import simulate_protocol
+
+        difference = compare(simulate_protocol(args.protocol, overrides), trace)
+        if difference is None:
+            print('same commands as opentrons.simulate')
+        else:
+            n, simulated, virtual = difference
+            print('differs at command {}: opentrons {}, virtual {}'.format(n + 1, simulated, virtual))
+
+
+if __name__ == '__main__':
+    main()
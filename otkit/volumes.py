@@ -0,0 +1,157 @@
+"""
+Per-well liquid volume tracking
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+
+One (rows x columns) array of volumes per tracked labware, updated by every aspirate,
+dispense and blow out of a TrackedPipette:
+
+    volumes = VolumeTracker()
+    volumes.add(dilute_plate)                    # empty plate
+    volumes.set(water, sum(water_volume))        # every tube of the water column
+    pipette = TrackedPipette(pipette, volumes)
+    pipette.aspirate(10, water)                  # height follows the meniscus
+
+Aspirating from a Well (not a Location) picks the height from otkit.geometry.
+Wells of labware that was never added are not tracked.
+"""
+
+import numpy as np
+
+from otkit.geometry import height_model
+
+
+class VolumeError(ValueError):
+    pass
+
+
+class VolumeTracker:
+    """
+    liquid volume of every well of the added labware
+    """
+
+    def __init__(self, immersion=1.0, bottom_offset=0.3, dead_volume=0.0):
+        self.immersion = immersion
+        self.bottom_offset = bottom_offset
+        self.dead_volume = dead_volume
+        self.volumes = {}
+
+    def add(self, labware, volume=0.0):
+        """
+        track a labware; volume is a number or a (rows x columns) array
+        """
+        shape = (len(labware.rows()), len(labware.columns()))
+        self.volumes[labware] = np.broadcast_to(np.asarray(volume, dtype=float), shape).copy()
+
+    def discard(self, labware):
+        self.volumes.pop(labware, None)
+
+    def is_tracked(self, well):
+        return well.parent in self.volumes
+
+    def _index(self, well, channels):
+        """
+        array and (rows, column) index of the wells under the channels starting at well
+        """
+        array = self.volumes[well.parent]
+        row = ord(well.well_name[0]) - ord('A')
+        column = int(well.well_name[1:]) - 1
+        return array, (slice(row, min(row + channels, array.shape[0])), column)
+
+    def set(self, well, volume, channels=8):
+        if not self.is_tracked(well):
+            self.add(well.parent)
+        array, index = self._index(well, channels)
+        array[index] = volume
+
+    def volume(self, well, channels=8):
+        """
+        smallest volume under the channels
+        """
+        array, index = self._index(well, channels)
+        return float(array[index].min())
+
+    def aspirate_height(self, well, volume, channels=8):
+        """
+        bottom offset for aspirating volume from well, below the meniscus left behind
+        """
+        return height_model(well.parent).aspirate_height(
+            self.volume(well, channels) - volume, self.immersion, self.bottom_offset)
+
+    def remove(self, well, volume, channels=8):
+        if not self.is_tracked(well):
+            return
+        array, index = self._index(well, channels)
+        if array[index].min() - volume < self.dead_volume - 1e-6:
+            raise VolumeError('{} of {}: aspirating {} uL from {:.2f} uL'.format(
+                well.well_name, well.parent, volume, array[index].min()))
+        array[index] -= volume
+
+    def add_to(self, well, volume, channels=8):
+        if not self.is_tracked(well):
+            return
+        array, index = self._index(well, channels)
+        max_volume = height_model(well.parent).max_volume
+        if array[index].max() + volume > max_volume + 1e-6:
+            raise VolumeError('{} of {}: dispensing {} uL into {:.2f} uL overfills the {} uL well'.format(
+                well.well_name, well.parent, volume, array[index].max(), max_volume))
+        array[index] += volume
+
+
+def _well(location):
+    if location is None:
+        return None
+    if hasattr(location, 'well_name'):
+        return location
+    if location.labware.is_well:
+        return location.labware.as_well()
+    return None
+
+
+class TrackedPipette:
+    """
+    pipette wrapper that keeps a VolumeTracker up to date;
+    everything but aspirate, dispense, mix and blow_out goes to the pipette unchanged
+    """
+
+    def __init__(self, pipette, tracker):
+        self._pipette = pipette
+        self.tracker = tracker
+        self.channels = 8 if 'multi' in pipette.name else 1
+
+    def __getattr__(self, name):
+        return getattr(self._pipette, name)
+
+    def aspirate(self, volume, location, rate=1.0, **kwargs):
+        well = _well(location)
+        if well is not None and self.tracker.is_tracked(well):
+            if location is well:
+                location = well.bottom(self.tracker.aspirate_height(well, volume, self.channels))
+            self.tracker.remove(well, volume, self.channels)
+        self._pipette.aspirate(volume, location, rate=rate, **kwargs)
+        return self
+
+    def dispense(self, volume, location, rate=1.0):
+        well = _well(location)
+        if well is not None:
+            self.tracker.add_to(well, volume, self.channels)
+        self._pipette.dispense(volume, location, rate=rate)
+        return self
+
+    def mix(self, repetitions, volume, location, rate=1.0):
+        well = _well(location)
+        if well is not None and self.tracker.is_tracked(well):
+            available = self.tracker.volume(well, self.channels)
+            if volume > available + 1e-6:
+                raise VolumeError('{} of {}: mixing {} uL in {:.2f} uL'.format(
+                    well.well_name, well.parent, volume, available))
+        self._pipette.mix(repetitions, volume, location, rate=rate)
+        return self
+
+    def blow_out(self, location=None):
+        well = _well(location)
+        if well is not None:
+            self.tracker.add_to(well, self._pipette.current_volume, self.channels)
+        self._pipette.blow_out(location)
+        return self
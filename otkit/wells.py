@@ -0,0 +1,69 @@
+"""
+Per-labware well index
+@Author: zliu
+@Version: 0.1
+@Date: 2026-10-18
+"""
+
+
+class WellIndex:
+    """
+    column index of a loaded labware, built once after load_labware.
+    columns are 0-based, matching the `for i in range(col_num)` loops,
+    so `index.bottom(i)` replaces `labware.columns_by_name()[str(i+1)][0].bottom(bottom_offset)`.
+    """
+
+    def __init__(self, labware, bottom_offset=0.3, mix_offset=1):
+        self.labware = labware
+        self.bottom_offset = bottom_offset
+        self.mix_offset = mix_offset
+        self.columns = labware.columns()
+        self.heads = [column[0] for column in self.columns]
+        self.wells = labware.wells_by_name()
+        self._bottom = [well.bottom(bottom_offset) for well in self.heads]
+        self._mix = [well.bottom(bottom_offset + mix_offset) for well in self.heads]
+        self._top = [well.top() for well in self.heads]
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.heads)
+
+    def head(self, i):
+        """
+        first well (row A) of column i
+        """
+        return self.heads[i]
+
+    def well(self, name):
+        """
+        well by name, e.g. 'A1'
+        """
+        return self.wells[name]
+
+    def bottom(self, i, z=None):
+        """
+        bottom location of column i, at bottom_offset unless z is given
+        """
+        if z is None:
+            return self._bottom[i]
+        key = ('bottom', i, z)
+        if key not in self._cache:
+            self._cache[key] = self.heads[i].bottom(z)
+        return self._cache[key]
+
+    def mix(self, i):
+        """
+        mixing location of column i, mix_offset above the aspirate height
+        """
+        return self._mix[i]
+
+    def top(self, i, z=None):
+        """
+        top location of column i
+        """
+        if z is None:
+            return self._top[i]
+        key = ('top', i, z)
+        if key not in self._cache:
+            self._cache[key] = self.heads[i].top(z)
+        return self._cache[key]
@@ -7,50 +7,17 @@ Automated CHARM library prep protocol
 
 from opentrons import protocol_api
 # import opentrons.execute # in jupyter
-import time
-import json
-import math
 import os
-import subprocess
-
-AUDIO_FILE_PATH = '/var/lib/jupyter/notebooks/reminder_tone.mp3' 
-# custom functions
-
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
-
-def speaker(): 
-    """
-    play reminder tone
-    """
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(AUDIO_FILE_PATH))
-    except KeyboardInterrupt:
-        print("cancel")
-
-def _calc_height(volume, diameter=5.5, bottom_offset=0.3):
-    """
-    calculate liquid height in well.
-    Assume well is a cylinder + cone, Vcone = 71.53 mm^3
-    This is a rough approximation.
-    """
-    #height_cone = 0
-    height_cylinder = 0
-
-    #if volume <= 100:
-    #    height_cone = volume / (math.pi * (diameter / 2) ** 2) * 3 
-    #else:
-    #    volume -= 100
-    height_cylinder = volume / (math.pi * (diameter / 2) ** 2)
-
-    #height = height_cone + height_cylinder
-    height = height_cylinder
-    if height < 0:
-        return 0 + bottom_offset
-    else:
-        return height + bottom_offset
+import sys
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
+from otkit.distribute import distribute
+from otkit.geometry import height_model
+from otkit.wells import WellIndex
 
 metadata = {
     'protocolName': 'CHARM library prep: 3.Hi-C',
@@ -73,6 +40,7 @@ def run(protocol: protocol_api.ProtocolContext):
     if not protocol.rail_lights_on:
         protocol.set_rail_lights(True)
     protocol.home()
+    alert = Alert(protocol)
 
     # protocol.max_speeds['X'] = 500
     # protocol.max_speeds['Y'] = 500
@@ -84,20 +52,21 @@ def run(protocol: protocol_api.ProtocolContext):
         try:
             pipette.pick_up_tip(presses=2,increment=1)
         except protocol_api.labware.OutOfTipsError:
-            for _ in range(8):
-                protocol.set_rail_lights(not protocol.rail_lights_on)
-                if protocol.rail_lights_on:
-                    speaker()
-                protocol.delay(seconds=0.2)
-            protocol.pause("Replace empty tip racks")
+            with alert:
+                protocol.pause("Replace empty tip racks")
             pipette.reset_tipracks()
             pipette.pick_up_tip(presses=2,increment=1)
 
     reagent_plate = protocol.load_labware('xinglab_8stripetube',location='9')
+    reagent_heights = height_model(reagent_plate)
     pcr_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='2')
     enrich_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='5')
     tipracks = [protocol.load_labware('axygen_96_diytiprack_10ul',location=s) for s in ['1','4','7','8','10']]
 
+    # column locations, built once per labware
+    pcr_cols = WellIndex(pcr_plate, bottom_offset)
+    enrich_cols = WellIndex(enrich_plate, bottom_offset)
+
     # load instrument
     pipette = protocol.load_instrument('p20_multi_gen2', 'right', tip_racks=tipracks)
 
@@ -112,6 +81,9 @@ def run(protocol: protocol_api.ProtocolContext):
 
     i5_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='6')
     i7_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='3')
+    i5_cols = WellIndex(i5_plate, bottom_offset)
+    i7_cols = WellIndex(i7_plate, bottom_offset)
+
 
     # transfer i5 index to pcr plate,
     # split pcr plate into two plates, one for Hi-C library, one for MALBAC library
@@ -120,66 +92,49 @@ def run(protocol: protocol_api.ProtocolContext):
     i7_volume = 2
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i5_volume, i5_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i5_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i5_volume, i5_cols.bottom(i))
+        pipette.dispense(i5_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i7_volume, i7_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i7_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i7_volume, i7_cols.bottom(i))
+        pipette.dispense(i7_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
-    # transfer PCR mix to pcr plate
+    # transfer PCR mix to pcr plate, one tip per column (pcr plate holds the library)
     PCRMix_volume = 9.75
-    for i in range(col_num):
-        _pick_up(pipette)
-        pipette.aspirate(PCRMix_volume, PCRMix.bottom(_calc_height((col_num - i - 1)*PCRMix_volume)))
-        pipette.dispense(PCRMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        if i != col_num-1:
-            pipette.drop_tip(home_after=False)
-        else:
-            pipette.drop_tip()
+    distribute(pipette, [PCRMix_volume]*col_num, PCRMix, [pcr_cols.bottom(i) for i in range(col_num)], _pick_up,
+               source_height=lambda i: reagent_heights.aspirate_height((col_num - i - 1)*PCRMix_volume),
+               contact=[True]*col_num)
 
     # Pause for library amplification
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause. 1. Transfer PCR plate to thermocycler for library amplification. 2. replace i5/i7 index for enrich lib.')
+    with alert:
+        protocol.pause('Pause. 1. Transfer PCR plate to thermocycler for library amplification. 2. replace i5/i7 index for enrich lib.')
 
     # transfer i5 index to enrich plate
     i5_volume = 2
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i5_volume, i5_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i5_volume, enrich_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i5_volume, i5_cols.bottom(i))
+        pipette.dispense(i5_volume, enrich_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
-    # transfer enriched PCR mix to enrich plate
+    # transfer enriched PCR mix to enrich plate, one tip per column (enrich plate holds the library)
     enrich_PCRMix_volume = 11.75
-    for i in range(col_num):
-        _pick_up(pipette)
-        pipette.aspirate(enrich_PCRMix_volume, enrich_PCRMix.bottom(_calc_height((col_num - i - 1)*enrich_PCRMix_volume)))
-        pipette.dispense(enrich_PCRMix_volume, enrich_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        if i != col_num-1:
-            pipette.drop_tip(home_after=False)
-        else:
-            pipette.drop_tip()
+    distribute(pipette, [enrich_PCRMix_volume]*col_num, enrich_PCRMix, [enrich_cols.bottom(i) for i in range(col_num)], _pick_up,
+               source_height=lambda i: reagent_heights.aspirate_height((col_num - i - 1)*enrich_PCRMix_volume),
+               contact=[True]*col_num)
+
 
     # Pause for library amplification
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
+    alert.ring(block=True)
     protocol.comment('Pause and transfer enrich plate to thermocycler for library amplification')
@@ -7,50 +7,14 @@ Automated CHARM library prep protocol
 
 from opentrons import protocol_api
 # import opentrons.execute # in jupyter
-import time
-import json
-import math
 import os
-import subprocess
+import sys
 
-AUDIO_FILE_PATH = '/var/lib/jupyter/notebooks/reminder_tone.mp3' 
-# custom functions
-
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
-
-def speaker(): 
-    """
-    play reminder tone
-    """
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(AUDIO_FILE_PATH))
-    except KeyboardInterrupt:
-        print("cancel")
-
-def _calc_height(volume, diameter=5.5, bottom_offset=0.3):
-    """
-    calculate liquid height in well.
-    Assume well is a cylinder + cone, Vcone = 71.53 mm^3
-    This is a rough approximation.
-    """
-    height_cone = 0
-    height_cylinder = 0
-
-    #if volume <= 100:
-    #    height_cone = volume / (math.pi * (diameter / 2) ** 2) * 3 
-    #else:
-    #    volume -= 100
-    height_cylinder = volume / (math.pi * (diameter / 2) ** 2)
-
-    #height = height_cone + height_cylinder
-    height = height_cylinder
-    if height < 0:
-        return 0 + bottom_offset
-    else:
-        return height + bottom_offset
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
 
 metadata = {
     'protocolName': 'Automated CHARM library prep protocol: i7',
@@ -73,6 +37,7 @@ def run(protocol: protocol_api.ProtocolContext):
     if not protocol.rail_lights_on:
         protocol.set_rail_lights(True)
     protocol.home()
+    alert = Alert(protocol)
 
     # protocol.max_speeds['X'] = 500
     # protocol.max_speeds['Y'] = 500
@@ -84,12 +49,8 @@ def run(protocol: protocol_api.ProtocolContext):
         try:
             pipette.pick_up_tip(presses=2,increment=1)
         except protocol_api.labware.OutOfTipsError:
-            for _ in range(8):
-                protocol.set_rail_lights(not protocol.rail_lights_on)
-                if protocol.rail_lights_on:
-                    speaker()
-                protocol.delay(seconds=0.2)
-            protocol.pause("Replace empty tip racks")
+            with alert:
+                protocol.pause("Replace empty tip racks")
             pipette.reset_tipracks()
             pipette.pick_up_tip(presses=2,increment=1)
 
@@ -125,12 +86,8 @@ def run(protocol: protocol_api.ProtocolContext):
         pipette.drop_tip()
     
     # Pause for library amplification
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause and transfer enrich plate to thermocycler for library amplification')
+    with alert:
+        protocol.pause('Pause and transfer enrich plate to thermocycler for library amplification')
 
     protocol.comment('Protocol complete!')
     
@@ -7,50 +7,18 @@ Automated CHARM library prep protocol
 
 from opentrons import protocol_api
 # import opentrons.execute # in jupyter
-import time
-import json
-import math
 import os
-import subprocess
-
-AUDIO_FILE_PATH = '/var/lib/jupyter/notebooks/reminder_tone.mp3' 
-# custom functions
-
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
-
-def speaker(): 
-    """
-    play reminder tone
-    """
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(AUDIO_FILE_PATH))
-    except KeyboardInterrupt:
-        print("cancel")
-
-def _calc_height(volume, diameter=5.5, bottom_offset=0.3):
-    """
-    calculate liquid height in well.
-    Assume well is a cylinder + cone, Vcone = 71.53 mm^3
-    This is a rough approximation.
-    """
-    #height_cone = 0
-    height_cylinder = 0
-
-    #if volume <= 100:
-    #    height_cone = volume / (math.pi * (diameter / 2) ** 2) * 3 
-    #else:
-    #    volume -= 100
-    height_cylinder = volume / (math.pi * (diameter / 2) ** 2)
-
-    #height = height_cone + heigh t_cylinder
-    height = height_cylinder
-    if height < 0:
-        return 0 + bottom_offset
-    else:
-        return height + bottom_offset
+import sys
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
+from otkit.distribute import distribute
+from otkit.tips import pause_with_refill
+from otkit.volumes import TrackedPipette, VolumeTracker
+from otkit.wells import WellIndex
 
 metadata = {
     'protocolName': 'Automated CHARM library prep protocol',
@@ -62,6 +30,11 @@ metadata = {
 malbac_product_concentration_columns = [25 for i in range(12)]
 if_test_run = False
 bottom_offset = 0.3
+disposal_volume = 1 # extra ul per multi-dispense aspiration, blown back into the reagent
+fill_volume = 10 # ul a multi-dispense aspiration fills a tip to, the nominal volume of the 10 ul tips
+flow_rate = 5 # ul/s for aspirate and dispense
+mix_reps = 5 # mixing repetitions per well
+reagent_excess = 5 # ul loaded in each reagent tube beyond what the run draws
 ################End CHARM library prep configuration################
 
 if if_test_run:
@@ -73,6 +46,7 @@ def run(protocol: protocol_api.ProtocolContext):
     if not protocol.rail_lights_on:
         protocol.set_rail_lights(True)
     protocol.home()
+    alert = Alert(protocol)
 
     # protocol.max_speeds['X'] = 500
     # protocol.max_speeds['Y'] = 500
@@ -84,12 +58,8 @@ def run(protocol: protocol_api.ProtocolContext):
         try:
             pipette.pick_up_tip(presses=2,increment=1)
         except protocol_api.labware.OutOfTipsError:
-            for _ in range(8):
-                protocol.set_rail_lights(not protocol.rail_lights_on)
-                if protocol.rail_lights_on:
-                    speaker()
-                protocol.delay(seconds=0.2)
-            protocol.pause("Replace empty tip racks")
+            with alert:
+                protocol.pause("Replace empty tip racks")
             pipette.reset_tipracks()
             pipette.pick_up_tip(presses=2,increment=1)
 
@@ -100,12 +70,25 @@ def run(protocol: protocol_api.ProtocolContext):
     enrich_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='5')
     tipracks = [protocol.load_labware('axygen_96_diytiprack_10ul',location=s) for s in ['1','4','7','8','10','11']]
 
+    # column locations, built once per labware
+    malbac_cols = WellIndex(malbac_plate, bottom_offset)
+    dilute_cols = WellIndex(dilute_plate, bottom_offset)
+    pcr_cols = WellIndex(pcr_plate, bottom_offset)
+    enrich_cols = WellIndex(enrich_plate, bottom_offset)
+
     # load instrument
     pipette = protocol.load_instrument('p20_multi_gen2', 'right', tip_racks=tipracks)
 
     # set flow rate for small volume
-    pipette.flow_rate.aspirate = 5  
-    pipette.flow_rate.dispense = 5
+    pipette.flow_rate.aspirate = flow_rate
+    pipette.flow_rate.dispense = flow_rate
+
+    # well volumes, aspiration heights follow the reagent meniscus
+    volumes = VolumeTracker(bottom_offset=bottom_offset)
+    for plate in [dilute_plate, pcr_plate, enrich_plate]:
+        volumes.add(plate)
+    pipette = TrackedPipette(pipette, volumes)
+
     
     # def in reagent_plate
     # water, transposition mix, SDS, PCR mix, enriched PCR mix
@@ -122,66 +105,60 @@ def run(protocol: protocol_api.ProtocolContext):
     malbac_product_volume = 2
     water_volume = [malbac_product_volume/final_concentration*concentration-malbac_product_volume for concentration in malbac_product_concentration_columns]
 
-    # transfer water to dilute plate
-    _pick_up(pipette)
-    for i in range(col_num):
-        pipette.aspirate(water_volume[i], water.bottom(_calc_height((col_num - i - 1)*water_volume[0])))  # assume water volume is the same in each well
-        pipette.dispense(water_volume[i], dilute_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-    pipette.drop_tip()
+    # transfer water to dilute plate, multi-dispense with one tip (dilute plate is empty)
+    protocol.comment('Stage: water')
+    volumes.set(water, sum(water_volume[:col_num]) + reagent_excess)
+    distribute(pipette, water_volume[:col_num], water, [dilute_cols.bottom(i) for i in range(col_num)], _pick_up,
+               disposal_volume=disposal_volume, max_volume=fill_volume)
 
-    # transfer TranspositionMix to pcr plate
+    # transfer TranspositionMix to pcr plate, multi-dispense with one tip (pcr plate is empty)
+    protocol.comment('Stage: TranspositionMix')
     TranspositionMix_volume = 6.2
-    _pick_up(pipette)
-    for i in range(col_num):
-        pipette.aspirate(TranspositionMix_volume, TranspositionMix.bottom(_calc_height((col_num - i - 1)*TranspositionMix_volume)))
-        pipette.dispense(TranspositionMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-    pipette.drop_tip()
+    volumes.set(TranspositionMix, TranspositionMix_volume*col_num + reagent_excess)
+    distribute(pipette, [TranspositionMix_volume]*col_num, TranspositionMix, [pcr_cols.bottom(i) for i in range(col_num)], _pick_up,
+               disposal_volume=disposal_volume, max_volume=fill_volume)
 
     # transfer malbac products to dilute plate, mix, and transfer to pcr plate
+    protocol.comment('Stage: MALBAC dilution')
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(malbac_product_volume, malbac_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(malbac_product_volume, dilute_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.mix(5, 8,rate=20,location = dilute_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1))
-        pipette.aspirate(malbac_product_volume*2, dilute_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(malbac_product_volume*2, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.mix(5,8,rate=20, location = pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1))
+        pipette.aspirate(malbac_product_volume, malbac_cols.bottom(i))
+        pipette.dispense(malbac_product_volume, dilute_cols.bottom(i))
+        pipette.mix(mix_reps, 8,rate=20,location = dilute_cols.mix(i))
+        pipette.aspirate(malbac_product_volume*2, dilute_cols.bottom(i))
+        pipette.dispense(malbac_product_volume*2, pcr_cols.bottom(i))
+        pipette.mix(mix_reps, 8,rate=20, location = pcr_cols.mix(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
     # Pause for Tn5 reaction
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause and transfer PCR plate to thermocycler for Tn5 reaction')
+    # the last argument of pause_with_refill: tip pickups after the pause, racks are refilled only if short
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause and transfer PCR plate to thermocycler for Tn5 reaction', 7*col_num)
 
     # transfer SDS to pcr plate and split the library into two plates(Hi-C & Enrich)
+    protocol.comment('Stage: SDS split')
     SDS_volume = 2.5
     half_lib_volume = 6.25
+    volumes.set(SDS, SDS_volume*col_num + reagent_excess)
 
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(SDS_volume, SDS.bottom(_calc_height((col_num - i - 1)*SDS_volume)))
-        pipette.dispense(SDS_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.mix(5, 10,rate=20, location = pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1))
-        pipette.aspirate(half_lib_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(half_lib_volume, enrich_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(SDS_volume, SDS)
+        pipette.dispense(SDS_volume, pcr_cols.bottom(i))
+        pipette.mix(mix_reps, 10,rate=20, location = pcr_cols.mix(i))
+        pipette.aspirate(half_lib_volume, pcr_cols.bottom(i))
+        pipette.dispense(half_lib_volume, enrich_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
     
     # replace 3 and 6 with i5/i7 index , while SDS reaction
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Please replace 3 and 6 with i5/i7 index, while SDS reaction (Set timer manually for 10 min)')
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Please replace 3 and 6 with i5/i7 index, while SDS reaction (Set timer manually for 10 min)', 6*col_num)
     # incubate at RT for 10 min
     # protocol.delay(minutes=10)
 
@@ -190,96 +167,84 @@ def run(protocol: protocol_api.ProtocolContext):
 
     i5_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='6')
     i7_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='3')
+    i5_cols = WellIndex(i5_plate, bottom_offset)
+    i7_cols = WellIndex(i7_plate, bottom_offset)
+
 
     # transfer i5 index to pcr plate,
+    protocol.comment('Stage: index')
     # split pcr plate into two plates, one for Hi-C library, one for MALBAC library
     # for Hi-C library
     i5_volume = 2
     i7_volume = 2
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i5_volume, i5_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i5_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i5_volume, i5_cols.bottom(i))
+        pipette.dispense(i5_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i7_volume, i7_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i7_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i7_volume, i7_cols.bottom(i))
+        pipette.dispense(i7_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
-    # transfer PCR mix to pcr plate
+    # transfer PCR mix to pcr plate, one tip per column (pcr plate holds the library)
+    protocol.comment('Stage: PCR mix')
     PCRMix_volume = 9.75
-    for i in range(col_num):
-        _pick_up(pipette)
-        pipette.aspirate(PCRMix_volume, PCRMix.bottom(_calc_height((col_num - i - 1)*PCRMix_volume)))
-        pipette.dispense(PCRMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        if i != col_num-1:
-            pipette.drop_tip(home_after=False)
-        else:
-            pipette.drop_tip()
+    volumes.set(PCRMix, PCRMix_volume*col_num + reagent_excess)
+    distribute(pipette, [PCRMix_volume]*col_num, PCRMix, [pcr_cols.bottom(i) for i in range(col_num)], _pick_up,
+               contact=[True]*col_num)
 
     # Pause for library amplification
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause. 1. Transfer PCR plate to thermocycler for library amplification. 2. replace i5/i7 index for enrich lib.')
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause. 1. Transfer PCR plate to thermocycler for library amplification. 2. replace i5/i7 index for enrich lib.', 3*col_num)
 
     # transfer i5 index to enrich plate
+    protocol.comment('Stage: enrich i5')
     i5_volume = 2
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i5_volume, i5_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i5_volume, enrich_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i5_volume, i5_cols.bottom(i))
+        pipette.dispense(i5_volume, enrich_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
-    # transfer enriched PCR mix to enrich plate
+    # transfer enriched PCR mix to enrich plate, one tip per column (enrich plate holds the library)
+    protocol.comment('Stage: enrich PCR mix')
     enrich_PCRMix_volume = 11.75
-    for i in range(col_num):
-        _pick_up(pipette)
-        pipette.aspirate(enrich_PCRMix_volume, enrich_PCRMix.bottom(_calc_height((col_num - i - 1)*enrich_PCRMix_volume)))
-        pipette.dispense(enrich_PCRMix_volume, enrich_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        if i != col_num-1:
-            pipette.drop_tip(home_after=False)
-        else:
-            pipette.drop_tip()
+    volumes.set(enrich_PCRMix, enrich_PCRMix_volume*col_num + reagent_excess)
+    distribute(pipette, [enrich_PCRMix_volume]*col_num, enrich_PCRMix, [enrich_cols.bottom(i) for i in range(col_num)], _pick_up,
+               contact=[True]*col_num)
+
+
 
     # Pause for library amplification
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause and transfer enrich plate to thermocycler for library amplification')
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause and transfer enrich plate to thermocycler for library amplification', col_num)
 
     # trnasfer i7 index to enrich plate
+    protocol.comment('Stage: enrich i7')
     i7_volume = 2
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i7_volume, i7_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i7_volume, enrich_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i7_volume, i7_cols.bottom(i))
+        pipette.dispense(i7_volume, enrich_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
     
     # Pause for library amplification
-    for _ in range(8):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause and transfer enrich plate to thermocycler for library amplification')
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause and transfer enrich plate to thermocycler for library amplification', 0)
 
     protocol.comment('Protocol complete!')
     
@@ -7,11 +7,17 @@ Automated nextera library prep protocol
 
 from opentrons import protocol_api
 # import opentrons.execute # in jupyter
-import time
-import json
-import math
 import os
-import subprocess
+import sys
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
+from otkit.tips import pause_with_refill
+from otkit.volumes import TrackedPipette, VolumeTracker
+from otkit.wells import WellIndex
 
 metadata = {
     'protocolName': 'Automated HiRES library prep protocol',
@@ -23,48 +29,11 @@ metadata = {
 malbac_product_concentration_columns = [35 for i in range(12)]
 if_dry_run = False
 bottom_offset = 0.3
+reagent_excess = 5 # ul loaded in each reagent tube beyond what the run draws
 ################End library prep configuration############
 
-AUDIO_FILE_PATH = '/var/lib/jupyter/notebooks/reminder_tone.mp3' 
 
 # custom functions
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
-
-def speaker(): 
-    """
-    play reminder tone
-    """
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(AUDIO_FILE_PATH))
-    except KeyboardInterrupt:
-        print("cancel")
-
-def _calc_height(volume, diameter=5.5, bottom_offset=0.3):
-    """
-    calculate liquid height in well.
-    Assume well is a cylinder + cone, Vcone = 71.53 mm^3
-    This is a rough approximation.
-    """
-    height_cone = 0
-    height_cylinder = 0
-
-    #if volume <= 100:
-    #    height_cone = volume / (math.pi * (diameter / 2) ** 2) * 3 
-    #else:
-    #    volume -= 100
-    height_cylinder = volume / (math.pi * (diameter / 2) ** 2)
-
-    #height = height_cone + height_cylinder
-    height = height_cylinder
-    if height < 0:
-        return 0 + bottom_offset
-    else:
-        return height + bottom_offset
-
-
 if if_dry_run:
     col_num = 3
 else:
@@ -79,18 +48,15 @@ def run(protocol: protocol_api.ProtocolContext):
         try:
             pipette.pick_up_tip(presses=2,increment=1)
         except protocol_api.labware.OutOfTipsError:
-            for _ in range(8):
-                protocol.set_rail_lights(not protocol.rail_lights_on)
-                if protocol.rail_lights_on:
-                    speaker()
-                protocol.delay(seconds=0.2)
-            protocol.pause("Replace empty tip racks")
+            with alert:
+                protocol.pause("Replace empty tip racks")
             pipette.reset_tipracks()
             pipette.pick_up_tip(presses=2,increment=1)
 
     if not protocol.rail_lights_on:
         protocol.set_rail_lights(True)
     protocol.home()
+    alert = Alert(protocol)
 
     malbac_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='6')
     reagent_plate = protocol.load_labware('xinglab_8stripetube',location='9')
@@ -98,6 +64,10 @@ def run(protocol: protocol_api.ProtocolContext):
     pcr_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='2')
     tipracks = [protocol.load_labware('axygen_96_diytiprack_10ul',location=s) for s in ['1','4','7','8','10','11']]
 
+    # column locations, built once per labware
+    malbac_cols = WellIndex(malbac_plate, bottom_offset)
+    pcr_cols = WellIndex(pcr_plate, bottom_offset)
+
     # load instrument
     pipette = protocol.load_instrument('p20_multi_gen2', 'right', tip_racks=tipracks)
     
@@ -112,54 +82,57 @@ def run(protocol: protocol_api.ProtocolContext):
     pipette.flow_rate.aspirate = 5  
     pipette.flow_rate.dispense = 5
 
+    # well volumes, aspiration heights follow the reagent meniscus
+    volumes = VolumeTracker(bottom_offset=bottom_offset)
+    volumes.add(pcr_plate)
+    pipette = TrackedPipette(pipette, volumes)
+
     # transfer TranspositionMix to pcr plate
+    protocol.comment('Stage: TranspositionMix')
     TranspositionMix_volume = 3
+    volumes.set(TranspositionMix, TranspositionMix_volume*col_num + reagent_excess)
     _pick_up(pipette)
     for i in range(col_num):
-        pipette.aspirate(TranspositionMix_volume, TranspositionMix.bottom(_calc_height((col_num - i - 1)*TranspositionMix_volume)))
-        pipette.dispense(TranspositionMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(TranspositionMix_volume, TranspositionMix)
+        pipette.dispense(TranspositionMix_volume, pcr_cols.bottom(i))
     pipette.drop_tip()
 
     # transfer malbac products to dilute plate, mix, and transfer to pcr plate
+    protocol.comment('Stage: MALBAC dilution')
     malbac_product_volume = 2
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(malbac_product_volume, malbac_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(malbac_product_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.mix(5,4,rate=20, location = pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1))
+        pipette.aspirate(malbac_product_volume, malbac_cols.bottom(i))
+        pipette.dispense(malbac_product_volume, pcr_cols.bottom(i))
+        pipette.mix(5,4,rate=20, location = pcr_cols.mix(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
     # Pause for Tn5 reaction
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause and transfer PCR plate to thermocycler for Tn5 reaction')
+    # the last argument of pause_with_refill: tip pickups after the pause, racks are refilled only if short
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause and transfer PCR plate to thermocycler for Tn5 reaction', 4*col_num)
 
     # transfer SDS to pcr plate and split the library into two plates(Hi-C & Enrich)
+    protocol.comment('Stage: SDS')
     SDS_volume = 1.25
+    volumes.set(SDS, SDS_volume*col_num + reagent_excess)
 
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(SDS_volume, SDS.bottom(_calc_height((col_num - i - 1)*SDS_volume)))
-        pipette.dispense(SDS_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.mix(5, 4,rate=20, location = pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1))
+        pipette.aspirate(SDS_volume, SDS)
+        pipette.dispense(SDS_volume, pcr_cols.bottom(i))
+        pipette.mix(5, 4,rate=20, location = pcr_cols.mix(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
     
     # replace 3 and 6 with i5/i7 index , while SDS reaction
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Please replace 3 and 6 with i5/i7 index, while SDS reaction')
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Please replace 3 and 6 with i5/i7 index, while SDS reaction', 3*col_num)
     # incubate at RT for 10 min
     # protocol.delay(minutes=10)
 
@@ -171,8 +144,11 @@ def run(protocol: protocol_api.ProtocolContext):
     #     i7_plate = protocol.load_labware_from_definition(labware_def,location='3')
     i5_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='6')
     i7_plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul',location='3')
+    i5_cols = WellIndex(i5_plate, bottom_offset)
+    i7_cols = WellIndex(i7_plate, bottom_offset)
 
     # transfer i5 index to pcr plate,
+    protocol.comment('Stage: i5 index')
     # split pcr plate into two plates, one for Hi-C library, one for MALBAC library
     # for Hi-C library
     i5_volume = 2
@@ -180,49 +156,45 @@ def run(protocol: protocol_api.ProtocolContext):
 
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i5_volume, i5_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i5_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i5_volume, i5_cols.bottom(i))
+        pipette.dispense(i5_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
     # transfer PCR mix to pcr plate
+    protocol.comment('Stage: PCR mix')
     PCRMix_volume = 11.75
+    volumes.set(PCRMix, PCRMix_volume*col_num + reagent_excess)
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(PCRMix_volume, PCRMix.bottom(_calc_height((col_num - i - 1)*PCRMix_volume)))
-        pipette.dispense(PCRMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(PCRMix_volume, PCRMix)
+
+        pipette.dispense(PCRMix_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
     # Pause for library amplification
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause. Transfer PCR plate to thermocycler for library amplification.')
-
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause. Transfer PCR plate to thermocycler for library amplification.', col_num)
 
+    # transfer i7 index to pcr plate
+    protocol.comment('Stage: i7 index')
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(i7_volume, i7_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
-        pipette.dispense(i7_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
+        pipette.aspirate(i7_volume, i7_cols.bottom(i))
+        pipette.dispense(i7_volume, pcr_cols.bottom(i))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
         else:
             pipette.drop_tip()
 
     # Pause for library amplification
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause. Transfer PCR plate to thermocycler for library amplification.')
+    with alert:
+        pause_with_refill(protocol, tipracks, 'Pause. Transfer PCR plate to thermocycler for library amplification.', 0)
 
     protocol.comment('Protocol complete!')
     
\ No newline at end of file
@@ -7,11 +7,15 @@ Automated nextera library prep protocol
 
 from opentrons import protocol_api
 # import opentrons.execute # in jupyter
-import time
-import json
-import math
 import os
-import subprocess
+import sys
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
+from otkit.geometry import height_model
 
 metadata = {
     'protocolName': 'Automated nextera library prep protocol(mix index)',
@@ -25,46 +29,8 @@ if_dry_run = False
 bottom_offset = 0.3
 ################End library prep configuration############
 
-AUDIO_FILE_PATH = '/var/lib/jupyter/notebooks/reminder_tone.mp3' 
 
 # custom functions
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
-
-def speaker(): 
-    """
-    play reminder tone
-    """
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(AUDIO_FILE_PATH))
-    except KeyboardInterrupt:
-        print("cancel")
-
-def _calc_height(volume, diameter=5.5, bottom_offset=0.3):
-    """
-    calculate liquid height in well.
-    Assume well is a cylinder + cone, Vcone = 71.53 mm^3
-    This is a rough approximation.
-    """
-    height_cone = 0
-    height_cylinder = 0
-
-    #if volume <= 100:
-    #    height_cone = volume / (math.pi * (diameter / 2) ** 2) * 3 
-    #else:
-    #    volume -= 100
-    height_cylinder = volume / (math.pi * (diameter / 2) ** 2)
-
-    #height = height_cone + height_cylinder
-    height = height_cylinder
-    if height < 0:
-        return 0 + bottom_offset
-    else:
-        return height + bottom_offset
-
-
 if if_dry_run:
     col_num = 3
 else:
@@ -79,21 +45,19 @@ def run(protocol: protocol_api.ProtocolContext):
         try:
             pipette.pick_up_tip(presses=2,increment=1)
         except protocol_api.labware.OutOfTipsError:
-            for _ in range(8):
-                protocol.set_rail_lights(not protocol.rail_lights_on)
-                if protocol.rail_lights_on:
-                    speaker()
-                protocol.delay(seconds=0.2)
-            protocol.pause("Replace empty tip racks")
+            with alert:
+                protocol.pause("Replace empty tip racks")
             pipette.reset_tipracks()
             pipette.pick_up_tip(presses=2,increment=1)
 
     if not protocol.rail_lights_on:
         protocol.set_rail_lights(True)
     protocol.home()
+    alert = Alert(protocol)
 
     malbac_plate = protocol.load_labware('pcr96well_nonskirt_280ul',location='6')
     reagent_plate = protocol.load_labware('xinglab_8stripetube',location='9')
+    reagent_heights = height_model(reagent_plate)
     dilute_plate = protocol.load_labware('pcr96well_nonskirt_280ul',location='3')
     pcr_plate = protocol.load_labware('pcr96well_nonskirt_280ul',location='2')
     tipracks = [protocol.load_labware('axygen_96_diytiprack_10ul',location=s) for s in ['1','4','7','8','10']]
@@ -118,7 +82,7 @@ def run(protocol: protocol_api.ProtocolContext):
     # transfer water to dilute plate
     _pick_up(pipette)
     for i in range(col_num):
-        pipette.aspirate(water_volume[i], water.bottom(_calc_height((col_num - i - 1)*water_volume[0]))) 
+        pipette.aspirate(water_volume[i], water.bottom(reagent_heights.aspirate_height((col_num - i - 1)*water_volume[0]))) 
         pipette.dispense(water_volume[i], dilute_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
     pipette.drop_tip()
 
@@ -130,7 +94,7 @@ def run(protocol: protocol_api.ProtocolContext):
     TranspositionMix_volume = 3
     _pick_up(pipette)
     for i in range(col_num):
-        pipette.aspirate(TranspositionMix_volume, TranspositionMix.bottom(_calc_height((col_num - i - 1)*TranspositionMix_volume)))
+        pipette.aspirate(TranspositionMix_volume, TranspositionMix.bottom(reagent_heights.aspirate_height((col_num - i - 1)*TranspositionMix_volume)))
         pipette.dispense(TranspositionMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
     pipette.drop_tip()
 
@@ -150,19 +114,15 @@ def run(protocol: protocol_api.ProtocolContext):
 
 
     # Pause for Tn5 reaction
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause and transfer PCR plate to thermocycler for Tn5 reaction')
+    with alert:
+        protocol.pause('Pause and transfer PCR plate to thermocycler for Tn5 reaction')
 
     # transfer SDS to pcr plate and split the library into two plates(Hi-C & Enrich)
     SDS_volume = 1.25
 
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(SDS_volume, SDS.bottom(_calc_height((col_num - i - 1)*SDS_volume)))
+        pipette.aspirate(SDS_volume, SDS.bottom(reagent_heights.aspirate_height((col_num - i - 1)*SDS_volume)))
         pipette.dispense(SDS_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
         pipette.mix(5, 4,rate=20, location = pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset+1))
         if i != col_num-1:
@@ -171,12 +131,8 @@ def run(protocol: protocol_api.ProtocolContext):
             pipette.drop_tip()
     
     # replace 3 and 6 with i5/i7 index , while SDS reaction
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Please replace 3 and 6 with i5/i7 index, while SDS reaction')
+    with alert:
+        protocol.pause('Please replace 3 and 6 with i5/i7 index, while SDS reaction')
     # incubate at RT for 10 min
     # protocol.delay(minutes=10)
 
@@ -203,7 +159,7 @@ def run(protocol: protocol_api.ProtocolContext):
     PCRMix_volume = 9.75
     for i in range(col_num):
         _pick_up(pipette)
-        pipette.aspirate(PCRMix_volume, PCRMix.bottom(_calc_height((col_num - i - 1)*PCRMix_volume)))
+        pipette.aspirate(PCRMix_volume, PCRMix.bottom(reagent_heights.aspirate_height((col_num - i - 1)*PCRMix_volume)))
         pipette.dispense(PCRMix_volume, pcr_plate.columns_by_name()[str(i+1)][0].bottom(bottom_offset))
         if i != col_num-1:
             pipette.drop_tip(home_after=False)
@@ -211,12 +167,8 @@ def run(protocol: protocol_api.ProtocolContext):
             pipette.drop_tip()
 
     # Pause for library amplification
-    for _ in range(4):
-        protocol.set_rail_lights(not protocol.rail_lights_on)
-        if protocol.rail_lights_on:
-            speaker()
-        protocol.delay(seconds=0.2)
-    protocol.pause('Pause. Transfer PCR plate to thermocycler for library amplification.')
+    with alert:
+        protocol.pause('Pause. Transfer PCR plate to thermocycler for library amplification.')
 
     protocol.comment('Protocol complete!')
     
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Automated nextera library prep protocol
+compiled from assays/nextera.yaml by otkit.assay, edit the spec and recompile
+"""
+
+import os
+import sys
+
+from opentrons import protocol_api
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.assay import run_assay
+
+metadata = {'protocolName': 'Automated nextera library prep protocol',
+ 'author': 'zliu <skelviper@hotmail.com>',
+ 'apiLevel': '2.13'}
+
+################Automated nextera library prep protocol configuration################
+col_num = 12    # above 12 runs a batch of plate sets, 12 columns each
+bottom_offset = 0.3
+disposal_volume = 1
+fill_volume = 10
+flow_rate = 5
+mix_reps = 5
+mix_rate = 20
+mix_volume = None
+reagent_excess = 5
+same_volumes_every_set = False
+index_pair = None
+journal = '/var/lib/jupyter/notebooks/runs/nextera.journal.jsonl'
+resume = False
+calibration = '/var/lib/jupyter/notebooks/calibration/curves.json'
+profile = None
+command_log = None
+################End Automated nextera library prep protocol configuration################
+
+stages = None
+spec = {'name': 'Automated nextera library prep protocol',
+ 'author': 'zliu <skelviper@hotmail.com>',
+ 'api_level': '2.13',
+ 'columns': 12,
+ 'settings': {'bottom_offset': 0.3,
+              'disposal_volume': 1,
+              'fill_volume': 10,
+              'flow_rate': 5,
+              'mix_reps': 5,
+              'mix_rate': 20,
+              'mix_volume': None,
+              'reagent_excess': 5,
+              'same_volumes_every_set': False,
+              'index_pair': None,
+              'journal': '/var/lib/jupyter/notebooks/runs/nextera.journal.jsonl',
+              'resume': False,
+              'calibration': '/var/lib/jupyter/notebooks/calibration/curves.json',
+              'profile': None,
+              'command_log': None},
+ 'pipette': {'name': 'p20_multi_gen2', 'mount': 'right'},
+ 'tipracks': {'load_name': 'axygen_96_diytiprack_10ul', 'slots': ['1', '4', '7', '8', '10', '11']},
+ 'labware': {'malbac': {'load_name': 'pcr96well_nonskirt_280ul', 'slot': '6'},
+             'reagents': {'load_name': 'xinglab_8stripetube', 'slot': '9'},
+             'dilute': {'load_name': 'pcr96well_nonskirt_280ul', 'slot': '3', 'track': True},
+             'pcr': {'load_name': 'pcr96well_nonskirt_280ul', 'slot': '2', 'track': True}},
+ 'reagents': {'water': {'labware': 'reagents', 'well': 'A1', 'liquid': 'water'},
+              'TranspositionMix': {'labware': 'reagents', 'well': 'A2', 'liquid': 'tn5_mix'},
+              'SDS': {'labware': 'reagents', 'well': 'A3', 'liquid': 'sds'},
+              'PCRMix': {'labware': 'reagents', 'well': 'A4', 'liquid': 'pcr_mix'}},
+ 'steps': [{'stage': 'water',
+            'distribute': {'reagent': 'water',
+                           'dest': 'dilute',
+                           'volume': {'dilute_to': 5,
+                                      'sample_volume': 2,
+                                      'concentrations': [35, 35, 35, 35, 35, 35, 35, 35, 35, 35, 35, 35]}}},
+           {'stage': 'TranspositionMix',
+            'distribute': {'reagent': 'TranspositionMix', 'dest': 'pcr', 'volume': 3}},
+           {'stage': 'MALBAC dilution',
+            'columns': [{'source': 'malbac', 'dest': 'dilute', 'volume': 2, 'mix': 10, 'liquid': 'sample'},
+                        {'source': 'dilute', 'dest': 'pcr', 'volume': 2, 'mix': 4, 'liquid': 'sample'}]},
+           {'pause': 'Pause and transfer PCR plate to thermocycler for Tn5 reaction'},
+           {'stage': 'SDS', 'columns': [{'source': 'SDS', 'dest': 'pcr', 'volume': 1.25, 'mix': 4}]},
+           {'incubate': {'name': 'SDS', 'minutes': 10}},
+           {'pause': 'Please replace 3 and 6 with i5/i7 index, while SDS reaction'},
+           {'load': {'i5': {'load_name': 'pcr96well_nonskirt_280ul', 'slot': '6'},
+                     'i7': {'load_name': 'pcr96well_nonskirt_280ul', 'slot': '3'}}},
+           {'stage': 'index', 'columns': [{'source': 'i5', 'dest': 'pcr', 'volume': 2, 'liquid': 'index'}]},
+           {'columns': [{'source': 'i7', 'dest': 'pcr', 'volume': 2, 'liquid': 'index'}]},
+           {'stage': 'PCR mix',
+            'after': 'SDS',
+            'distribute': {'reagent': 'PCRMix', 'dest': 'pcr', 'volume': 9.75, 'contact': True}},
+           {'pause': 'Pause. Transfer PCR plate to thermocycler for library amplification.'}]}
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    settings = {name: globals()[name] for name in spec['settings']}
+    run_assay(protocol, spec, col_num, settings, stages)
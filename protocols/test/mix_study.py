@@ -0,0 +1,88 @@
+"""
+Mix efficiency study
+generated by otkit.mixstudy, rerun it to change the grid
+"""
+
+import os
+import sys
+
+from opentrons import protocol_api
+
+# otkit sits next to reminder_tone.mp3 on the robot, and at the repo root locally
+for _path in ['/var/lib/jupyter/notebooks', os.getcwd()]:
+    if _path not in sys.path:
+        sys.path.append(_path)
+from otkit.alert import Alert
+from otkit.distribute import distribute
+from otkit.wells import WellIndex
+
+metadata = {
+    'protocolName': 'Mix efficiency study',
+    'author': 'zliu <skelviper@hotmail.com>',
+    'apiLevel': '2.13'
+}
+
+################Mix study configuration################
+water_volume = 8.75
+dna_volume = 1.25
+flow_rate = 5
+bottom_offset = 0.5
+# one condition per column: mix repetitions, volume (ul) and rate (x flow_rate)
+conditions = [{'reps': 0, 'volume': 0, 'rate': 0},
+ {'reps': 1, 'volume': 4, 'rate': 20},
+ {'reps': 1, 'volume': 8, 'rate': 20},
+ {'reps': 2, 'volume': 4, 'rate': 20},
+ {'reps': 2, 'volume': 8, 'rate': 20},
+ {'reps': 3, 'volume': 4, 'rate': 20},
+ {'reps': 3, 'volume': 8, 'rate': 20},
+ {'reps': 5, 'volume': 4, 'rate': 20},
+ {'reps': 5, 'volume': 8, 'rate': 20},
+ {'reps': 8, 'volume': 4, 'rate': 20},
+ {'reps': 8, 'volume': 8, 'rate': 20}]
+################End mix study configuration################
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    if not protocol.rail_lights_on:
+        protocol.set_rail_lights(True)
+    protocol.home()
+    alert = Alert(protocol)
+
+    def _pick_up(pipette):
+        """
+        pick up tip, if no tip available, pause and wait for tip replacement
+        """
+        try:
+            pipette.pick_up_tip(presses=2, increment=1)
+        except protocol_api.labware.OutOfTipsError:
+            with alert:
+                protocol.pause("Replace empty tip racks")
+            pipette.reset_tipracks()
+            pipette.pick_up_tip(presses=2, increment=1)
+
+    tubes = protocol.load_labware('xinglab_8stripetube', location='3')
+    plate = protocol.load_labware('xinglab_pcr96well_semiskirt_280ul', location='2')
+    tipracks = [protocol.load_labware('axygen_96_diytiprack_10ul', location=s) for s in ['1', '4']]
+    pipette = protocol.load_instrument('p20_multi_gen2', 'right', tip_racks=tipracks)
+    pipette.flow_rate.aspirate = flow_rate
+    pipette.flow_rate.dispense = flow_rate
+
+    water = tubes.wells_by_name()['A1']
+    dna = tubes.wells_by_name()['A2']
+    plate_cols = WellIndex(plate, bottom_offset)
+
+    protocol.comment('Stage: water')
+    distribute(pipette, [water_volume] * len(conditions), water,
+               [plate_cols.bottom(i) for i in range(len(conditions))], _pick_up)
+
+    protocol.comment('Stage: DNA and mix')
+    for i, condition in enumerate(conditions):
+        _pick_up(pipette)
+        pipette.aspirate(dna_volume, dna.bottom(bottom_offset))
+        pipette.dispense(dna_volume, plate_cols.bottom(i))
+        if condition['reps']:
+            pipette.mix(condition['reps'], condition['volume'], rate=condition['rate'], location=plate_cols.mix(i))
+        pipette.drop_tip()
+
+    alert.ring(block=True)
+    protocol.comment('Protocol complete!')